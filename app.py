@@ -1,17 +1,25 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 import logging
 import os
 import tempfile
+import json
+import time
+from contextlib import nullcontext, suppress
+from typing import Optional
 from pathlib import Path
 
 # 导入自定义模块
 from utils.config import Config
 from core.pdf_parser import PaperParser
 from core.llm_client import ModelManager
-from core.qa_chain import PaperQASystem
 from core.summarizer import PaperSummarizer
+from core.session_manager import PaperSession, SessionManager
+from core.job_queue import Job, JobQueue
+from core.executors import CPU, IO, executor_stats, get_executor, run_stage
+from core.model_registry import model_registry
+from core.embeddings import query_embedding_cache
 
 # 配置日志
 logging.basicConfig(
@@ -27,66 +35,202 @@ logger = logging.getLogger(__name__)
 
 
 class PaperAssistantApp:
-    """论文助手主应用"""
+    """论文助手主应用 - 只持有共享组件，每个用户的论文状态保存在各自的会话中"""
+
+    # 请求未携带session_id和paper_id时使用的会话（兼容单用户客户端）
+    DEFAULT_SESSION = "default"
 
     def __init__(self):
         # 验证配置
         Config.validate()
 
+        # 预加载共享的embedding模型，避免首次上传时才加载
+        if Config.EMBEDDING_WARMUP:
+            model_registry.warmup()
+
         # 初始化组件
         self.model_manager = ModelManager()
         self.parser = PaperParser()
-        self.qa_system = PaperQASystem(self.model_manager)
+        self.sessions = SessionManager(self.model_manager)
         self.summarizer = PaperSummarizer(self.model_manager)
-
-        # 当前论文状态
-        self.current_paper = None
-        self.current_summary = None
+        # 上传等耗时任务在后台工作线程中执行，请求立即返回任务ID
+        self.jobs = JobQueue()
+        if self.sessions.reranker is not None and Config.EMBEDDING_WARMUP:
+            self.sessions.reranker.warmup()
 
         logger.info("论文助手应用初始化完成")
 
-    def upload_paper(self, file_path: str) -> dict:
-        """上传并处理论文"""
+    @property
+    def library(self):
+        return self.sessions.library
+
+    def resolve_session(self, session_id: str = None, paper_id: str = None) -> Optional[PaperSession]:
+        """按请求中的session_id或paper_id找到会话，都没有时使用默认会话"""
+        if session_id:
+            return self.sessions.get(session_id)
+        if paper_id:
+            return self.sessions.for_paper(paper_id)
+        return self.sessions.get_or_create(self.DEFAULT_SESSION)
+
+    UPLOAD_STAGES = ["parse", "index", "summary"]
+
+    def upload_paper(self, session: PaperSession, file_path: str) -> dict:
+        """上传并处理论文（在指定会话中打开）"""
+        return self._upload_paper(session, file_path)
+
+    def submit_upload(self, session: PaperSession, file_path: str, filename: str = "") -> Optional[Job]:
+        """提交后台上传任务，任务结束后删除临时文件；排队已满时返回None"""
+        session.job_started()
+
+        def cleanup():
+            session.job_finished()
+            # 临时文件可能已被系统清理，不存在时忽略，否则排队已满时异常会直接抛给上传请求
+            with suppress(FileNotFoundError):
+                os.unlink(file_path)
+
+        job = self.jobs.submit(
+            "upload",
+            self._run_upload_job,
+            session,
+            file_path,
+            stages=self.UPLOAD_STAGES,
+            meta={"session_id": session.session_id, "filename": filename},
+            cleanup=cleanup
+        )
+        if job is None:
+            cleanup()
+        return job
+
+    def _run_upload_job(self, job: Job, session: PaperSession, file_path: str) -> dict:
+        result = self._upload_paper(session, file_path, job)
+        if not result["success"] and not job.should_stop():
+            raise Exception(result["message"])
+        return result
+
+    @staticmethod
+    def _stage(job: Optional[Job], name: str):
+        return job.stage(name) if job is not None else nullcontext()
+
+    def _upload_paper(self, session: PaperSession, file_path: str, job: Job = None) -> dict:
+        """解析 → 入库 → 摘要；在后台任务中执行时记录各阶段进度，并在阶段之间响应取消
+
+        会话锁只在入库阶段（替换会话的索引）和写回会话状态时持有，摘要生成期间问答和切换论文不必等待。
+        """
+        def cancelled():
+            return job is not None and job.should_stop()
+
+        def release_paper():
+            # 未完整入库的论文已从问答系统关闭，会话中的论文信息随之清除
+            with session.lock:
+                if session.paper_id is None:
+                    session.current_paper = None
+                    session.current_summary = None
+
+        def paper_result(summary, message: str):
+            return {
+                "success": True,
+                "message": message,
+                "session_id": session.session_id,
+                "paper_info": {
+                    "paper_id": parsed.sha256,
+                    "title": paper_title,
+                    "pages": metadata.get('pages', 0),
+                    "sections": list(sections.keys())
+                },
+                "summary": summary
+            }
+
+        def cancelled_result():
+            if indexing_complete is not None:
+                indexing_complete.wait()
+                if paper_info.get("status") == "ready":
+                    # 取消请求到达时论文已完整入库并在会话中打开：按成功返回，只跳过摘要
+                    logger.info(f"论文已入库，取消请求只跳过摘要: {paper_title}")
+                    if job is not None:
+                        job.clear_cancel()
+                    return paper_result(None, f"论文《{paper_title}》上传成功（任务取消，未生成摘要）")
+            logger.info(f"论文处理已取消: {file_path}")
+            release_paper()
+            return {
+                "success": False,
+                "message": "任务已取消",
+                "paper_info": None,
+                "summary": None
+            }
+
+        indexing_complete = None
         try:
             logger.info(f"开始处理论文: {file_path}")
 
-            # 解析PDF
-            sections = self.parser.extract_sections(file_path)
-            metadata = self.parser.extract_metadata(file_path)
-
-            # 加载到问答系统
+            # 解析PDF（单次解析，重复文件命中解析缓存）
+            with self._stage(job, "parse"):
+                parsed = run_stage(CPU, self.parser.parse, file_path)
+            sections = parsed.sections
+            metadata = parsed.metadata
             paper_title = sections.get('title') or metadata.get('title') or "未知论文"
-            success = self.qa_system.load_paper(sections, paper_title)
+            if job is not None:
+                job.update("parse", paper_id=parsed.sha256, title=paper_title, pages=metadata.get('pages', 0))
+            if cancelled():
+                return cancelled_result()
+
+            # 加载到问答系统（优先章节入库后即可问答，其余章节在后台继续入库）
+            qa_system = session.qa_system
+            with session.lock, self._stage(job, "index"):
+                session.current_paper = None
+                session.current_summary = None
+                success = qa_system.load_paper_streaming(
+                    parsed.pages, paper_title, sections, paper_id=parsed.sha256, metadata=metadata,
+                    should_stop=job.should_stop if job is not None else None,
+                    on_progress=(lambda progress: job.update(
+                        "index", chunks=progress["chunks"], page=progress["page"], ready=progress["ready"]
+                    )) if job is not None else None
+                )
+                # 其余章节仍在后台入库，入库结果写入同一个论文信息字典
+                paper_info = qa_system.current_paper_info
+                indexing_complete = qa_system.indexing_complete
+                if success:
+                    # 优先章节入库后即在会话中开放问答，摘要和其余章节的入库在任务中继续
+                    session.current_paper = {
+                        "sections": sections,
+                        "metadata": metadata,
+                        "title": paper_title
+                    }
+                    if job is not None:
+                        job.update("index", ready=True)
+            if cancelled():
+                return cancelled_result()
 
             if not success:
-                raise Exception("论文加载失败")
+                raise Exception(f"论文加载失败: {paper_info.get('error', '没有可入库的内容')}")
 
             # 生成摘要
-            summary = self.summarizer.generate_comprehensive_summary(sections)
-
-            # 保存状态
-            self.current_paper = {
-                "sections": sections,
-                "metadata": metadata,
-                "title": paper_title
-            }
-            self.current_summary = summary
+            with self._stage(job, "summary"):
+                summary = self.summarizer.generate_comprehensive_summary(sections)
+
+            if job is not None:
+                # 后台任务等到全文入库完成再结束，任务状态即论文的完整入库状态
+                indexing_complete.wait()
+                job.update("index", chunks=paper_info.get("total_docs", 0), complete=True)
+            if cancelled():
+                if paper_info.get("status") != "ready":
+                    return cancelled_result()
+                # 论文已完整入库、摘要也已生成，取消请求不再生效
+                job.clear_cancel()
+            if paper_info.get("status") == "failed":
+                raise Exception(f"论文入库失败: {paper_info.get('error', '')}")
+
+            # 摘要随论文保存，会话回收后恢复时不必重新生成
+            self.library.save_artifact(parsed.sha256, "summary", summary)
+            with session.lock:
+                if session.paper_id == parsed.sha256:
+                    session.current_summary = summary
 
             logger.info(f"论文处理完成: {paper_title}")
-
-            return {
-                "success": True,
-                "message": f"论文《{paper_title}》上传成功",
-                "paper_info": {
-                    "title": paper_title,
-                    "pages": metadata.get('pages', 0),
-                    "sections": list(sections.keys())
-                },
-                "summary": summary
-            }
+            return paper_result(summary, f"论文《{paper_title}》上传成功")
 
         except Exception as e:
             logger.error(f"论文处理失败: {e}")
+            release_paper()
             return {
                 "success": False,
                 "message": f"论文处理失败: {str(e)}",
@@ -94,9 +238,33 @@ class PaperAssistantApp:
                 "summary": None
             }
 
-    def ask_question(self, question: str) -> dict:
-        """回答问题"""
-        if not self.current_paper:
+    def open_paper(self, session: PaperSession, paper_id: str) -> dict:
+        """在会话中切换到论文库中已入库的论文"""
+        if not session.open_paper(paper_id):
+            return {
+                "success": False,
+                "message": "论文不存在或尚未入库完成",
+                "paper_info": None
+            }
+
+        paper_info = session.qa_system.current_paper_info
+        record = self.library.get_record(paper_id) or {}
+
+        return {
+            "success": True,
+            "message": f"已切换到论文《{paper_info['title']}》",
+            "session_id": session.session_id,
+            "paper_info": {
+                "paper_id": paper_id,
+                "title": paper_info["title"],
+                "pages": record.get("pages", 0),
+                "sections": list(paper_info["sections"].keys())
+            }
+        }
+
+    async def ask_question(self, session: PaperSession, question: str) -> dict:
+        """回答问题（检索在线程池中执行，LLM调用走异步连接池）"""
+        if not session.current_paper:
             return {
                 "success": False,
                 "message": "请先上传论文",
@@ -104,7 +272,7 @@ class PaperAssistantApp:
             }
 
         try:
-            result = self.qa_system.ask_question(question)
+            result = await session.qa_system.aask_question(question)
 
             return {
                 "success": True,
@@ -122,9 +290,61 @@ class PaperAssistantApp:
                 "answer": None
             }
 
-    def explain_term(self, term: str) -> dict:
+    async def ask_question_stream(self, session: PaperSession, question: str):
+        """流式回答问题，产出token事件和最终的done事件（token通过异步SSE连接转发）"""
+        if not session.current_paper:
+            yield {"type": "error", "message": "请先上传论文"}
+            return
+
+        async for event in session.qa_system.aask_question_stream(question):
+            yield event
+
+    async def ask_questions(self, session: PaperSession, questions: list) -> dict:
+        """批量回答问题，结果按问题顺序返回"""
+        if not session.current_paper:
+            return {
+                "success": False,
+                "message": "请先上传论文",
+                "results": []
+            }
+
+        try:
+            start_time = time.time()
+            results = [result async for result in session.qa_system.aask_questions(questions)]
+
+            return {
+                "success": True,
+                "message": f"批量回答完成: {len(results)} 个问题",
+                "results": results,
+                "total_latency": round(time.time() - start_time, 3)
+            }
+
+        except Exception as e:
+            logger.error(f"批量问答失败: {e}")
+            return {
+                "success": False,
+                "message": f"批量问答失败: {str(e)}",
+                "results": []
+            }
+
+    async def ask_questions_stream(self, session: PaperSession, questions: list):
+        """批量回答问题，按问题顺序逐个产出answer事件，最后产出done事件（回答通过异步连接池并发生成）"""
+        if not session.current_paper:
+            yield {"type": "error", "message": "请先上传论文"}
+            return
+
+        start_time = time.time()
+        try:
+            async for result in session.qa_system.aask_questions(questions):
+                yield dict(result, type="answer")
+            yield {"type": "done", "count": len(questions), "total_latency": round(time.time() - start_time, 3)}
+        except Exception as e:
+            logger.error(f"批量问答失败: {e}")
+            yield {"type": "error", "message": f"批量问答失败: {str(e)}"}
+
+    def explain_term(self, session: PaperSession, term: str) -> dict:
         """解释术语"""
-        if not self.current_paper:
+        if not session.current_paper:
             return {
                 "success": False,
                 "message": "请先上传论文",
@@ -132,7 +352,7 @@ class PaperAssistantApp:
             }
 
         try:
-            explanation = self.qa_system.explain_term(term)
+            explanation = session.qa_system.explain_term(term)
 
             return {
                 "success": True,
@@ -148,9 +368,9 @@ class PaperAssistantApp:
                 "explanation": None
             }
 
-    def get_section_keypoints(self, section_name: str) -> dict:
+    def get_section_keypoints(self, session: PaperSession, section_name: str) -> dict:
         """获取章节关键点"""
-        if not self.current_paper:
+        if not session.current_paper:
             return {
                 "success": False,
                 "message": "请先上传论文",
@@ -158,7 +378,7 @@ class PaperAssistantApp:
             }
 
         try:
-            keypoints = self.qa_system.get_section_keypoints(section_name)
+            keypoints = session.qa_system.get_section_keypoints(section_name)
 
             return {
                 "success": True,
@@ -174,48 +394,217 @@ class PaperAssistantApp:
                 "keypoints": []
             }
 
+    def search_library(self, query: str, k: int, paper_ids: list = None, sections: list = None) -> dict:
+        """跨论文检索（只读，不依赖会话）"""
+        try:
+            query_embedding = self.sessions.processor.embeddings.embed_query(query)
+            results = self.library.search(query_embedding, k=k, paper_ids=paper_ids, sections=sections)
+
+            return {
+                "success": True,
+                "message": f"找到 {len(results)} 个相关片段",
+                "results": results
+            }
+
+        except Exception as e:
+            logger.error(f"论文库检索失败: {e}")
+            return {
+                "success": False,
+                "message": f"论文库检索失败: {str(e)}",
+                "results": []
+            }
+
 
 # 创建FastAPI应用
 app = FastAPI(title="PaperBot API", description="智能论文阅读助手API")
 
-# 创建应用实例
+# 创建应用实例（共享组件），用户状态按会话隔离
 paper_app = PaperAssistantApp()
 
+# 同步阻塞的处理函数（向量库、检索）统一放到I/O线程池执行，不阻塞事件循环；
+# 其中的PDF解析、embedding和重排序再转入按核数设置的CPU线程池。
+# 单问题问答的LLM调用走异步HTTP连接池，等待生成时不占用线程
+io_stage = get_executor(IO)
+
+
+def _session_or_404(session_id: str = None, paper_id: str = None) -> PaperSession:
+    """解析请求携带的会话，会话或论文不存在时返回404"""
+    session = paper_app.resolve_session(session_id, paper_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="会话不存在或论文未入库")
+    return session
+
+
+def _session_snapshot(session_id: str = None, paper_id: str = None) -> PaperSession:
+    """取会话快照用于问答，论文正在切换且等待超时时返回409"""
+    session = _session_or_404(session_id, paper_id)
+    try:
+        return session.snapshot()
+    except TimeoutError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+async def _session_from_request(request: dict) -> PaperSession:
+    # 恢复被回收的会话需要重新加载索引、等待会话锁，放到线程池中执行
+    return await io_stage.run(_session_snapshot, request.get("session_id"), request.get("paper_id"))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await io_stage.run(paper_app.jobs.shutdown)
+    # 关闭事件循环上的LLM连接池客户端
+    await paper_app.model_manager.aclose()
+
 
 @app.get("/")
 async def root():
     return {"message": "PaperBot API 正在运行"}
 
 
-@app.post("/upload")
-async def upload_paper(file: UploadFile = File(...)):
-    """上传论文"""
+@app.post("/sessions")
+async def create_session():
+    """新建会话，返回session_id，后续请求携带它即可使用各自独立的论文状态"""
+    session = await io_stage.run(paper_app.sessions.create)
+    return JSONResponse(content={"success": True, "session_id": session.session_id})
+
+
+@app.get("/sessions")
+async def list_sessions():
+    """列出活跃会话"""
+    return JSONResponse(content={
+        "success": True,
+        "sessions": paper_app.sessions.list_sessions(),
+        "stats": paper_app.sessions.stats()
+    })
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """关闭会话，释放内存中的索引（论文仍保留在论文库中）"""
+    if not await io_stage.run(paper_app.sessions.delete, session_id):
+        raise HTTPException(status_code=404, detail="会话不存在")
+    return JSONResponse(content={"success": True, "message": "会话已关闭"})
+
+
+@app.post("/upload", status_code=202)
+async def upload_paper(file: UploadFile = File(...), session_id: Optional[str] = Form(None)):
+    """上传论文，立即返回任务ID，通过 GET /jobs/{job_id} 查询进度和结果
+
+    未指定session_id时新建会话，响应中返回session_id。
+    """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="只支持PDF文件")
 
-    # 保存临时文件
+    session = await io_stage.run(paper_app.sessions.get_or_create, session_id)
+
+    # 保存临时文件（任务结束后由任务清理）
     with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
         content = await file.read()
         tmp_file.write(content)
         tmp_file_path = tmp_file.name
 
-    try:
-        # 处理论文
-        result = paper_app.upload_paper(tmp_file_path)
-        return JSONResponse(content=result)
-    finally:
-        # 清理临时文件
-        os.unlink(tmp_file_path)
+    job = paper_app.submit_upload(session, tmp_file_path, file.filename)
+    if job is None:
+        raise HTTPException(status_code=429, detail="上传任务排队已满，请稍后重试")
+
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "message": "论文已提交处理",
+        "job_id": job.job_id,
+        "session_id": session.session_id,
+        "status_url": f"/jobs/{job.job_id}"
+    })
+
+
+@app.get("/jobs")
+async def list_jobs():
+    """列出后台任务"""
+    return JSONResponse(content={
+        "success": True,
+        "jobs": paper_app.jobs.list_jobs(),
+        "stats": paper_app.jobs.stats()
+    })
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询后台任务的状态、各阶段进度和耗时，任务成功后result中包含处理结果"""
+    job = paper_app.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return JSONResponse(content=job.to_dict())
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消后台任务（排队中的任务不再执行；运行中的任务在下一个检查点退出，未完成的论文不保留）"""
+    job = paper_app.jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return JSONResponse(content=job.to_dict())
 
 
 @app.post("/ask")
 async def ask_question(request: dict):
-    """问答接口"""
+    """问答接口（请求携带session_id或paper_id）"""
     question = request.get("question", "")
     if not question:
         raise HTTPException(status_code=400, detail="问题不能为空")
 
-    result = paper_app.ask_question(question)
+    session = await _session_from_request(request)
+    result = await paper_app.ask_question(session, question)
+    return JSONResponse(content=result)
+
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: dict):
+    """流式问答接口（Server-Sent Events）
+
+    逐个推送 event: token，最后推送 event: done（包含来源和置信度）或 event: error。
+    """
+    question = request.get("question", "")
+    if not question:
+        raise HTTPException(status_code=400, detail="问题不能为空")
+
+    session = await _session_from_request(request)
+
+    async def event_stream():
+        async for event in paper_app.ask_question_stream(session, question):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/ask/batch")
+async def ask_questions(request: dict):
+    """批量问答接口：一次向量化和检索所有问题，并发生成回答，结果按问题顺序返回
+
+    stream为true时以Server-Sent Events按问题顺序逐个推送 event: answer，最后推送 event: done。
+    """
+    questions = request.get("questions") or []
+    if not questions or not isinstance(questions, list) or not all(isinstance(q, str) and q.strip() for q in questions):
+        raise HTTPException(status_code=400, detail="questions必须是非空问题列表")
+    if len(questions) > Config.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"单次最多 {Config.BATCH_MAX_QUESTIONS} 个问题")
+
+    session = await _session_from_request(request)
+
+    if request.get("stream"):
+        async def event_stream():
+            async for event in paper_app.ask_questions_stream(session, questions):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    result = await paper_app.ask_questions(session, questions)
     return JSONResponse(content=result)
 
 
@@ -226,39 +615,109 @@ async def explain_term(request: dict):
     if not term:
         raise HTTPException(status_code=400, detail="术语不能为空")
 
-    result = paper_app.explain_term(term)
+    session = await _session_from_request(request)
+    result = await io_stage.run(paper_app.explain_term, session, term)
     return JSONResponse(content=result)
 
 
 @app.get("/summary")
-async def get_summary():
+async def get_summary(session_id: Optional[str] = None, paper_id: Optional[str] = None):
     """获取论文摘要"""
-    if not paper_app.current_summary:
+    session = await io_stage.run(_session_or_404, session_id, paper_id)
+    if not session.current_summary:
         raise HTTPException(status_code=400, detail="请先上传论文")
 
     return JSONResponse(content={
         "success": True,
-        "summary": paper_app.current_summary
+        "summary": session.current_summary
     })
 
 
 @app.get("/sections/{section_name}/keypoints")
-async def get_keypoints(section_name: str):
+async def get_keypoints(section_name: str, session_id: Optional[str] = None, paper_id: Optional[str] = None):
     """获取章节关键点"""
-    result = paper_app.get_section_keypoints(section_name)
+    session = await io_stage.run(_session_or_404, session_id, paper_id)
+    result = await io_stage.run(paper_app.get_section_keypoints, session, section_name)
+    return JSONResponse(content=result)
+
+
+@app.get("/papers")
+async def list_papers(session_id: Optional[str] = None):
+    """列出论文库中的论文"""
+    session = await io_stage.run(paper_app.sessions.get, session_id or PaperAssistantApp.DEFAULT_SESSION)
+    return JSONResponse(content={
+        "success": True,
+        "current_paper_id": session.paper_id if session else None,
+        "papers": paper_app.library.list_papers()
+    })
+
+
+@app.post("/papers/{paper_id}/open")
+async def open_paper(paper_id: str, request: Optional[dict] = None):
+    """在会话中切换到已入库的论文（未指定session_id时新建会话）"""
+    session = await io_stage.run(paper_app.sessions.get_or_create, (request or {}).get("session_id"))
+    result = await io_stage.run(paper_app.open_paper, session, paper_id)
+    if not result["success"]:
+        raise HTTPException(status_code=404, detail=result["message"])
+    return JSONResponse(content=result)
+
+
+@app.delete("/papers/{paper_id}")
+async def delete_paper(paper_id: str):
+    """从论文库删除论文"""
+    if paper_app.sessions.paper_in_use(paper_id):
+        raise HTTPException(status_code=400, detail="论文正在被会话使用，不能删除")
+    if not await io_stage.run(paper_app.library.delete, paper_id):
+        raise HTTPException(status_code=404, detail="论文不存在")
+    return JSONResponse(content={"success": True, "message": "论文已删除"})
+
+
+@app.post("/library/search")
+async def search_library(request: dict):
+    """跨论文检索接口，可按论文ID和章节过滤"""
+    query = request.get("query", "")
+    if not query:
+        raise HTTPException(status_code=400, detail="查询不能为空")
+
+    result = await io_stage.run(
+        paper_app.search_library,
+        query,
+        int(request.get("k", 10)),
+        request.get("paper_ids"),
+        request.get("sections")
+    )
     return JSONResponse(content=result)
 
 
 @app.get("/status")
-async def get_status():
+async def get_status(session_id: Optional[str] = None):
     """获取应用状态"""
+    session = await io_stage.run(paper_app.sessions.get, session_id or PaperAssistantApp.DEFAULT_SESSION)
+    sessions = paper_app.sessions
+    embedding_cache = sessions.processor.embeddings.cache
     return JSONResponse(content={
         "status": "running",
-        "has_paper": paper_app.current_paper is not None,
-        "paper_title": paper_app.current_paper.get("title") if paper_app.current_paper else None
+        "has_paper": bool(session and session.current_paper),
+        "paper_title": session.current_paper.get("title") if session and session.current_paper else None,
+        "sessions": sessions.stats(),
+        "jobs": paper_app.jobs.stats(),
+        "embedding_models": model_registry.stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "llm_cache": paper_app.model_manager.cache_stats(),
+        "reranker": sessions.reranker.stats() if sessions.reranker else None,
+        "answer_cache": sessions.answer_cache.stats() if sessions.answer_cache else None,
+        "library_index": paper_app.library.index.stats(),
+        "executors": executor_stats()
     })
 
 
+@app.get("/executors")
+async def get_executors():
+    """各阶段线程池的排队深度、等待时间和执行时间"""
+    return JSONResponse(content={"success": True, "executors": executor_stats()})
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+分块策略基准：单层分块 vs 父子分块（子块检索 + 父窗口扩展）
+
+合成论文中每条事实由"锚点句"（与问题措辞相近）和相隔若干句的"答案句"组成，
+检索命中锚点句后，上下文中是否包含答案即为回答质量的代理指标；同时统计送入prompt的字符数。
+用法: python benchmarks/bench_chunking.py --facts 200 --k 4 --windows 600,900,1500
+      python benchmarks/bench_chunking.py --hashing   # 不加载embedding模型，用哈希词袋向量
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import textwrap
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.embeddings.base import Embeddings
+from core.chunk_hierarchy import ChunkHierarchy
+from core.embeddings import DocumentProcessor
+from core.flat_index import FlatIndex
+
+ADJECTIVES = ["sparse", "dense", "recurrent", "hierarchical", "contrastive", "multilingual", "lightweight", "robust"]
+NOUNS = ["transformer", "encoder", "retriever", "decoder", "classifier", "ranker", "tagger", "parser"]
+DATASETS = ["SQuAD", "MS MARCO", "CMRC", "DuReader", "GLUE", "CLUE", "XNLI", "TriviaQA"]
+FILLER = [
+    "The training schedule follows the standard warmup and linear decay recipe.",
+    "All runs use the same tokenizer and the same maximum sequence length.",
+    "Hyperparameters were selected on a held-out development split.",
+    "We report the median of three runs with different random seeds.",
+    "Gradient clipping is applied to stabilise optimisation in early steps.",
+    "The implementation is built on a widely used open-source toolkit.",
+    "Mixed precision training reduces memory use without hurting accuracy.",
+    "Evaluation scripts are identical for every system in the comparison.",
+]
+
+
+class HashingEmbeddings(Embeddings):
+    """哈希词袋向量（单词 + 相邻词对），无需加载模型，仅用于基准"""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _vector(self, text: str) -> List[float]:
+        words = re.findall(r"[a-z0-9.]+", text.lower())
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def synthetic_paper(num_facts: int, seed: int) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+    """生成章节文本和 (问题, 答案) 列表，文本按PDF提取的习惯每行约90字符折行"""
+    rng = np.random.default_rng(seed)
+    sections = {"methodology": [], "results": [], "experiments": []}
+    questions = []
+    for i in range(num_facts):
+        adjective, noun, dataset = ADJECTIVES[i % 8], NOUNS[(i // 8) % 8], DATASETS[(i // 64) % 8]
+        name = f"{adjective} {noun} M{i}"
+        answer = f"{rng.uniform(40, 99):.2f}"
+        gap = rng.choice(FILLER, size=rng.integers(1, 5), replace=False)
+        sentences = [f"We evaluate the {name} model on the {dataset} benchmark."]
+        sentences += list(gap)
+        sentences.append(f"On this benchmark the final score of the system is {answer} points.")
+        sections[list(sections)[i % 3]].append(" ".join(sentences))
+        questions.append((f"What score does the {name} model reach on the {dataset} benchmark?", answer))
+
+    texts = {name: "\n".join(textwrap.wrap(" ".join(facts), 90)) for name, facts in sections.items()}
+    return texts, questions
+
+
+def build(processor: DocumentProcessor, embeddings: Embeddings, sections: Dict[str, str]):
+    hierarchy = ChunkHierarchy()
+    documents = processor.process_paper_sections(sections, parents=hierarchy.parents)
+    for i, doc in enumerate(documents):
+        doc.metadata['chunk_uid'] = f"bench-{i}"
+    hierarchy.add_documents(documents)
+    index = FlatIndex(embedding=embeddings)
+    index.add_documents(documents, ids=[doc.metadata['chunk_uid'] for doc in documents])
+    return index, hierarchy, documents
+
+
+def evaluate(index: FlatIndex, questions, k: int, expand=None) -> Tuple[float, float, float]:
+    """返回 (上下文包含答案的比例, 平均上下文字符数, 平均上下文段数)"""
+    hits, chars, segments = [], [], []
+    for question, answer in questions:
+        docs = index.similarity_search(question, k=k)
+        if expand is not None:
+            docs = expand(docs)
+        context = "\n\n".join(doc.page_content for doc in docs)
+        hits.append(answer in context)
+        chars.append(len(context))
+        segments.append(len(docs))
+    return float(np.mean(hits)), float(np.mean(chars)), float(np.mean(segments))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分块策略基准")
+    parser.add_argument("--facts", type=int, default=200, help="合成事实（问题）数")
+    parser.add_argument("--k", type=int, default=4, help="检索的文档块数")
+    parser.add_argument("--windows", default="600,900,1500", help="父窗口扩展字符数，逗号分隔")
+    parser.add_argument("--hashing", action="store_true", help="使用哈希词袋向量代替embedding模型")
+    args = parser.parse_args()
+
+    embeddings = HashingEmbeddings() if args.hashing else None
+    sections, questions = synthetic_paper(args.facts, seed=0)
+
+    flat = DocumentProcessor(embeddings=embeddings, hierarchical=False)
+    embeddings = flat.embeddings
+    hierarchical = DocumentProcessor(embeddings=embeddings, hierarchical=True)
+
+    flat_index, _, flat_docs = build(flat, embeddings, sections)
+    child_index, hierarchy, child_docs = build(hierarchical, embeddings, sections)
+
+    print(f"📊 {args.facts} 个问题, top-{args.k}, 单层 {len(flat_docs)} 块, "
+          f"父子 {len(child_docs)} 个子块 / {len(hierarchy.parents)} 个父窗口\n")
+    print(f"{'策略':<22} {'含答案':>8} {'上下文字符':>10} {'段数':>6}")
+
+    rows = [("单层分块 (800)", evaluate(flat_index, questions, args.k)),
+            ("子块 (不扩展)", evaluate(child_index, questions, args.k))]
+    for window in (int(w) for w in args.windows.split(",")):
+        rows.append((f"父子分块 (窗口{window})",
+                     evaluate(child_index, questions, args.k, lambda docs: hierarchy.expand(docs, window))))
+
+    for name, (hit_rate, chars, segments) in rows:
+        print(f"{name:<22} {hit_rate:>7.1%} {chars:>10.0f} {segments:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+论文库HNSW索引基准：不同规模下的构建耗时、查询延迟和召回率
+
+每 --chunks-per-paper 个向量视为一篇论文，按论文增量写入（与入库流程一致）。
+对每个 ef 测量不过滤查询的 p50/p95 和相对精确检索的召回率，并测量按论文、按章节过滤的查询。
+用法: python benchmarks/bench_library_index.py --sizes 10000,100000,1000000 --dim 512 --ef 32,64,128
+注意: 100万条512维向量本身约占2GB内存，HNSW构建需要数分钟到数十分钟。
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_quantization import synthetic_embeddings
+from core.library_index import LibraryIndex
+
+SECTIONS = ["abstract", "introduction", "method", "experiments", "conclusion"]
+
+
+def build_index(vectors: np.ndarray, directory: str, chunks_per_paper: int, M: int, ef_construction: int) -> LibraryIndex:
+    index = LibraryIndex(directory, M=M, ef_construction=ef_construction)
+    for start in range(0, len(vectors), chunks_per_paper):
+        batch = vectors[start:start + chunks_per_paper]
+        index.add_paper(
+            f"paper-{start // chunks_per_paper}",
+            [str(i) for i in range(start, start + len(batch))],
+            batch,
+            [SECTIONS[i % len(SECTIONS)] for i in range(len(batch))]
+        )
+    return index
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, block: int = 100000) -> np.ndarray:
+    """分块精确计算top-k，避免一次生成 N×Q 的完整分数矩阵"""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        scores = queries @ vectors[start:start + block].T
+        ids = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_ids = np.take_along_axis(merged_ids, top, axis=1)
+    return best_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="论文库HNSW索引基准")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="文档块数量，逗号分隔")
+    parser.add_argument("--dim", type=int, default=512, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--k", type=int, default=10, help="top-k")
+    parser.add_argument("--ef", default="32,64,128", help="查询ef，逗号分隔")
+    parser.add_argument("--M", type=int, default=16, help="HNSW的M")
+    parser.add_argument("--ef-construction", type=int, default=200, help="HNSW的ef_construction")
+    parser.add_argument("--chunks-per-paper", type=int, default=200, help="每篇论文的文档块数")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    ef_values = [int(ef) for ef in args.ef.split(",")]
+
+    for size in sizes:
+        vectors = synthetic_embeddings(size, args.dim, clusters=max(size // 500, 20), seed=0)
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.integers(0, size, args.queries)] + 0.05 * rng.standard_normal(
+            (args.queries, args.dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        truth = exact_top_k(vectors, queries, args.k)
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            index = build_index(vectors, directory, args.chunks_per_paper, args.M, args.ef_construction)
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index.save()
+            save_s = time.perf_counter() - start
+            snapshot_mb = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(directory) for name in names
+            ) / 1024 / 1024
+
+            print(f"\n📊 {size} 个文档块 ({size // args.chunks_per_paper} 篇论文), 维度 {args.dim}, "
+                  f"M={args.M}, ef_construction={args.ef_construction}")
+            print(f"   构建 {build_s:.1f}s ({size / build_s:.0f} 块/秒), 快照 {save_s:.2f}s / {snapshot_mb:.0f}MB")
+            print(f"   {'ef':>6} {'p50':>9} {'p95':>9} {'召回率':>8}")
+
+            for ef in ef_values:
+                timings, recalls = [], []
+                for q, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    hits = index.search(q, k=args.k, ef=ef)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    found = {int(hit["chunk_uid"]) for hit in hits}
+                    recalls.append(len(found & set(expected.tolist())) / args.k)
+                print(f"   {ef:>6} {np.percentile(timings, 50):>7.2f}ms {np.percentile(timings, 95):>7.2f}ms "
+                      f"{np.mean(recalls):>7.1%}")
+
+            # 按单篇论文过滤走精确计算：首次需从索引取出向量（冷），之后命中论文向量缓存（热）
+            papers = size // args.chunks_per_paper
+            cold, warm = [], []
+            for i, q in enumerate(queries):
+                paper_ids = [f"paper-{i % papers}"]
+                index._paper_vectors.pop(paper_ids[0], None)
+                for timings in (cold, warm):
+                    start = time.perf_counter()
+                    index.search(q, k=args.k, paper_ids=paper_ids)
+                    timings.append((time.perf_counter() - start) * 1000)
+            print(f"   单篇论文过滤: 冷 p50 {np.percentile(cold, 50):.2f}ms, 热 p50 {np.percentile(warm, 50):.2f}ms, "
+                  f"p95 {np.percentile(warm, 95):.2f}ms")
+
+            # 按章节过滤候选多，走HNSW过滤
+            timings = []
+            for q in queries:
+                start = time.perf_counter()
+                index.search(q, k=args.k, sections=["method"])
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"   章节过滤: p50 {np.percentile(timings, 50):.2f}ms, p95 {np.percentile(timings, 95):.2f}ms")
+
+        del vectors, index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+PDF按页提取基准：串行 vs 多进程
+
+用法: python benchmarks/bench_pdf_extraction.py --pages 300 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pdf_parser import PaperParser
+from benchmarks.synthetic_pdf import generate_pdf
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF按页提取基准")
+    parser.add_argument("--pages", type=int, default=300, help="合成PDF页数")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认CPU核数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种模式重复次数（取最优）")
+    args = parser.parse_args()
+
+    paper_parser = PaperParser()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = generate_pdf(os.path.join(tmp_dir, "bench.pdf"), num_pages=args.pages)
+        print(f"📄 合成PDF: {args.pages} 页, {os.path.getsize(pdf_path) / 1024:.0f}KB")
+
+        serial_pages = paper_parser.extract_pages(pdf_path, parallel=False)
+        parallel_pages = paper_parser.extract_pages(pdf_path, parallel=True, max_workers=args.workers)
+        assert serial_pages == parallel_pages, "并行提取结果与串行不一致"
+
+        serial = _best_of(lambda: paper_parser.extract_pages(pdf_path, parallel=False), args.repeat)
+        parallel = _best_of(
+            lambda: paper_parser.extract_pages(pdf_path, parallel=True, max_workers=args.workers),
+            args.repeat
+        )
+
+    print(f"串行:   {serial:.3f}s ({args.pages / serial:.0f} 页/秒)")
+    print(f"并行:   {parallel:.3f}s ({args.pages / parallel:.0f} 页/秒)")
+    print(f"加速比: {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
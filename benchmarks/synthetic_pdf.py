@@ -0,0 +1,74 @@
+"""
+生成用于基准测试的合成论文PDF（仅依赖标准库）
+"""
+
+import random
+from typing import List
+
+SECTION_TITLES = ["Abstract", "1. Introduction", "2. Methodology", "3. Experiments and Results",
+                  "4. Discussion", "5. Conclusion", "References"]
+
+WORDS = ("model retrieval embedding transformer attention dataset benchmark baseline accuracy "
+         "latency throughput vector index chunk section paper analysis training "
+         "evaluation parameter layer token query document corpus ranking precision recall").split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(page_num: int, num_pages: int, lines_per_page: int, rng: random.Random) -> List[str]:
+    lines = []
+    if page_num == 0:
+        lines.append("A Synthetic Study of Retrieval Augmented Paper Reading")
+    # 按页数均匀插入章节标题
+    section_idx = page_num * len(SECTION_TITLES) // num_pages
+    if page_num * len(SECTION_TITLES) % num_pages < len(SECTION_TITLES):
+        lines.append(SECTION_TITLES[section_idx])
+    while len(lines) < lines_per_page:
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(12)) + ".")
+    return lines
+
+
+def generate_pdf(path: str, num_pages: int = 300, lines_per_page: int = 45, seed: int = 0) -> str:
+    """生成num_pages页的PDF，每页lines_per_page行英文文本"""
+    rng = random.Random(seed)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages对象，最后填充
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    page_ids = []
+    for page_num in range(num_pages):
+        lines = _page_lines(page_num, num_pages, lines_per_page, rng)
+        stream = "BT /F1 10 Tf 14 TL 50 800 Td\n"
+        stream += "\n".join(f"({_escape(line)}) Tj T*" for line in lines)
+        stream += "\nET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        page_ids.append(len(objects))
+
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj_id, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{obj_id} 0 obj\n{body}\nendobj\n".encode("latin-1")
+
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+               f"startxref\n{xref_offset}\n%%EOF\n").encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(output)
+    return path
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+批量入库脚本 - 遍历目录中的PDF，多进程解析，跨论文大批量embedding后写入持久化论文库
+
+清单文件记录每个PDF的处理状态，中断后重新运行会跳过已完成的文件（失败的文件会重试）。
+用法: python bulk_ingest.py papers/ --workers 8 --batch-size 512
+      python bulk_ingest.py papers/ --manifest ingest_manifest.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+from utils.config import Config
+from core.pdf_parser import PaperParser, ParsedPaper
+from core.embeddings import DocumentProcessor
+from core.ingestion import IngestionPipeline
+from core.lexical_index import LexicalIndex
+from core.chunk_hierarchy import ChunkHierarchy
+from core.paper_library import PaperLibrary
+
+logger = logging.getLogger(__name__)
+# 进度输出：命令行运行时直接打印到标准输出，作为模块使用时走普通日志
+progress = logging.getLogger(f"{__name__}.progress")
+
+_worker_parser: Optional[PaperParser] = None
+
+
+def _init_worker():
+    """解析进程初始化：已经按文件并行，单个PDF内不再启用进程池；Ctrl+C只由主进程处理"""
+    global _worker_parser
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    Config.PDF_PARALLEL_MIN_PAGES = float("inf")
+    _worker_parser = PaperParser()
+
+
+def _parse_pdf(path: str) -> Tuple[ParsedPaper, float]:
+    start_time = time.time()
+    parsed = _worker_parser.parse(path)
+    return parsed, time.time() - start_time
+
+
+class IngestManifest:
+    """断点续传清单：PDF相对路径 -> 处理状态（按文件大小和修改时间判断文件是否变化）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.files = json.load(f).get("files", {})
+            except Exception as e:
+                logger.warning(f"清单读取失败，将重新建立: {e}")
+
+    @staticmethod
+    def _fingerprint(path: str) -> Dict[str, Any]:
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+    def is_done(self, rel_path: str, path: str) -> bool:
+        entry = self.files.get(rel_path)
+        return bool(entry) and entry.get("status") == "done" and \
+            all(entry.get(key) == value for key, value in self._fingerprint(path).items())
+
+    def update(self, rel_path: str, path: str, **fields):
+        self.files[rel_path] = dict(self._fingerprint(path), updated_at=time.time(), **fields)
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class _PendingPaper:
+    """已切块、等待向量写入完成的论文"""
+    paper_id: str
+    rel_path: str
+    path: str
+    title: str
+    pages: int
+    sections: Dict[str, str]
+    vectorstore: Any
+    lexical_index: LexicalIndex = field(default_factory=LexicalIndex)
+    hierarchy: ChunkHierarchy = field(default_factory=ChunkHierarchy)
+    total_chunks: int = 0
+    written: int = 0
+    chunked: bool = False
+
+
+class BulkIngester:
+    """跨论文批量入库：多篇论文的文档块凑成大批次一次embedding，再按论文写入各自的collection"""
+
+    def __init__(
+            self,
+            library: PaperLibrary,
+            processor: DocumentProcessor,
+            manifest: IngestManifest,
+            batch_size: int = None,
+            stop_event: threading.Event = None,
+            pin: bool = True
+    ):
+        self.library = library
+        self.processor = processor
+        self.manifest = manifest
+        self.batch_size = batch_size or Config.BULK_EMBED_BATCH_SIZE
+        # 置位后在批次之间停止：写完缓冲中的文档块，未写完的论文撤销，留待下次运行重新入库
+        self.stop_event = stop_event or threading.Event()
+        # 批量导入的论文默认固定在库中，不被上传新论文时的LRU回收删除
+        self.pin = pin
+        self.pipeline = IngestionPipeline(processor)
+
+        self._buffer: List[Tuple[_PendingPaper, Document]] = []
+        self._pending: Dict[str, _PendingPaper] = {}
+        self.stats = {
+            "papers": 0, "skipped": 0, "failed": 0, "pages": 0, "chunks": 0,
+            "parse_seconds": 0.0, "embed_seconds": 0.0, "write_seconds": 0.0
+        }
+
+    def add_paper(self, parsed: ParsedPaper, rel_path: str, path: str):
+        """切块并放入embedding缓冲，缓冲满时写入"""
+        paper_id = parsed.sha256
+        if self.library.has_paper(paper_id) or paper_id in self._pending:
+            # 已入库（或本次运行中重复的同一文件）
+            self.stats["skipped"] += 1
+            self.manifest.update(rel_path, path, status="done", paper_id=paper_id, skipped=True)
+            progress.info(f"⏭️  已在论文库中: {rel_path}")
+            return
+
+        title = parsed.sections.get("title") or parsed.metadata.get("title") or "未知论文"
+        vectorstore = self.library.create(paper_id, title, parsed.metadata, pinned=self.pin)
+        if vectorstore is None:
+            self.record_failure(rel_path, path, "同一论文正在入库")
+            return
+        paper = _PendingPaper(
+            paper_id=paper_id,
+            rel_path=rel_path,
+            path=path,
+            title=title,
+            pages=parsed.metadata.get("pages", len(parsed.pages)),
+            sections=parsed.sections,
+            vectorstore=vectorstore
+        )
+        self._pending[paper_id] = paper
+
+        try:
+            for doc in self.pipeline.iter_chunks(parsed.pages, chunk_prefix=paper_id[:16],
+                                                 parents=paper.hierarchy.parents):
+                paper.total_chunks += 1
+                self._buffer.append((paper, doc))
+                if len(self._buffer) >= self.batch_size:
+                    if self.stop_event.is_set():
+                        break
+                    self.flush()
+            else:
+                paper.chunked = True
+        except Exception as e:
+            self._fail(paper, f"入库失败: {e}")
+            return
+        if not paper.chunked:
+            # 切块途中收到中断：本论文撤销，缓冲中其他论文的文档块写完
+            self.stop()
+            return
+
+        if paper.total_chunks == 0:
+            self._fail(paper, "没有可入库的内容")
+
+    def flush(self):
+        """对缓冲中的文档块一次embedding，按论文upsert到各自的collection"""
+        if not self._buffer:
+            self._finish_ready()
+            return
+        buffer, self._buffer = self._buffer, []
+
+        start_time = time.time()
+        vectors = self.processor.embeddings.embed_documents([doc.page_content for _, doc in buffer])
+        self.stats["embed_seconds"] += time.time() - start_time
+
+        start_time = time.time()
+        groups: Dict[str, List[Tuple[Document, List[float]]]] = {}
+        for (paper, doc), vector in zip(buffer, vectors):
+            groups.setdefault(paper.paper_id, []).append((doc, vector))
+        for paper_id, items in groups.items():
+            paper = self._pending[paper_id]
+            docs = [doc for doc, _ in items]
+            paper.vectorstore._collection.upsert(
+                ids=[doc.metadata["chunk_uid"] for doc in docs],
+                embeddings=[vector for _, vector in items],
+                metadatas=[doc.metadata for doc in docs],
+                documents=[doc.page_content for doc in docs]
+            )
+            paper.lexical_index.add_documents(docs)
+            paper.hierarchy.add_documents(docs)
+            paper.written += len(docs)
+        self.stats["write_seconds"] += time.time() - start_time
+        self.stats["chunks"] += len(buffer)
+
+        self._finish_ready()
+
+    def _finish_ready(self):
+        """全部文档块已写入的论文：保存附属数据并标记入库完成"""
+        for paper in [p for p in self._pending.values() if p.chunked and p.written == p.total_chunks]:
+            library = self.library
+            library.save_artifact(paper.paper_id, "sections", paper.sections)
+            library.save_artifact(paper.paper_id, "lexical_index", paper.lexical_index.to_dict())
+            library.save_artifact(paper.paper_id, "chunk_hierarchy", paper.hierarchy.to_dict())
+            if not library.mark_ready(paper.paper_id, paper.total_chunks):
+                self._fail(paper, "论文记录在入库期间被删除")
+                continue
+            del self._pending[paper.paper_id]
+
+            self.stats["papers"] += 1
+            self.stats["pages"] += paper.pages
+            self.manifest.update(paper.rel_path, paper.path, status="done", paper_id=paper.paper_id,
+                                 title=paper.title, pages=paper.pages, chunks=paper.total_chunks)
+            progress.info(f"✅ {paper.rel_path}: {paper.pages} 页, {paper.total_chunks} 个文档块")
+
+    def close(self):
+        """写入剩余缓冲；因批次写入失败而无法完成的论文记为失败"""
+        self.flush()
+        for paper in list(self._pending.values()):
+            self._fail(paper, "文档块未全部写入")
+
+    def stop(self):
+        """中断入库：写入缓冲中已切块完成的论文，其余未写完的论文撤销（不留下入库中的记录）
+
+        撤销的论文在清单中不记为完成，下次运行重新入库。
+        """
+        # 尚未切块完的论文先移出缓冲，其余论文的文档块照常写完
+        interrupted = [paper for paper in self._pending.values() if not paper.chunked]
+        for paper in interrupted:
+            self._discard(paper)
+        try:
+            self.flush()
+        finally:
+            # 写入失败时剩下的论文同样撤销
+            interrupted.extend(self._pending.values())
+            for paper in interrupted:
+                self._discard(paper)
+                progress.warning(f"⏹️  {paper.rel_path}: 已中断，下次运行重新入库")
+
+    def _discard(self, paper: _PendingPaper):
+        """丢弃论文的缓冲和入库中的collection"""
+        self._pending.pop(paper.paper_id, None)
+        self._buffer = [item for item in self._buffer if item[0] is not paper]
+        self.library.abort(paper.paper_id)
+
+    def _fail(self, paper: _PendingPaper, error: str):
+        self._discard(paper)
+        self.record_failure(paper.rel_path, paper.path, error)
+
+    def record_failure(self, rel_path: str, path: str, error: str):
+        self.stats["failed"] += 1
+        self.manifest.update(rel_path, path, status="failed", error=error)
+        progress.error(f"❌ {rel_path}: {error}")
+
+
+def find_pdfs(directory: str) -> List[str]:
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def run(args) -> int:
+    directory = os.path.abspath(args.directory)
+    manifest = IngestManifest(args.manifest or os.path.join(directory, ".bulk_ingest.json"))
+    pdfs = find_pdfs(directory)
+    todo = [path for path in pdfs if not manifest.is_done(os.path.relpath(path, directory), path)]
+    progress.info(f"📂 {directory}: {len(pdfs)} 个PDF，已完成 {len(pdfs) - len(todo)} 个，待处理 {len(todo)} 个")
+    if not todo:
+        return 0
+
+    processor = DocumentProcessor()
+    library = PaperLibrary(processor.embeddings)
+    workers = args.workers or os.cpu_count() or 1
+
+    # 第一次Ctrl+C在当前批次写完后停止（不在向量库写入中途打断），第二次强制退出
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        if stop_event.is_set():
+            raise KeyboardInterrupt
+        stop_event.set()
+        progress.warning("⚠️  收到中断，写完当前批次后退出（再按一次Ctrl+C强制退出）")
+
+    signal.signal(signal.SIGINT, request_stop)
+    ingester = BulkIngester(library, processor, manifest, args.batch_size, stop_event, pin=not args.no_pin)
+
+    start_time = time.time()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    try:
+        queue = list(reversed(todo))
+        futures = {}
+        while (queue or futures) and not stop_event.is_set():
+            # 解析结果按文件消费，同时在途的任务数有上限，解析快于embedding时不会堆积内存
+            while queue and len(futures) < workers * 2:
+                path = queue.pop()
+                futures[executor.submit(_parse_pdf, path)] = path
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = futures.pop(future)
+                rel_path = os.path.relpath(path, directory)
+                try:
+                    parsed, parse_seconds = future.result()
+                except Exception as e:
+                    ingester.record_failure(rel_path, path, f"解析失败: {e}")
+                    continue
+                ingester.stats["parse_seconds"] += parse_seconds
+                if stop_event.is_set():
+                    break
+                try:
+                    ingester.add_paper(parsed, rel_path, path)
+                except Exception as e:
+                    ingester.record_failure(rel_path, path, f"入库失败: {e}")
+
+        if stop_event.is_set():
+            ingester.stop()
+        else:
+            ingester.close()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        library.save_index()
+
+    interrupted = stop_event.is_set()
+    if interrupted:
+        # 未写完的论文在清单中不是done，下次运行重新入库
+        progress.warning("⚠️  已中断，重新运行同一命令即可从中断处继续")
+
+    elapsed = max(time.time() - start_time, 1e-9)
+    stats = ingester.stats
+    progress.info(f"📊 入库 {stats['papers']} 篇，跳过 {stats['skipped']} 篇，失败 {stats['failed']} 篇，"
+          f"耗时 {elapsed:.1f}秒")
+    progress.info(f"   吞吐: {stats['pages'] / elapsed:.1f} 页/秒, {stats['chunks'] / elapsed:.1f} 文档块/秒")
+    progress.info(f"   解析 {stats['parse_seconds']:.1f}秒（{workers} 个进程累计）, "
+          f"embedding {stats['embed_seconds']:.1f}秒, 写入 {stats['write_seconds']:.1f}秒")
+
+    unpinned = sum(1 for record in library.list_papers() if not record.get("pinned"))
+    if Config.LIBRARY_MAX_PAPERS and unpinned > Config.LIBRARY_MAX_PAPERS:
+        progress.warning(f"⚠️  论文库中未固定的论文共 {unpinned} 篇，超过 LIBRARY_MAX_PAPERS={Config.LIBRARY_MAX_PAPERS}，"
+              f"下次上传论文时会按LRU回收，请调大该配置")
+    return 130 if interrupted else (1 if stats["failed"] else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量入库目录中的PDF论文")
+    parser.add_argument("directory", help="PDF所在目录（递归查找）")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数，默认CPU核数")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"跨论文embedding批次大小，默认 {Config.BULK_EMBED_BATCH_SIZE}")
+    parser.add_argument("--manifest", default=None, help="清单文件路径，默认 <目录>/.bulk_ingest.json")
+    parser.add_argument("--no-pin", action="store_true",
+                        help="不固定导入的论文（默认固定，不参与LIBRARY_MAX_PAPERS回收）")
+    parser.add_argument("--verbose", action="store_true", help="输出详细日志")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    progress.addHandler(handler)
+    progress.setLevel(logging.INFO)
+    progress.propagate = False
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
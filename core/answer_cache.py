@@ -0,0 +1,150 @@
+import numpy as np
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from utils.config import Config
+from core.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class _PaperAnswers:
+    """单篇论文的缓存条目：问题向量矩阵 + 对应的回答结果"""
+
+    def __init__(self, version: Any):
+        self.version = version
+        self.vectors: Optional[np.ndarray] = None
+        self.questions: List[str] = []
+        self.results: List[Dict[str, Any]] = []
+        self.last_used: List[float] = []
+
+
+class SemanticAnswerCache:
+    """语义回答缓存 - 按论文缓存 (问题向量, 回答, 来源, 置信度)
+
+    新问题与已缓存问题的余弦相似度达到阈值即直接返回缓存的回答，换一种说法的同一问题
+    不再重复检索和调用LLM。论文重新入库后版本变化，该论文的缓存整体失效。
+    """
+
+    def __init__(self, threshold: float = None, max_entries: int = None, ttl: float = None):
+        self.threshold = threshold if threshold is not None else Config.ANSWER_CACHE_THRESHOLD
+        self.max_entries = max_entries or Config.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else Config.ANSWER_CACHE_TTL
+
+        self._papers: Dict[str, _PaperAnswers] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _entries(self, paper_id: str, version: Any) -> Optional[_PaperAnswers]:
+        entries = self._papers.get(paper_id)
+        if entries is not None and entries.version != version:
+            # 论文已重新入库，旧回答对应的是旧的索引内容
+            del self._papers[paper_id]
+            logger.info(f"论文已重新入库，清空语义回答缓存: {paper_id[:12]}")
+            return None
+        return entries
+
+    def _expire(self, entries: _PaperAnswers):
+        if not self.ttl:
+            return
+        now = time.time()
+        keep = [i for i, result in enumerate(entries.results) if now - result["cached_at"] <= self.ttl]
+        if len(keep) < len(entries.results):
+            self._keep_rows(entries, keep)
+
+    @staticmethod
+    def _keep_rows(entries: _PaperAnswers, rows: List[int]):
+        entries.vectors = entries.vectors[rows] if rows else None
+        entries.questions = [entries.questions[i] for i in rows]
+        entries.results = [entries.results[i] for i in rows]
+        entries.last_used = [entries.last_used[i] for i in rows]
+
+    def lookup(
+            self,
+            paper_id: str,
+            version: Any,
+            question: str,
+            embedding: Sequence[float]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """查找语义相近的已回答问题，返回 (回答结果, 相似度)，未命中返回None"""
+        query = self._normalize(embedding)
+        normalized = normalize_text(question)
+        with self._lock:
+            entries = self._entries(paper_id, version)
+            if entries is not None:
+                self._expire(entries)
+            if entries is None or entries.vectors is None:
+                self.misses += 1
+                return None
+
+            scores = entries.vectors @ query
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if entries.questions[best] == normalized:
+                similarity = 1.0
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            entries.last_used[best] = time.time()
+            self.hits += 1
+            result = dict(entries.results[best])
+
+        logger.info(f"语义回答缓存命中: 相似度 {similarity:.3f}，原问题: {result.get('question', '')[:30]}")
+        return result, similarity
+
+    def store(
+            self,
+            paper_id: str,
+            version: Any,
+            question: str,
+            embedding: Sequence[float],
+            result: Dict[str, Any]
+    ):
+        """缓存一次回答（置信度为0的兜底回答不缓存）"""
+        if not result.get("answer") or not result.get("confidence"):
+            return
+
+        vector = self._normalize(embedding)[None, :]
+        with self._lock:
+            entries = self._entries(paper_id, version)
+            if entries is None:
+                entries = self._papers[paper_id] = _PaperAnswers(version)
+
+            now = time.time()
+            entries.vectors = vector if entries.vectors is None else np.vstack([entries.vectors, vector])
+            entries.questions.append(normalize_text(question))
+            entries.results.append(dict(result, cached_at=now))
+            entries.last_used.append(now)
+
+            # 超出上限时淘汰最久未命中的条目
+            if len(entries.results) > self.max_entries:
+                order = np.argsort(entries.last_used, kind="stable")[len(entries.results) - self.max_entries:]
+                self._keep_rows(entries, sorted(order.tolist()))
+
+    def invalidate(self, paper_id: str = None):
+        """清空某篇论文（不指定时为全部论文）的缓存"""
+        with self._lock:
+            if paper_id is None:
+                self._papers.clear()
+            else:
+                self._papers.pop(paper_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "papers": len(self._papers),
+                "entries": sum(len(entries.results) for entries in self._papers.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "threshold": self.threshold
+            }
@@ -0,0 +1,99 @@
+from langchain.docstore.document import Document
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkHierarchy:
+    """父子分块的偏移表：子块 → (父窗口ID, 子块在父窗口中的起止偏移)
+
+    检索只在小的子块上进行，回答时按偏移表把命中的子块扩展为父窗口中的一段上下文；
+    同一父窗口中命中的多个子块合并为一段，不重复占用prompt。
+    """
+
+    VERSION = 1
+
+    def __init__(self, parents: Dict[str, str] = None):
+        # 父窗口ID -> 父窗口文本；由DocumentProcessor切分时写入
+        self.parents: Dict[str, str] = parents if parents is not None else {}
+        self.children: Dict[str, Tuple[str, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.children)
+
+    def add_documents(self, documents: Iterable[Document]):
+        """登记子块的父窗口和偏移（需已分配chunk_uid）"""
+        for doc in documents:
+            parent_id = doc.metadata.get('parent_id')
+            chunk_uid = doc.metadata.get('chunk_uid')
+            if parent_id in self.parents and chunk_uid:
+                self.children[chunk_uid] = (
+                    parent_id, doc.metadata.get('child_start', 0), doc.metadata.get('child_end', 0)
+                )
+
+    def expand(self, documents: List[Document], window_chars: int = None) -> List[Document]:
+        """把子块扩展为父窗口上下文，保持相关性顺序（按父窗口首次命中的位置）
+
+        同一父窗口中命中的子块取并集后向两侧扩展，总长不超过window_chars（父窗口更短时取整个父窗口）。
+        不在偏移表中的文档块（旧论文或关键词检索结果）原样保留。
+        """
+        window_chars = window_chars or Config.PARENT_WINDOW_CHARS
+        groups: Dict[str, List[Tuple[Document, int, int]]] = {}
+        order: List[Any] = []
+
+        for doc in documents:
+            entry = self.children.get(doc.metadata.get('chunk_uid'))
+            if entry is None:
+                order.append(doc)
+                continue
+            parent_id, start, end = entry
+            if parent_id not in groups:
+                groups[parent_id] = []
+                order.append(parent_id)
+            groups[parent_id].append((doc, start, end))
+
+        expanded = []
+        for item in order:
+            if isinstance(item, Document):
+                expanded.append(item)
+                continue
+
+            parent_text = self.parents[item]
+            hits = groups[item]
+            start = min(hit[1] for hit in hits)
+            end = max(hit[2] for hit in hits)
+            # 命中范围本身超过窗口时保留命中范围，否则向两侧均匀扩展，一侧到边界时余量补给另一侧
+            padding = max(window_chars - (end - start), 0)
+            start, end = start - padding // 2, end + padding - padding // 2
+            if start < 0:
+                start, end = 0, end - start
+            if end > len(parent_text):
+                start, end = max(start - (end - len(parent_text)), 0), len(parent_text)
+
+            # 元数据取相关性最高的子块（保留其相似度供置信度估算）
+            metadata = dict(hits[0][0].metadata)
+            metadata.update({
+                'expanded_from': [hit[0].metadata.get('chunk_uid') for hit in hits],
+                'content_length': end - start
+            })
+            expanded.append(Document(page_content=parent_text[start:end].strip(), metadata=metadata))
+
+        return expanded
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.VERSION,
+            "parents": self.parents,
+            "children": {chunk_uid: list(entry) for chunk_uid, entry in self.children.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["ChunkHierarchy"]:
+        """从附属数据恢复，版本不兼容时返回None"""
+        if not data or data.get("version") != cls.VERSION:
+            return None
+        hierarchy = cls(dict(data["parents"]))
+        hierarchy.children = {chunk_uid: tuple(entry) for chunk_uid, entry in data["children"].items()}
+        return hierarchy
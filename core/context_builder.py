@@ -0,0 +1,218 @@
+from langchain.docstore.document import Document
+import logging
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符：按字估算token，其余非空白字符按平均每token字符数估算
+_CJK_PATTERN = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]")
+_WHITESPACE_PATTERN = re.compile(r"\s")
+# 相邻文档块重叠部分的最短长度，更短的公共前后缀视为巧合
+MIN_OVERLAP_CHARS = 20
+# 句子边界，截断时尽量停在句末（PDF提取文本的换行多为折行，不作为边界；英文标点后需跟空白，避免切开小数）
+_SENTENCE_END = re.compile(r"[。！？；]|[.!?;](?=\s)")
+
+
+def estimate_tokens(text: str) -> int:
+    """没有本地分词器时的token数估算（偏保守，宁可少放一点上下文）"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk - len(_WHITESPACE_PATTERN.findall(text))
+    return int(math.ceil(cjk * Config.CONTEXT_CJK_TOKENS_PER_CHAR + other / Config.CONTEXT_CHARS_PER_TOKEN))
+
+
+class TokenCounter:
+    """按模型计数token：优先使用dashscope本地分词器（依赖tiktoken），不可用时按字符估算"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._tokenizer = None
+        try:
+            import dashscope
+            self._tokenizer = dashscope.get_tokenizer(model_name)
+        except Exception as e:
+            logger.warning(f"本地分词器不可用，按字符数估算token ({model_name}): {e}")
+
+    @property
+    def exact(self) -> bool:
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text))
+        return estimate_tokens(text)
+
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name: str = None) -> TokenCounter:
+    """每个模型共享一个计数器（分词器只加载一次）"""
+    model_name = model_name or Config.LLM_MODEL
+    with _counters_lock:
+        counter = _counters.get(model_name)
+        if counter is None:
+            counter = _counters[model_name] = TokenCounter(model_name)
+        return counter
+
+
+def _overlap(left: str, right: str) -> int:
+    """left的后缀与right的前缀重合的最大长度（不足MIN_OVERLAP_CHARS时返回0）"""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    # 只在probe出现的位置比较，第一个匹配位置即最长重叠
+    pos = left.find(probe, max(len(left) - len(right), 0))
+    while pos != -1:
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+    return 0
+
+
+def _chunk_position(doc: Document) -> Optional[int]:
+    """文档块在论文中的顺序号（chunk_uid形如 前缀-序号），无法解析时返回None
+
+    父窗口扩展后的段沿用子块的chunk_uid，顺序号不代表文本相邻，只按文本重叠合并。
+    """
+    if doc.metadata.get('expanded_from'):
+        return None
+    chunk_uid = doc.metadata.get('chunk_uid') or ""
+    _, _, index = chunk_uid.rpartition("-")
+    return int(index) if index.isdigit() else None
+
+
+@dataclass
+class _Segment:
+    section: str
+    text: str
+    rank: int
+    position: Optional[int]
+    documents: List[Document] = field(default_factory=list)
+
+
+class ContextBuilder:
+    """在token预算内组装上下文
+
+    1. 同一章节中相邻（顺序号连续或文本首尾重叠）的文档块合并成一段，去掉重复的重叠文本；
+    2. 被其他文档块完整包含的文档块直接丢弃；
+    3. 各段按相关性（段内最靠前的检索排名）排序，依次放入，超出预算的段截断到句末或跳过。
+    """
+
+    def __init__(self, model_name: str = None, budget: int = None, counter: TokenCounter = None):
+        self.model_name = model_name or Config.LLM_MODEL
+        self.budget = budget or Config.CONTEXT_TOKEN_BUDGETS.get(self.model_name, Config.CONTEXT_TOKEN_BUDGET)
+        self.counter = counter or get_token_counter(self.model_name)
+
+    @staticmethod
+    def _header(section: str) -> str:
+        return f"[章节:{section}] "
+
+    def naive_context(self, documents: List[Document]) -> str:
+        """逐块拼接的原始上下文，用于统计节省的token"""
+        return "\n\n".join(
+            f"{self._header(doc.metadata.get('section', 'unknown'))}{doc.page_content.strip()}" for doc in documents
+        )
+
+    def _merge(self, documents: List[Document]) -> List[_Segment]:
+        segments: List[_Segment] = []
+        by_section: Dict[str, List[_Segment]] = {}
+        for rank, doc in enumerate(documents):
+            section = doc.metadata.get('section', 'unknown')
+            text = doc.page_content.strip()
+            if not text:
+                continue
+            by_section.setdefault(section, []).append(
+                _Segment(section, text, rank, _chunk_position(doc), [doc])
+            )
+
+        for section, items in by_section.items():
+            # 按论文中的顺序排列，没有顺序号的保持检索顺序
+            items.sort(key=lambda item: (item.position is None, item.position or 0, item.rank))
+            merged: List[_Segment] = []
+            for item in items:
+                previous = merged[-1] if merged else None
+                if previous is not None and item.text in previous.text:
+                    previous.rank = min(previous.rank, item.rank)
+                    previous.documents.extend(item.documents)
+                    continue
+                if previous is not None and previous.text in item.text:
+                    item.rank = min(previous.rank, item.rank)
+                    item.documents = previous.documents + item.documents
+                    merged[-1] = item
+                    continue
+
+                overlap = _overlap(previous.text, item.text) if previous is not None else 0
+                adjacent = (previous is not None and previous.position is not None
+                            and item.position is not None and item.position == previous.position + 1)
+                if overlap or adjacent:
+                    joiner = "" if overlap else "\n"
+                    previous.text = previous.text + joiner + item.text[overlap:]
+                    previous.rank = min(previous.rank, item.rank)
+                    previous.position = item.position
+                    previous.documents.extend(item.documents)
+                else:
+                    merged.append(item)
+            segments.extend(merged)
+
+        return sorted(segments, key=lambda segment: segment.rank)
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """截断到不超过max_tokens，尽量停在句末"""
+        tokens = self.counter.count(text)
+        if tokens <= max_tokens:
+            return text
+        cut = int(len(text) * max_tokens / tokens)
+        while cut > 0 and self.counter.count(text[:cut]) > max_tokens:
+            cut = int(cut * 0.9)
+        boundaries = [m.end() for m in _SENTENCE_END.finditer(text, 0, cut)]
+        # 句末离截断点太远时直接按字符截断
+        if boundaries and boundaries[-1] >= cut * 0.6:
+            cut = boundaries[-1]
+        return text[:cut].rstrip()
+
+    def build(self, documents: List[Document], budget: int = None) -> Tuple[str, List[Document], Dict[str, Any]]:
+        """组装上下文，返回 (上下文, 实际使用的文档块, 统计信息)"""
+        budget = budget or self.budget
+        segments = self._merge(documents)
+
+        parts: List[str] = []
+        used: List[Document] = []
+        used_tokens = 0
+        truncated = 0
+        separator_tokens = self.counter.count("\n\n")
+        for segment in segments:
+            part = f"{self._header(segment.section)}{segment.text}"
+            cost = self.counter.count(part) + (separator_tokens if parts else 0)
+            remaining = budget - used_tokens
+            if cost > remaining:
+                # 剩余预算足够容纳一段有意义的内容时截断放入，否则尝试后面更短的段
+                if remaining < Config.CONTEXT_MIN_SEGMENT_TOKENS:
+                    continue
+                part = self._truncate(part, remaining - (separator_tokens if parts else 0))
+                cost = self.counter.count(part) + (separator_tokens if parts else 0)
+                truncated += 1
+            parts.append(part)
+            used.extend(segment.documents)
+            used_tokens += cost
+
+        context = "\n\n".join(parts)
+        naive_tokens = self.counter.count(self.naive_context(documents))
+        stats = {
+            "chunks": len(documents),
+            "segments": len(parts),
+            "truncated": truncated,
+            "tokens": used_tokens,
+            "naive_tokens": naive_tokens,
+            "saved_tokens": max(naive_tokens - used_tokens, 0),
+            "budget": budget,
+            "exact_tokens": self.counter.exact
+        }
+        return context, used, stats
@@ -0,0 +1,208 @@
+import numpy as np
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：Unicode兼容形式 + 折叠空白，使排版差异不影响缓存命中"""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text: str) -> str:
+    """规范化文本的内容哈希"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """基于内容哈希的磁盘embedding缓存
+
+    向量存放在内存映射的定长数组中（每个槽位一行），
+    SQLite索引记录 文本哈希 -> 槽位 的映射，满额时按LRU淘汰并复用槽位。
+    每批写入只增量更新变化的索引行：先提交被淘汰映射的删除，再改写槽位并落盘，最后写入新映射，
+    中途崩溃时索引不会指向内容不符的槽位。
+    """
+
+    def __init__(
+            self,
+            model_name: str,
+            dim: int,
+            cache_dir: str = None,
+            max_entries: int = None,
+            dtype: str = None
+    ):
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = max_entries or Config.EMBEDDING_CACHE_MAX_ENTRIES
+        self.dtype = np.dtype(dtype or Config.EMBEDDING_CACHE_DTYPE)
+
+        safe_name = re.sub(r"[^0-9A-Za-z_.-]", "_", model_name)
+        self.cache_dir = os.path.join(cache_dir or Config.EMBEDDING_CACHE_DIR, safe_name)
+        self.vectors_path = os.path.join(self.cache_dir, f"vectors.{self.dtype.name}.mmap")
+        self.index_path = os.path.join(self.cache_dir, "index.sqlite3")
+
+        self._lock = threading.Lock()
+        # 文本哈希 -> 槽位，按访问顺序排列（最久未用的在前）
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._free_slots: List[int] = []
+        # 访问序号；命中时只更新内存，随下一次写入批量持久化
+        self._tick = 0
+        self._touched: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        """打开（或重建）向量文件和索引"""
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER, tick INTEGER)"
+        )
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        layout = {"dim": str(self.dim), "dtype": self.dtype.name, "capacity": str(self.capacity)}
+        compatible = os.path.exists(self.vectors_path) and all(
+            meta.get(key) == value for key, value in layout.items()
+        )
+
+        if not compatible:
+            if meta:
+                logger.warning(f"embedding缓存格式不匹配，重建缓存: {self.cache_dir}")
+            self._conn.execute("DELETE FROM entries")
+            self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", layout.items())
+            self._conn.commit()
+
+        mode = "r+" if compatible else "w+"
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=self.dtype, mode=mode, shape=(self.capacity, self.dim)
+        )
+
+        rows = self._conn.execute("SELECT key, slot, tick FROM entries ORDER BY tick").fetchall()
+        self._index = OrderedDict((key, slot) for key, slot, _ in rows)
+        self._tick = rows[-1][2] if rows else 0
+        used = set(self._index.values())
+        self._free_slots = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+
+        logger.info(f"embedding缓存就绪: {self.cache_dir}，已有 {len(self._index)} 条")
+
+    def _touch(self, key: str):
+        self._tick += 1
+        self._index.move_to_end(key)
+        self._touched[key] = self._tick
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """批量查询，未命中的位置为None"""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                key = text_hash(text)
+                slot = self._index.get(key)
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self._touch(key)
+                self.hits += 1
+                results.append(np.asarray(self._vectors[slot], dtype=np.float32))
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """批量写入，满额时淘汰最久未使用的条目"""
+        if not texts:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            evicted: List[str] = []
+            # 新条目: (哈希, 槽位, 向量, 槽位是否来自空闲列表)
+            writes = []
+            for text, vector in zip(texts, vectors):
+                key = text_hash(text)
+                slot = self._index.get(key)
+                if slot is None:
+                    free = bool(self._free_slots)
+                    if free:
+                        slot = self._free_slots.pop()
+                    else:
+                        old_key, slot = self._index.popitem(last=False)
+                        self._touched.pop(old_key, None)
+                        evicted.append(old_key)
+                        self.evictions += 1
+                    self._index[key] = slot
+                    writes.append((key, slot, vector, free))
+                self._touch(key)
+
+            # 内存映射的脏页随时可能写回磁盘，槽位被改写前，被淘汰的旧映射必须已从索引中删除并提交
+            if evicted:
+                try:
+                    self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"embedding缓存索引写入失败，本批向量不缓存: {e}")
+                    # 旧映射仍指向被淘汰的槽位，不能改写（重启前不再使用）；空闲槽位归还
+                    for key, slot, _, free in writes:
+                        self._index.pop(key, None)
+                        self._touched.pop(key, None)
+                        if free:
+                            self._free_slots.append(slot)
+                    return
+
+            for _, slot, vector, _ in writes:
+                self._vectors[slot] = vector.astype(self.dtype)
+            try:
+                # 向量落盘后再写入新映射
+                self._vectors.flush()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (key, slot, tick) VALUES (?, ?, ?)",
+                    [(key, self._index[key], tick) for key, tick in self._touched.items()]
+                )
+                self._conn.commit()
+                self._touched.clear()
+            except sqlite3.Error as e:
+                logger.warning(f"embedding缓存索引写入失败: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+_caches: Dict[str, Optional[EmbeddingCache]] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str, dim: int) -> Optional[EmbeddingCache]:
+    """获取进程内共享的embedding缓存（未启用时返回None）"""
+    if not Config.EMBEDDING_CACHE_ENABLED:
+        return None
+
+    with _caches_lock:
+        if model_name not in _caches:
+            try:
+                _caches[model_name] = EmbeddingCache(model_name, dim)
+            except Exception as e:
+                # 初始化失败后不再重试，直接走模型
+                logger.warning(f"embedding缓存初始化失败，跳过缓存: {e}")
+                _caches[model_name] = None
+        return _caches[model_name]
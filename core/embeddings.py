@@ -1,64 +1,188 @@
-from sentence_transformers import SentenceTransformer
 from langchain.embeddings.base import Embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
 from langchain.vectorstores import Chroma
+from langchain.vectorstores.base import VectorStore
 import logging
+import threading
 import uuid
-import shutil
 import os
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
 from utils.config import Config
+from core.model_registry import model_registry
+from core.embedding_cache import get_embedding_cache, normalize_text
+from core.flat_index import FlatIndex
+from core.quantization import STORAGE_FORMATS
+from core.executors import CPU, run_stage
 
 logger = logging.getLogger(__name__)
 
 
+class QueryEmbeddingLRU:
+    """查询向量的内存LRU，按 (模型名, 规范化问题) 缓存，所有会话共享"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or Config.QUERY_EMBEDDING_CACHE_SIZE
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        key = (model_name, normalize_text(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(vector)
+
+    def put(self, model_name: str, text: str, vector: List[float]):
+        key = (model_name, normalize_text(text))
+        with self._lock:
+            # 存为元组，避免调用方修改缓存内容
+            self._entries[key] = tuple(vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# 进程内共享的查询向量缓存
+query_embedding_cache = QueryEmbeddingLRU()
+
+
 class ChineseEmbeddings(Embeddings):
     def __init__(self, model_name: str = None):
-        """初始化中文embedding模型"""
+        """初始化中文embedding模型（模型由进程级注册表共享，只加载一次）"""
         self.model_name = model_name or Config.EMBEDDING_MODEL
         try:
-            self.model = SentenceTransformer(self.model_name)
-            logger.info(f"成功加载embedding模型: {self.model_name}")
+            self.model = model_registry.get_embedding_model(self.model_name)
         except Exception as e:
             logger.error(f"模型加载失败: {e}")
             raise
 
+        # 按内容哈希缓存的文档向量，命中时不经过模型
+        self.cache = get_embedding_cache(
+            self.model_name, self.model.get_sentence_embedding_dimension()
+        )
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """文档向量化"""
+        """文档向量化（优先读取embedding缓存）"""
         try:
-            embeddings = self.model.encode(
-                texts,
-                normalize_embeddings=True,
-                show_progress_bar=True
-            )
-            return embeddings.tolist()
+            if self.cache is None:
+                return self._encode_documents(texts).tolist()
+
+            cached = self.cache.get_many(texts)
+            miss_indices = [i for i, vector in enumerate(cached) if vector is None]
+            if miss_indices:
+                miss_texts = [texts[i] for i in miss_indices]
+                miss_vectors = self._encode_documents(miss_texts)
+                self.cache.put_many(miss_texts, miss_vectors)
+                for i, vector in zip(miss_indices, miss_vectors):
+                    cached[i] = vector
+
+            logger.info(f"文档向量化完成: {len(texts)} 条，缓存命中 {len(texts) - len(miss_indices)} 条")
+            return [vector.tolist() for vector in cached]
         except Exception as e:
             logger.error(f"文档向量化失败: {e}")
             raise
 
+    def _encode_documents(self, texts: List[str]):
+        # encode是CPU密集阶段，在CPU线程池中执行，并发请求不会超额占用核数
+        return run_stage(
+            CPU,
+            self.model.encode,
+            texts,
+            normalize_embeddings=True,
+            show_progress_bar=True
+        )
+
     def embed_query(self, text: str) -> List[float]:
-        """查询向量化"""
+        """查询向量化（重复的问题直接读取查询向量缓存）"""
+        try:
+            cached = query_embedding_cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
+
+            embedding = run_stage(CPU, self.model.encode, [text], normalize_embeddings=True)[0].tolist()
+            query_embedding_cache.put(self.model_name, text, embedding)
+            return embedding
+        except Exception as e:
+            logger.error(f"查询向量化失败: {e}")
+            raise
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """批量查询向量化：未命中查询向量缓存的问题合并为一次encode调用"""
         try:
-            embedding = self.model.encode([text], normalize_embeddings=True)
-            return embedding[0].tolist()
+            vectors = [query_embedding_cache.get(self.model_name, text) for text in texts]
+            missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+            if missing:
+                encoded = run_stage(CPU, self.model.encode, missing, normalize_embeddings=True)
+                encoded = dict(zip(missing, encoded.tolist()))
+                for text, vector in encoded.items():
+                    query_embedding_cache.put(self.model_name, text, vector)
+                vectors = [vector if vector is not None else encoded[text] for text, vector in zip(texts, vectors)]
+            logger.info(f"批量查询向量化完成: {len(texts)} 条，编码 {len(missing)} 条")
+            return vectors
         except Exception as e:
             logger.error(f"查询向量化失败: {e}")
             raise
 
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(
+            self,
+            embeddings: ChineseEmbeddings = None,
+            vector_backend: str = None,
+            vector_storage: str = None,
+            hierarchical: bool = None
+    ):
         # 优化分块参数 - 减少文档块数量，提高质量
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=800,  # 增大chunk大小
             chunk_overlap=100,  # 增加重叠
             separators=["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
         )
-        self.embeddings = ChineseEmbeddings()
+        # 父子分块：章节先切成父窗口，父窗口再切成小的子块用于检索
+        self.hierarchical = Config.HIERARCHICAL_CHUNKING if hierarchical is None else hierarchical
+        self.parent_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=Config.PARENT_CHUNK_SIZE,
+            chunk_overlap=0,
+            separators=["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
+        )
+        self.child_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=Config.CHILD_CHUNK_SIZE,
+            chunk_overlap=Config.CHILD_CHUNK_OVERLAP,
+            separators=["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
+        )
+        self.embeddings = embeddings or ChineseEmbeddings()
+        # 检索后端: chroma 直接查询collection；flat 将向量载入内存矩阵做精确检索，collection只负责持久化
+        self.vector_backend = vector_backend or Config.VECTOR_BACKEND
+        if self.vector_backend not in ("chroma", "flat"):
+            raise ValueError(f"不支持的向量检索后端: {self.vector_backend}")
+        # flat后端的向量存储格式（float32 / float16 / int8）
+        self.vector_storage = vector_storage or Config.VECTOR_STORAGE
+        if self.vector_storage not in STORAGE_FORMATS:
+            raise ValueError(f"不支持的向量存储格式: {self.vector_storage}")
+
+    def process_paper_sections(self, sections: Dict[str, str], parents: Dict[str, str] = None) -> List[Document]:
+        """处理论文章节，转换为Document对象
 
-    def process_paper_sections(self, sections: Dict[str, str]) -> List[Document]:
-        """处理论文章节，转换为Document对象"""
+        父子分块模式下返回子块，父窗口文本写入parents（父窗口ID -> 文本）。
+        """
         documents = []
 
         # 处理顺序：优先处理重要章节
@@ -93,7 +217,9 @@ class DocumentProcessor:
         # 对长文本进行分割
         split_docs = []
         for doc in documents:
-            if len(doc.page_content) > 800:  # 使用新的chunk大小
+            if self.hierarchical:
+                split_docs.extend(self._split_hierarchical(doc, parents if parents is not None else {}))
+            elif len(doc.page_content) > 800:  # 使用新的chunk大小
                 # 分割长文档
                 chunks = self.text_splitter.split_documents([doc])
                 # 为分割后的文档添加chunk信息
@@ -110,6 +236,36 @@ class DocumentProcessor:
         logger.info(f"文档处理完成，共生成 {len(split_docs)} 个文档块")
         return split_docs
 
+    def _split_hierarchical(self, doc: Document, parents: Dict[str, str]) -> List[Document]:
+        """章节 → 父窗口 → 子块，子块元数据记录父窗口ID和在父窗口中的起止偏移"""
+        section = doc.metadata['section']
+        children = []
+        for parent_text in self.parent_splitter.split_text(doc.page_content):
+            parent_id = f"{section}-{uuid.uuid4().hex[:12]}"
+            parents[parent_id] = parent_text
+            offset = 0
+            for child_text in self.child_splitter.split_text(parent_text):
+                start = parent_text.find(child_text, offset)
+                if start < 0:
+                    start = offset
+                children.append((parent_id, child_text, start, start + len(child_text)))
+                offset = start + 1
+
+        chunks = []
+        for i, (parent_id, child_text, start, end) in enumerate(children):
+            metadata = dict(doc.metadata)
+            metadata.update({
+                'content_length': len(child_text),
+                'chunk_id': i,
+                'total_chunks': len(children),
+                'original_section': section,
+                'parent_id': parent_id,
+                'child_start': start,
+                'child_end': end
+            })
+            chunks.append(Document(page_content=child_text, metadata=metadata))
+        return chunks
+
     def _clean_content(self, content: str) -> str:
         """清理文档内容"""
         # 移除多余的空白和特殊字符
@@ -132,56 +288,69 @@ class DocumentProcessor:
 
         return content.strip()
 
-    def create_vectorstore(self, documents: List[Document], persist_directory: str = None) -> Chroma:
-        """创建向量数据库 - 每次创建新的，避免污染"""
+    def create_vectorstore(
+            self,
+            documents: List[Document] = None,
+            persist_directory: str = None,
+            collection_name: str = None
+    ) -> Chroma:
+        """创建向量数据库（documents为空时创建空库，供增量写入）
+
+        在持久化目录中新建独立的collection；论文级别的复用与回收见PaperLibrary。
+        """
         try:
             persist_dir = persist_directory or Config.CHROMA_DB_PATH
-
-            # 为每次新论文创建独立的collection
-            collection_name = f"paper_{uuid.uuid4().hex[:8]}"
-
-            # 清理旧的数据库目录（可选）
-            if os.path.exists(persist_dir):
-                try:
-                    shutil.rmtree(persist_dir)
-                    logger.info("清理旧的向量数据库")
-                except:
-                    pass
-
+            collection_name = collection_name or f"paper_{uuid.uuid4().hex[:8]}"
             os.makedirs(persist_dir, exist_ok=True)
 
-            vectorstore = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=persist_dir,
+            vectorstore = Chroma(
                 collection_name=collection_name,
+                embedding_function=self.embeddings,
+                persist_directory=persist_dir,
                 collection_metadata={
                     "description": "Current paper documents",
-                    "created_at": str(uuid.uuid4())
+                    # 向量已归一化，使用余弦距离
+                    "hnsw:space": "cosine"
                 }
             )
 
+            if documents:
+                self.add_documents(vectorstore, documents)
+
             # 持久化
             vectorstore.persist()
             logger.info(f"向量数据库创建成功，存储路径: {persist_dir}, collection: {collection_name}")
 
-            return vectorstore
+            return self.wrap_vectorstore(vectorstore)
         except Exception as e:
             logger.error(f"向量数据库创建失败: {e}")
             raise
 
-    def load_vectorstore(self, persist_directory: str = None) -> Chroma:
+    def wrap_vectorstore(self, vectorstore: Chroma) -> VectorStore:
+        """按检索后端包装collection：flat后端返回挂接该collection的内存索引"""
+        if self.vector_backend == "flat":
+            return FlatIndex.from_chroma(vectorstore, self.embeddings, storage=self.vector_storage)
+        return vectorstore
+
+    def add_documents(self, vectorstore: VectorStore, documents: List[Document]) -> List[str]:
+        """增量写入文档块（按chunk_uid upsert，重复写入不会产生重复条目）"""
+        ids = [doc.metadata.get('chunk_uid') or str(uuid.uuid4()) for doc in documents]
+        return vectorstore.add_documents(documents, ids=ids)
+
+    def load_vectorstore(self, persist_directory: str = None, collection_name: str = None) -> Chroma:
         """加载已存在的向量数据库"""
         try:
             persist_dir = persist_directory or Config.CHROMA_DB_PATH
+            kwargs = {"collection_name": collection_name} if collection_name else {}
 
             vectorstore = Chroma(
                 persist_directory=persist_dir,
-                embedding_function=self.embeddings
+                embedding_function=self.embeddings,
+                **kwargs
             )
 
-            logger.info(f"向量数据库加载成功，路径: {persist_dir}")
-            return vectorstore
+            logger.info(f"向量数据库加载成功，路径: {persist_dir}, collection: {vectorstore._collection.name}")
+            return self.wrap_vectorstore(vectorstore)
         except Exception as e:
             logger.error(f"向量数据库加载失败: {e}")
             raise
\ No newline at end of file
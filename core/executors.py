@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 阶段名：CPU密集（PDF解析、embedding、重排序）与I/O密集（LLM调用、向量库读写）
+CPU = "cpu"
+IO = "io"
+
+_SENTINEL = object()
+
+
+class StageExecutor:
+    """按阶段划分的线程池，统计排队深度、排队等待时间和执行时间
+
+    CPU阶段的池与核数相当，避免多个请求同时encode时线程数远超核数；
+    I/O阶段的池较大，等待LLM响应的请求不会占满CPU阶段的线程。
+    已在本池线程中执行的调用直接内联执行，嵌套提交不会死锁。
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"stage-{name}")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.ewma_wait: Optional[float] = None
+
+    def in_worker(self) -> bool:
+        return getattr(self._local, "active", False)
+
+    def _wrap(self, fn: Callable[..., Any], args: tuple, kwargs: dict, submitted: float) -> Callable[[], Any]:
+        def run():
+            started = time.monotonic()
+            wait = started - submitted
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                alpha = Config.EXECUTOR_EWMA_ALPHA
+                self.ewma_wait = wait if self.ewma_wait is None else alpha * wait + (1 - alpha) * self.ewma_wait
+
+            self._local.active = True
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                self._local.active = False
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.total_run += time.monotonic() - started
+        return run
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        return self._executor.submit(self._wrap(fn, args, kwargs, time.monotonic()))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """在本阶段的池中同步执行（供工作线程中的同步代码使用）"""
+        if self.in_worker():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """在本阶段的池中执行并await结果，不阻塞事件循环"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def iterate(self, iterator: Iterator[Any]) -> AsyncIterator[Any]:
+        """在本阶段的池中逐个取出同步迭代器的元素（用于流式响应）"""
+        while True:
+            item = await self.run(next, iterator, _SENTINEL)
+            if item is _SENTINEL:
+                return
+            yield item
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.running
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queued": self.max_queued,
+                "avg_wait_ms": round(self.total_wait / started * 1000, 2) if started else 0.0,
+                "ewma_wait_ms": round(self.ewma_wait * 1000, 2) if self.ewma_wait is not None else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "avg_run_ms": round(self.total_run / self.completed * 1000, 2) if self.completed else 0.0
+            }
+
+
+_executors: Dict[str, StageExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _default_workers(stage: str) -> int:
+    if stage == CPU:
+        return Config.EXECUTOR_CPU_WORKERS or os.cpu_count() or 1
+    return Config.EXECUTOR_IO_WORKERS
+
+
+def get_executor(stage: str) -> StageExecutor:
+    """获取阶段的共享线程池（首次使用时创建）"""
+    with _executors_lock:
+        executor = _executors.get(stage)
+        if executor is None:
+            executor = _executors[stage] = StageExecutor(stage, _default_workers(stage))
+            logger.info(f"阶段线程池已创建: {stage}，{executor.max_workers} 个线程")
+        return executor
+
+
+def run_stage(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """在指定阶段的池中同步执行fn"""
+    return get_executor(stage).call(fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    with _executors_lock:
+        executors = dict(_executors)
+    return {stage: executor.stats() for stage, executor in executors.items()}
@@ -0,0 +1,352 @@
+from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings
+from langchain.vectorstores import Chroma
+from langchain.vectorstores.base import VectorStore
+import numpy as np
+import logging
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from utils.config import Config
+from core.quantization import get_codec
+
+logger = logging.getLogger(__name__)
+
+
+def _matches(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """简单的元数据等值过滤（与Chroma的 {"key": value} 写法一致）"""
+    if not filter:
+        return True
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+def mmr_select(
+        query: np.ndarray,
+        candidates: np.ndarray,
+        k: int,
+        lambda_mult: float = 0.5
+) -> List[int]:
+    """向量化的最大边际相关性选择，返回candidates中被选中的行号
+
+    candidates与query均已归一化，内积即余弦相似度。
+    """
+    if len(candidates) == 0 or k <= 0:
+        return []
+
+    query_sim = candidates @ query
+    pair_sim = candidates @ candidates.T
+
+    selected = [int(np.argmax(query_sim))]
+    # 每个候选与已选集合的最大相似度，每选一个只需一次逐元素max更新
+    max_sim = pair_sim[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * query_sim - (1 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, pair_sim[best], out=max_sim)
+
+    return selected
+
+
+class FlatIndex(VectorStore):
+    """单篇论文的内存向量索引：归一化float32连续矩阵 + 精确top-k
+
+    一次矩阵-向量乘积加argpartition完成检索，MMR也全部用NumPy向量化计算。
+    可挂接一个Chroma collection做持久化：写入时同步upsert，读取只走内存。
+    storage为float16或int8时矩阵以压缩格式存放，查询向量保持float32做非对称打分；
+    int8需要样本确定量化范围，样本不足QUANTIZATION_MIN_TRAIN条之前先按float32存放。
+    """
+
+    def __init__(
+            self,
+            embedding: Embeddings,
+            persist_store: Chroma = None,
+            initial_capacity: int = 256,
+            storage: str = None
+    ):
+        self._embedding = embedding
+        self.persist_store = persist_store
+        self.codec = get_codec(storage)
+
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((initial_capacity, 0), dtype=self._storage_dtype())
+        self._count = 0
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def storage(self) -> str:
+        return self.codec.name
+
+    @property
+    def nbytes(self) -> int:
+        """向量矩阵实际占用的字节数（不含预留容量）"""
+        return self._count * self._matrix.shape[1] * self._matrix.dtype.itemsize
+
+    def _storage_dtype(self) -> np.dtype:
+        return self.codec.dtype if self.codec.fitted else np.dtype(np.float32)
+
+    def _decode(self, block: np.ndarray) -> np.ndarray:
+        return block if block.dtype == np.float32 else self.codec.decode(block)
+
+    def _maybe_fit_codec(self):
+        """样本足够时确定量化范围，并把已有的float32矩阵整体编码"""
+        if self.codec.fitted or self._count < Config.QUANTIZATION_MIN_TRAIN:
+            return
+        vectors = self._matrix[:self._count]
+        self.codec.fit(vectors)
+        encoded = np.zeros(self._matrix.shape, dtype=self.codec.dtype)
+        encoded[:self._count] = self.codec.encode(vectors)
+        self._matrix = encoded
+        logger.info(f"向量矩阵已转换为{self.codec.name}存储: {self._count} 条")
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _ensure_capacity(self, dim: int, needed: int):
+        capacity, current_dim = self._matrix.shape
+        if current_dim != dim:
+            if self._count:
+                raise ValueError(f"向量维度不一致: 索引为{current_dim}，写入为{dim}")
+            self._matrix = np.zeros((max(capacity, needed), dim), dtype=self._matrix.dtype)
+            return
+        if needed > capacity:
+            # 容量翻倍，摊还后每次写入O(1)
+            grown = np.zeros((max(needed, capacity * 2), dim), dtype=self._matrix.dtype)
+            grown[:self._count] = self._matrix[:self._count]
+            self._matrix = grown
+
+    def add_embeddings(
+            self,
+            texts: List[str],
+            embeddings: Iterable[Iterable[float]],
+            metadatas: Optional[List[dict]] = None,
+            ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """写入已计算好的向量（按id upsert）"""
+        if len(texts) == 0:
+            return []
+        vectors = self._normalize(np.asarray(list(embeddings), dtype=np.float32))
+        metadatas = [metadata or {} for metadata in (metadatas or [None] * len(texts))]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        with self._lock:
+            new_ids = [doc_id for doc_id in dict.fromkeys(ids) if doc_id not in self._id_to_row]
+            self._ensure_capacity(vectors.shape[1], self._count + len(new_ids))
+            if self._matrix.dtype != np.float32:
+                vectors = self.codec.encode(vectors)
+            for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                row = self._id_to_row.get(doc_id)
+                if row is None:
+                    row = self._count
+                    self._count += 1
+                    self._id_to_row[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._texts.append(text)
+                    self._metadatas.append(metadata)
+                else:
+                    self._texts[row] = text
+                    self._metadatas[row] = metadata
+                self._matrix[row] = vector
+            self._maybe_fit_codec()
+
+        return list(ids)
+
+    def add_texts(
+            self,
+            texts: Iterable[str],
+            metadatas: Optional[List[dict]] = None,
+            ids: Optional[List[str]] = None,
+            **kwargs: Any
+    ) -> List[str]:
+        """向量化并写入；挂接了Chroma时同步upsert，只向量化一次"""
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        embeddings = self._embedding.embed_documents(texts)
+
+        if self.persist_store is not None:
+            self.persist_store._collection.upsert(
+                ids=ids, embeddings=embeddings, metadatas=metadatas, documents=texts
+            )
+        return self.add_embeddings(texts, embeddings, metadatas, ids)
+
+    def _snapshot(self) -> Tuple[np.ndarray, List[str], List[Dict[str, Any]]]:
+        with self._lock:
+            return self._matrix[:self._count], self._texts[:self._count], self._metadatas[:self._count]
+
+    def _candidate_rows(self, metadatas: List[Dict[str, Any]], filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not filter:
+            return None
+        return np.array([i for i, metadata in enumerate(metadatas) if _matches(metadata, filter)], dtype=np.int64)
+
+    def _top_k(self, query: np.ndarray, k: int, filter: Optional[Dict[str, Any]] = None):
+        """全量top-k，返回 (行号, 余弦相似度, 快照)，按相似度降序（量化存储时分数为近似值）"""
+        snapshot = self._snapshot()
+        matrix, _, metadatas = snapshot
+        rows = self._candidate_rows(metadatas, filter)
+        if rows is not None:
+            matrix = matrix[rows]
+        if len(matrix) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), snapshot
+
+        scores = self.codec.scores(matrix, query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        selected = rows[top] if rows is not None else top
+        return selected, scores[top], snapshot
+
+    def _query_vector(self, embedding: List[float]) -> np.ndarray:
+        return self._normalize(np.asarray(embedding, dtype=np.float32))
+
+    def _document(self, row: int, texts: List[str], metadatas: List[Dict[str, Any]]) -> Document:
+        return Document(page_content=texts[row], metadata=dict(metadatas[row]))
+
+    def similarity_search_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            filter: Optional[Dict[str, Any]] = None,
+            **kwargs: Any
+    ) -> List[Document]:
+        rows, _, (_, texts, metadatas) = self._top_k(self._query_vector(embedding), k, filter)
+        return [self._document(row, texts, metadatas) for row in rows]
+
+    def similarity_search_by_vector_with_relevance_scores(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            filter: Optional[Dict[str, Any]] = None,
+            **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """返回 (文档, 余弦距离)，与Chroma余弦空间的返回值一致"""
+        rows, scores, (_, texts, metadatas) = self._top_k(self._query_vector(embedding), k, filter)
+        return [(self._document(row, texts, metadatas), float(1.0 - score)) for row, score in zip(rows, scores)]
+
+    def similarity_search(
+            self,
+            query: str,
+            k: int = 4,
+            filter: Optional[Dict[str, Any]] = None,
+            **kwargs: Any
+    ) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_with_score(
+            self,
+            query: str,
+            k: int = 4,
+            filter: Optional[Dict[str, Any]] = None,
+            **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self._embedding.embed_query(query), k, filter)
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def max_marginal_relevance_search_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            fetch_k: int = 20,
+            lambda_mult: float = 0.5,
+            filter: Optional[Dict[str, Any]] = None,
+            **kwargs: Any
+    ) -> List[Document]:
+        query = self._query_vector(embedding)
+        rows, _, (matrix, texts, metadatas) = self._top_k(query, fetch_k, filter)
+        if len(rows) == 0:
+            return []
+
+        picked = mmr_select(query, self._decode(matrix[rows]), k, lambda_mult)
+        # 与Chroma一致：按原相似度顺序返回被选中的文档
+        return [self._document(rows[i], texts, metadatas) for i in sorted(picked)]
+
+    def search_batch(
+            self,
+            embeddings: List[List[float]],
+            k: int = 4,
+            mmr_k: int = 4,
+            fetch_k: int = 20,
+            lambda_mult: float = 0.5
+    ) -> List[Tuple[List[Tuple[Document, float]], List[Document]]]:
+        """多个查询一次检索，返回每个查询的 (相似度检索结果[(文档, 余弦距离)], MMR结果)
+
+        float32存储时所有查询与矩阵做一次矩阵乘法；量化存储时逐个查询打分。
+        """
+        queries = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+        matrix, texts, metadatas = self._snapshot()
+        if len(matrix) == 0 or len(queries) == 0:
+            return [([], []) for _ in range(len(queries))]
+
+        if matrix.dtype == np.float32:
+            all_scores = (matrix @ queries.T).T
+        else:
+            all_scores = np.stack([self.codec.scores(matrix, query) for query in queries])
+
+        fetch = min(max(k, fetch_k), matrix.shape[0])
+        results = []
+        for query, scores in zip(queries, all_scores):
+            top = np.argpartition(-scores, fetch - 1)[:fetch] if fetch < len(scores) else np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            scored = [(self._document(row, texts, metadatas), float(1.0 - scores[row])) for row in top[:k]]
+            picked = mmr_select(query, self._decode(matrix[top]), mmr_k, lambda_mult)
+            results.append((scored, [self._document(top[i], texts, metadatas) for i in sorted(picked)]))
+        return results
+
+    def max_marginal_relevance_search(
+            self,
+            query: str,
+            k: int = 4,
+            fetch_k: int = 20,
+            lambda_mult: float = 0.5,
+            filter: Optional[Dict[str, Any]] = None,
+            **kwargs: Any
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
+
+    @classmethod
+    def from_texts(
+            cls,
+            texts: List[str],
+            embedding: Embeddings,
+            metadatas: Optional[List[dict]] = None,
+            ids: Optional[List[str]] = None,
+            **kwargs: Any
+    ) -> "FlatIndex":
+        index = cls(embedding, **kwargs)
+        index.add_texts(texts, metadatas, ids)
+        return index
+
+    @classmethod
+    def from_chroma(cls, vectorstore: Chroma, embedding: Embeddings = None, storage: str = None) -> "FlatIndex":
+        """从Chroma collection载入全部向量（不重新向量化），并挂接为持久化层"""
+        data = vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+        index = cls(embedding or vectorstore.embeddings, persist_store=vectorstore,
+                    initial_capacity=max(len(data["ids"]), 256), storage=storage)
+        if data["ids"]:
+            index.add_embeddings(data["documents"], data["embeddings"], data["metadatas"], data["ids"])
+        logger.info(f"内存向量索引载入完成: {len(index)} 个文档块，"
+                    f"{index.storage}存储 {index.nbytes / 1024:.0f}KB")
+        return index
@@ -0,0 +1,145 @@
+from langchain.docstore.document import Document
+from langchain.vectorstores.base import VectorStore
+from core.pdf_parser import PaperParser
+from core.embeddings import DocumentProcessor
+from core.lexical_index import LexicalIndex
+from core.chunk_hierarchy import ChunkHierarchy
+from utils.config import Config
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionPipeline:
+    """流式入库流水线：页 → 章节归属 → 文档块 → 定长embedding批次 → 增量写入向量库
+
+    每个阶段都是生成器，任意时刻只持有一个章节缓冲和一个批次，峰值内存与论文长度无关。
+    """
+
+    # 这些章节入库完成后即可开放问答，无需等待全文
+    PRIORITY_SECTIONS = ("title", "abstract", "introduction")
+
+    def __init__(
+            self,
+            processor: DocumentProcessor,
+            parser: PaperParser = None,
+            batch_size: int = None,
+            flush_chars: int = None
+    ):
+        self.processor = processor
+        self.parser = parser or PaperParser()
+        self.batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        self.flush_chars = flush_chars or Config.INGEST_FLUSH_CHARS
+
+    def iter_segments(self, pages: Iterable[str]) -> Iterator[Tuple[str, str, int]]:
+        """按章节聚合连续行，产出 (章节名, 文本, 起始页码)
+
+        章节切换或缓冲超过flush_chars时产出，超长章节会被切成多段。
+        """
+        current_section = None
+        start_page = 1
+        buffer: List[str] = []
+        buffer_chars = 0
+
+        for page_num, section_name, line in self.parser.iter_page_sections(pages):
+            if section_name != current_section or buffer_chars >= self.flush_chars:
+                if buffer:
+                    yield current_section, "\n".join(buffer), start_page
+                current_section = section_name
+                start_page = page_num
+                buffer = []
+                buffer_chars = 0
+
+            buffer.append(line)
+            buffer_chars += len(line) + 1
+
+        if buffer:
+            yield current_section, "\n".join(buffer), start_page
+
+    def iter_chunks(
+            self,
+            pages: Iterable[str],
+            chunk_prefix: str = None,
+            parents: Dict[str, str] = None
+    ) -> Iterator[Document]:
+        """章节段 → 文档块（复用DocumentProcessor的清洗与切分，父窗口写入parents）"""
+        chunk_prefix = chunk_prefix or uuid.uuid4().hex[:8]
+        chunk_index = 0
+
+        for section_name, text, start_page in self.iter_segments(pages):
+            for doc in self.processor.process_paper_sections({section_name: text}, parents=parents):
+                doc.metadata.update({
+                    'page': start_page,
+                    'chunk_uid': f"{chunk_prefix}-{chunk_index}"
+                })
+                chunk_index += 1
+                yield doc
+
+    def iter_batches(self, chunks: Iterable[Document]) -> Iterator[Tuple[List[Document], bool]]:
+        """文档块 → 定长批次，产出 (批次, 优先章节是否已全部包含)
+
+        离开优先章节时立即提交当前批次，让问答尽早开放。
+        """
+        batch: List[Document] = []
+        priority_done = False
+
+        for doc in chunks:
+            in_priority = doc.metadata.get('section') in self.PRIORITY_SECTIONS
+            if not priority_done and not in_priority:
+                priority_done = True
+                if batch:
+                    yield batch, True
+                    batch = []
+
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield batch, priority_done
+                batch = []
+
+        if batch:
+            yield batch, True
+
+    def run(
+            self,
+            pages: Iterable[str],
+            vectorstore: VectorStore,
+            chunk_prefix: str = None,
+            lexical_index: LexicalIndex = None,
+            hierarchy: ChunkHierarchy = None,
+            should_stop: Callable[[], bool] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """执行流水线，每写入一个批次产出一次进度（同时写入倒排索引和父子块偏移表）
+
+        每个批次写入前检查should_stop，返回True时停止入库（已写入的批次保留，由调用方清理）。
+        """
+        start_time = time.time()
+        total_chunks = 0
+        batches = 0
+
+        parents = hierarchy.parents if hierarchy is not None else None
+        for batch, ready in self.iter_batches(self.iter_chunks(pages, chunk_prefix, parents)):
+            if should_stop is not None and should_stop():
+                logger.info(f"流式入库已取消: 已写入 {total_chunks} 个文档块")
+                return
+            self.processor.add_documents(vectorstore, batch)
+            if lexical_index is not None:
+                lexical_index.add_documents(batch)
+            if hierarchy is not None:
+                hierarchy.add_documents(batch)
+            total_chunks += len(batch)
+            batches += 1
+
+            yield {
+                "batches": batches,
+                "chunks": total_chunks,
+                "page": batch[-1].metadata.get('page', 0),
+                "section": batch[-1].metadata.get('section', ''),
+                "ready": ready,
+                "elapsed": time.time() - start_time
+            }
+
+        logger.info(f"流式入库完成: {total_chunks} 个文档块，{batches} 个批次，"
+                    f"耗时 {time.time() - start_time:.1f}秒")
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    """后台任务：记录各阶段的状态、耗时和进度，支持协作式取消
+
+    任务函数在阶段之间（以及阶段内部的检查点）调用should_stop()，返回True时尽快退出。
+    """
+
+    def __init__(self, kind: str, stages: List[str] = None, meta: Dict[str, Any] = None):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.meta: Dict[str, Any] = dict(meta or {})
+        self.status = QUEUED
+        self.stages: "OrderedDict[str, Dict[str, Any]]" = OrderedDict(
+            (name, {"status": "pending"}) for name in (stages or [])
+        )
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def should_stop(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """请求取消；尚未开始的任务直接标记为已取消"""
+        with self._lock:
+            self._cancel.set()
+            if self.status == QUEUED:
+                self.status = CANCELLED
+
+    def clear_cancel(self):
+        """取消请求到达时工作实际已经完成（如论文已完整入库）：撤销请求，任务按成功结束"""
+        with self._lock:
+            if self.status == RUNNING:
+                self._cancel.clear()
+
+    def _start(self) -> bool:
+        """工作线程开始执行前调用，已取消时返回False"""
+        with self._lock:
+            if self._cancel.is_set():
+                self.status = CANCELLED
+                return False
+            self.started_at = time.time()
+            self.status = RUNNING
+            return True
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @contextmanager
+    def stage(self, name: str):
+        """阶段计时：进入时标记running，正常退出标记done，异常时标记failed"""
+        with self._lock:
+            record = self.stages.setdefault(name, {"status": "pending"})
+            record.update({"status": "running", "started_at": time.time()})
+        try:
+            yield record
+        except BaseException:
+            self._finish_stage(record, FAILED)
+            raise
+        self._finish_stage(record, CANCELLED if self.should_stop() else "done")
+
+    def _finish_stage(self, record: Dict[str, Any], status: str):
+        with self._lock:
+            now = time.time()
+            record.update({
+                "status": status,
+                "finished_at": now,
+                "duration": round(now - record["started_at"], 3)
+            })
+
+    def update(self, name: str, **progress):
+        """更新阶段进度（任意键值，如已入库文档块数）"""
+        with self._lock:
+            record = self.stages.setdefault(name, {"status": "pending"})
+            record.setdefault("progress", {}).update(progress)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "status": self.status,
+                "cancel_requested": self.should_stop() and not self.finished,
+                "stages": {name: dict(record) for name, record in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "queue_wait": round((self.started_at or end) - self.created_at, 3),
+                "duration": round(end - self.started_at, 3) if self.started_at else None,
+                **self.meta
+            }
+
+
+class JobQueue:
+    """有界后台任务队列 - 固定数量的工作线程执行任务，排队任务数超过上限时拒绝提交
+
+    已结束的任务保留JOB_RETENTION秒（最多JOB_MAX_HISTORY个）供查询。
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None):
+        self.max_workers = max_workers or Config.JOB_MAX_WORKERS
+        self.max_pending = max_pending if max_pending is not None else Config.JOB_MAX_PENDING
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-worker")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, status: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def submit(
+            self,
+            kind: str,
+            fn: Callable[..., Any],
+            *args,
+            stages: List[str] = None,
+            meta: Dict[str, Any] = None,
+            cleanup: Callable[[], None] = None
+    ) -> Optional[Job]:
+        """提交任务，fn(job, *args)的返回值作为任务结果；排队已满时返回None
+
+        cleanup在任务结束（包括排队中被取消）后调用，用于清理临时文件等资源。
+        """
+        with self._lock:
+            self._prune()
+            if self._count(QUEUED) >= self.max_pending:
+                logger.warning(f"任务队列已满 ({self.max_pending} 个排队中)，拒绝提交: {kind}")
+                return None
+            job = Job(kind, stages, meta)
+            self._jobs[job.job_id] = job
+
+        job.future = self._executor.submit(self._run, job, fn, args, cleanup)
+        logger.info(f"任务已提交: {kind} {job.job_id[:12]}")
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, cleanup: Optional[Callable[[], None]]):
+        try:
+            if not job._start():
+                return
+            try:
+                job.result = fn(job, *args)
+                job.status = CANCELLED if job.should_stop() else SUCCEEDED
+            except Exception as e:
+                logger.error(f"任务失败: {job.kind} {job.job_id[:12]}: {e}")
+                job.error = str(e)
+                job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            if cleanup is not None:
+                try:
+                    cleanup()
+                except Exception as e:
+                    logger.warning(f"任务资源清理失败: {e}")
+            logger.info(f"任务结束: {job.kind} {job.job_id[:12]} -> {job.status}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """请求取消任务：排队中的任务不再执行，运行中的任务在下一个检查点退出"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel()
+        logger.info(f"已请求取消任务: {job.kind} {job_id[:12]}")
+        return job
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def _prune(self):
+        """清理过期的已结束任务（调用方持有锁）"""
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished]
+        for i, job in enumerate(finished):
+            expired = now - (job.finished_at or now) > Config.JOB_RETENTION
+            if expired or len(finished) - i > Config.JOB_MAX_HISTORY:
+                del self._jobs[job.job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "queued": self._count(QUEUED),
+                "running": self._count(RUNNING),
+                "finished": sum(1 for job in self._jobs.values() if job.finished)
+            }
+
+    def shutdown(self):
+        """取消所有未结束的任务并等待工作线程退出（排队中的任务直接结束并清理资源）"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,234 @@
+from langchain.docstore.document import Document
+import numpy as np
+import logging
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符：CJK统一汉字（含扩展A、兼容汉字）、日文假名、韩文音节
+_CJK_CHARS = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af"
+# 连续的中日韩字符，或由字母数字组成的词（允许 gpt-4、v1.5 这类内部连接符）
+_TOKEN_PATTERN = re.compile(f"[{_CJK_CHARS}]+|[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+_CJK_PATTERN = re.compile(f"[{_CJK_CHARS}]")
+
+
+def tokenize(text: str) -> List[str]:
+    """中英混合分词：中日韩文本切成字二元组，拉丁文本按词切分
+
+    带连接符的词（如 bert-base）同时产出整体和各部分，缩写和型号既能整体命中也能部分命中。
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens: List[str] = []
+    for run in _TOKEN_PATTERN.findall(text):
+        if _CJK_PATTERN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+            parts = re.split(r"[-_.]", run)
+            if len(parts) > 1:
+                tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def chunk_key(doc: Document) -> str:
+    """文档块的去重键：优先使用chunk_uid"""
+    return doc.metadata.get('chunk_uid') or str(hash(doc.page_content[:100]))
+
+
+def rrf_fuse(ranked_lists: Sequence[Sequence[Document]], k: int = None, limit: int = None) -> List[Document]:
+    """倒数排名融合（RRF）：score = Σ 1 / (k + rank)，按chunk_uid去重"""
+    k = k or Config.RRF_K
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+
+    fused = sorted(scores, key=lambda key: scores[key], reverse=True)
+    if limit:
+        fused = fused[:limit]
+    return [documents[key] for key in fused]
+
+
+class LexicalIndex:
+    """单篇论文的倒排索引 + BM25打分
+
+    入库时按批增量构建，posting直接以数组保存（行号、词频），查询时只对查询词项的posting做向量化打分。
+    随论文一起保存为附属数据时只保存chunk id和posting，文本和元数据打开论文时从collection读取。
+    """
+
+    VERSION = 2
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = k1 if k1 is not None else Config.BM25_K1
+        self.b = b if b is not None else Config.BM25_B
+
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._doc_lens = np.zeros(0, dtype=np.float32)
+        # 词项 -> (文档行号数组, 词频数组)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add_documents(self, documents: Iterable[Document]):
+        """增量写入文档块（已存在的chunk_uid跳过），每批每个词项只扩展一次posting数组"""
+        with self._lock:
+            batch: Dict[str, Tuple[List[int], List[int]]] = {}
+            doc_lens = []
+            for doc in documents:
+                doc_id = chunk_key(doc)
+                if doc_id in self._id_to_row:
+                    continue
+
+                row = len(self._ids)
+                term_freqs = Counter(tokenize(doc.page_content))
+                self._id_to_row[doc_id] = row
+                self._ids.append(doc_id)
+                self._texts.append(doc.page_content)
+                self._metadatas.append(dict(doc.metadata))
+                doc_lens.append(sum(term_freqs.values()))
+                for term, tf in term_freqs.items():
+                    rows, tfs = batch.setdefault(term, ([], []))
+                    rows.append(row)
+                    tfs.append(tf)
+
+            if not doc_lens:
+                return
+            self._doc_lens = np.concatenate([self._doc_lens, np.asarray(doc_lens, dtype=np.float32)])
+            for term, (rows, tfs) in batch.items():
+                rows = np.asarray(rows, dtype=np.int32)
+                tfs = np.asarray(tfs, dtype=np.float32)
+                posting = self._postings.get(term)
+                if posting is not None:
+                    rows = np.concatenate([posting[0], rows])
+                    tfs = np.concatenate([posting[1], tfs])
+                self._postings[term] = (rows, tfs)
+
+    def search_with_scores(
+            self,
+            query: str,
+            k: int = None,
+            filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """BM25检索，返回 (文档, 分数)，按分数降序，不含零分文档"""
+        k = k or Config.LEXICAL_TOP_K
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self._ids)
+            if not doc_count:
+                return []
+            texts, metadatas = self._texts, self._metadatas
+
+            avg_len = float(self._doc_lens.mean())
+            norms = self.k1 * (1 - self.b + self.b * self._doc_lens / (avg_len or 1.0))
+            scores = np.zeros(doc_count, dtype=np.float32)
+            for term in terms:
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                rows, tfs = posting
+                idf = math.log(1 + (doc_count - len(rows) + 0.5) / (len(rows) + 0.5))
+                # 同一词项的posting中行号不重复，可直接按索引累加
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norms[rows])
+
+        if filter:
+            mask = np.array([all(m.get(key) == value for key, value in filter.items())
+                             for m in metadatas[:doc_count]])
+            scores[~mask] = 0.0
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+        return [
+            (Document(page_content=texts[row], metadata=dict(metadatas[row])), float(scores[row]))
+            for row in matched
+        ]
+
+    def search(self, query: str, k: int = None, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc for doc, _ in self.search_with_scores(query, k, filter)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """posting按词项顺序拼接保存（terms + offsets + rows + tfs），不保存文本和元数据"""
+        with self._lock:
+            terms = list(self._postings)
+            postings = [self._postings[term] for term in terms]
+            offsets = np.cumsum([0] + [len(rows) for rows, _ in postings])
+            return {
+                "version": self.VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "ids": list(self._ids),
+                "doc_lens": self._doc_lens.astype(np.int64).tolist(),
+                "terms": terms,
+                "offsets": offsets.tolist(),
+                "rows": np.concatenate([rows for rows, _ in postings]).tolist() if postings else [],
+                "tfs": np.concatenate([tfs for _, tfs in postings]).astype(np.int64).tolist() if postings else []
+            }
+
+    @classmethod
+    def from_dict(
+            cls,
+            data: Dict[str, Any],
+            texts: Sequence[str],
+            metadatas: Sequence[Optional[Dict[str, Any]]],
+            ids: Sequence[str]
+    ) -> Optional["LexicalIndex"]:
+        """从附属数据恢复索引，文本和元数据取自collection；版本不兼容或与collection不一致时返回None"""
+        if not data or data.get("version") != cls.VERSION:
+            return None
+        documents = {doc_id: (text, metadata) for text, metadata, doc_id in zip(texts, metadatas, ids)}
+        if any(doc_id not in documents for doc_id in data["ids"]):
+            return None
+
+        index = cls(k1=data.get("k1"), b=data.get("b"))
+        index._ids = list(data["ids"])
+        index._id_to_row = {doc_id: row for row, doc_id in enumerate(index._ids)}
+        index._texts = [documents[doc_id][0] for doc_id in index._ids]
+        index._metadatas = [dict(documents[doc_id][1] or {}) for doc_id in index._ids]
+        index._doc_lens = np.asarray(data["doc_lens"], dtype=np.float32)
+
+        offsets = data["offsets"]
+        rows = np.asarray(data["rows"], dtype=np.int32)
+        tfs = np.asarray(data["tfs"], dtype=np.float32)
+        index._postings = {
+            term: (rows[offsets[i]:offsets[i + 1]], tfs[offsets[i]:offsets[i + 1]])
+            for i, term in enumerate(data["terms"])
+        }
+        return index
+
+    @classmethod
+    def from_texts(
+            cls,
+            texts: Sequence[str],
+            metadatas: Sequence[Optional[Dict[str, Any]]],
+            ids: Sequence[str]
+    ) -> "LexicalIndex":
+        """从collection中已有的文档重建索引（旧论文没有保存倒排索引时使用）"""
+        documents = []
+        for text, metadata, doc_id in zip(texts, metadatas, ids):
+            metadata = dict(metadata or {})
+            metadata.setdefault('chunk_uid', doc_id)
+            documents.append(Document(page_content=text, metadata=metadata))
+
+        index = cls()
+        index.add_documents(documents)
+        return index
@@ -0,0 +1,398 @@
+import hnswlib
+import numpy as np
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+from utils.config import Config
+from core.quantization import get_codec
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryIndex:
+    """论文库级别的近似最近邻索引（HNSW，CPU）
+
+    所有论文的文档块向量放在同一个索引里，跨论文检索不必逐个collection扫描。
+    每个标签对应一个文档块，论文和章节以整数编码存放在并行数组中，用于过滤；
+    按论文过滤且候选不多时直接精确计算（HNSW在稀疏过滤下要遍历大量节点，反而更慢），
+    论文的向量矩阵按LRU缓存，同一篇论文反复检索不必每次从索引中取出；
+    缓存的矩阵按LIBRARY_INDEX_VECTOR_STORAGE压缩存放（int8/float16），查询向量保持float32做非对称打分。
+    HNSW图中的向量由hnswlib以float32存放。
+    """
+
+    VERSION = 1
+
+    def __init__(
+            self,
+            directory: str,
+            M: int = None,
+            ef_construction: int = None,
+            ef_search: int = None,
+            storage: str = None
+    ):
+        self.directory = directory
+        self.M = M or Config.LIBRARY_INDEX_M
+        self.ef_construction = ef_construction or Config.LIBRARY_INDEX_EF_CONSTRUCTION
+        self.ef_search = ef_search or Config.LIBRARY_INDEX_EF_SEARCH
+
+        self._lock = threading.RLock()
+        self._index: Optional[hnswlib.Index] = None
+        self.dim: Optional[int] = None
+
+        # 标签 -> 论文编码/章节编码（-1表示已删除）、chunk_uid
+        self._paper_codes = np.zeros(0, dtype=np.int32)
+        self._section_codes = np.zeros(0, dtype=np.int32)
+        self._chunk_uids: List[Optional[str]] = []
+        self._papers: List[str] = []
+        self._paper_lookup: Dict[str, int] = {}
+        self._sections: List[str] = []
+        self._section_lookup: Dict[str, int] = {}
+        self._paper_labels: Dict[str, List[int]] = {}
+        self._next_label = 0
+        # 已删除论文释放的标签，写入新论文时优先复用（标签与HNSW槽位一一对应，索引不会只增不减）
+        self._free_labels: List[int] = []
+        self._snapshot_id = 0
+        self._paper_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.codec = get_codec(storage or Config.LIBRARY_INDEX_VECTOR_STORAGE)
+
+        self.load()
+
+    def __len__(self) -> int:
+        return sum(len(labels) for labels in self._paper_labels.values())
+
+    def has_paper(self, paper_id: str) -> bool:
+        return paper_id in self._paper_labels
+
+    @property
+    def paper_ids(self) -> List[str]:
+        return list(self._paper_labels)
+
+    def _init_index(self, dim: int, capacity: int):
+        self.dim = dim
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(
+            max_elements=capacity,
+            M=self.M,
+            ef_construction=self.ef_construction,
+            allow_replace_deleted=True
+        )
+        self._index.set_ef(self.ef_search)
+
+    def _ensure_capacity(self, additional: int):
+        needed = self._index.get_current_count() + additional
+        capacity = self._index.get_max_elements()
+        if needed > capacity:
+            self._index.resize_index(max(needed, capacity * 2))
+
+        labels_needed = self._next_label + additional
+        if labels_needed > len(self._paper_codes):
+            size = max(labels_needed, len(self._paper_codes) * 2, 1024)
+            self._paper_codes = np.resize(self._paper_codes, size)
+            self._section_codes = np.resize(self._section_codes, size)
+            self._paper_codes[self._next_label:] = -1
+            self._section_codes[self._next_label:] = -1
+
+    def _code(self, value: str, values: List[str], lookup: Dict[str, int]) -> int:
+        code = lookup.get(value)
+        if code is None:
+            code = len(values)
+            values.append(value)
+            lookup[value] = code
+        return code
+
+    def set_ef(self, ef: int):
+        """调整查询时的候选列表大小（越大召回越高、越慢）"""
+        with self._lock:
+            self.ef_search = ef
+            if self._index is not None:
+                self._index.set_ef(ef)
+
+    def add_paper(
+            self,
+            paper_id: str,
+            chunk_uids: Sequence[str],
+            embeddings: np.ndarray,
+            sections: Sequence[str]
+    ) -> int:
+        """写入一篇论文的全部文档块（已存在时先替换），返回写入条数"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(chunk_uids) == 0:
+            return 0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1.0, norms)
+
+        with self._lock:
+            self.remove_paper(paper_id)
+            if self._index is None:
+                self._init_index(embeddings.shape[1], max(Config.LIBRARY_INDEX_INITIAL_CAPACITY, len(chunk_uids)))
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: 索引为{self.dim}，写入为{embeddings.shape[1]}")
+
+            split = max(len(self._free_labels) - len(chunk_uids), 0)
+            reused = self._free_labels[split:]
+            del self._free_labels[split:]
+            fresh = len(chunk_uids) - len(reused)
+            self._ensure_capacity(fresh)
+            labels = np.concatenate([
+                np.asarray(reused, dtype=np.int64),
+                np.arange(self._next_label, self._next_label + fresh, dtype=np.int64)
+            ])
+            self._next_label += fresh
+
+            # 复用的标签先取消删除标记，再原地更新向量和邻接关系
+            for label in reused:
+                self._index.unmark_deleted(label)
+            self._index.add_items(embeddings, labels)
+
+            paper_code = self._code(paper_id, self._papers, self._paper_lookup)
+            self._paper_codes[labels] = paper_code
+            self._section_codes[labels] = [
+                self._code(section or "", self._sections, self._section_lookup) for section in sections
+            ]
+            self._chunk_uids.extend([None] * (self._next_label - len(self._chunk_uids)))
+            for label, chunk_uid in zip(labels, chunk_uids):
+                self._chunk_uids[label] = chunk_uid
+            self._paper_labels[paper_id] = labels.tolist()
+
+        return len(chunk_uids)
+
+    def remove_paper(self, paper_id: str) -> bool:
+        """删除论文的全部文档块（标记删除，槽位留给后续写入复用）"""
+        with self._lock:
+            labels = self._paper_labels.pop(paper_id, None)
+            self._paper_vectors.pop(paper_id, None)
+            if not labels:
+                return False
+            for label in labels:
+                self._index.mark_deleted(label)
+                self._chunk_uids[label] = None
+            self._paper_codes[labels] = -1
+            self._section_codes[labels] = -1
+            self._free_labels.extend(labels)
+            return True
+
+    def _codes(self, values: Sequence[str], lookup: Dict[str, int]) -> List[int]:
+        return [lookup[value] for value in values if value in lookup]
+
+    def _maybe_fit_codec(self):
+        """索引中的向量足够多时，抽样确定int8量化范围（之前缓存的float32矩阵照常使用）"""
+        if self.codec.fitted or len(self) < Config.QUANTIZATION_MIN_TRAIN:
+            return
+        labels = np.concatenate([np.asarray(labels, dtype=np.int64) for labels in self._paper_labels.values()])
+        if len(labels) > Config.LIBRARY_INDEX_QUANTIZATION_SAMPLE:
+            labels = np.random.default_rng(0).choice(labels, Config.LIBRARY_INDEX_QUANTIZATION_SAMPLE, replace=False)
+        self.codec.fit(np.asarray(self._index.get_items(labels.tolist()), dtype=np.float32))
+        logger.info(f"论文库向量缓存量化范围已确定: {self.codec.name}，样本 {len(labels)} 条")
+
+    def _paper_matrix(self, paper_id: str) -> np.ndarray:
+        """论文全部文档块的向量矩阵（LRU缓存，按codec编码存放）"""
+        vectors = self._paper_vectors.get(paper_id)
+        if vectors is None:
+            vectors = np.asarray(self._index.get_items(self._paper_labels[paper_id]), dtype=np.float32)
+            self._maybe_fit_codec()
+            if self.codec.fitted:
+                vectors = self.codec.encode(vectors)
+            self._paper_vectors[paper_id] = vectors
+            while len(self._paper_vectors) > Config.LIBRARY_INDEX_VECTOR_CACHE_PAPERS:
+                self._paper_vectors.popitem(last=False)
+        else:
+            self._paper_vectors.move_to_end(paper_id)
+        return vectors
+
+    def _exact_search(
+            self,
+            query: np.ndarray,
+            k: int,
+            paper_ids: Sequence[str],
+            section_codes: Optional[List[int]]
+    ) -> List[Dict[str, Any]]:
+        labels = np.concatenate([np.asarray(self._paper_labels[p], dtype=np.int64) for p in paper_ids])
+        scores = np.concatenate([self.codec.scores(self._paper_matrix(p), query) for p in paper_ids])
+        if section_codes is not None:
+            keep = np.isin(self._section_codes[labels], section_codes)
+            labels, scores = labels[keep], scores[keep]
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [self._hit(int(labels[i]), float(scores[i])) for i in top]
+
+    def search(
+            self,
+            query: Sequence[float],
+            k: int = 10,
+            paper_ids: Optional[Sequence[str]] = None,
+            sections: Optional[Sequence[str]] = None,
+            ef: int = None
+    ) -> List[Dict[str, Any]]:
+        """检索最相似的文档块，返回 [{paper_id, chunk_uid, section, score}]，按相似度降序"""
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        with self._lock:
+            if self._index is None or not len(self):
+                return []
+
+            section_codes = self._codes(sections, self._section_lookup) if sections else None
+            paper_ids = paper_ids or None
+            if paper_ids:
+                paper_ids = [p for p in dict.fromkeys(paper_ids) if p in self._paper_labels]
+                if not paper_ids:
+                    return []
+                if sum(len(self._paper_labels[p]) for p in paper_ids) <= Config.LIBRARY_INDEX_BRUTE_FORCE_MAX:
+                    return self._exact_search(query, k, paper_ids, section_codes)
+
+            mask = None
+            if paper_ids is not None or section_codes is not None:
+                mask = self._paper_codes[:self._next_label] >= 0
+                if paper_ids is not None:
+                    mask &= np.isin(self._paper_codes[:self._next_label], self._codes(paper_ids, self._paper_lookup))
+                if section_codes is not None:
+                    mask &= np.isin(self._section_codes[:self._next_label], section_codes)
+
+            count = min(k, int(mask.sum()) if mask is not None else len(self))
+            if count == 0:
+                return []
+            self._index.set_ef(max(ef or self.ef_search, count))
+            try:
+                labels, distances = self._knn_query(query, count, mask)
+            finally:
+                self._index.set_ef(self.ef_search)
+
+            # 内积空间的距离为 1 - 内积
+            return [self._hit(int(label), float(1.0 - distance)) for label, distance in zip(labels[0], distances[0])]
+
+    def _knn_query(self, query: np.ndarray, k: int, mask: Optional[np.ndarray]):
+        """带过滤的HNSW查询；过滤后图中可达的条目不足k个时hnswlib会报错，此时逐步减小k重试"""
+        filter_fn = (lambda label: bool(mask[label])) if mask is not None else None
+        while True:
+            try:
+                return self._index.knn_query(query, k=k, filter=filter_fn)
+            except RuntimeError:
+                if k == 1:
+                    return np.zeros((1, 0), dtype=np.uint64), np.zeros((1, 0), dtype=np.float32)
+                k //= 2
+                logger.debug(f"论文库索引过滤查询结果不足，k减小为 {k} 重试")
+
+    def _hit(self, label: int, score: float) -> Dict[str, Any]:
+        return {
+            "paper_id": self._papers[self._paper_codes[label]],
+            "chunk_uid": self._chunk_uids[label],
+            "section": self._sections[self._section_codes[label]],
+            "score": round(score, 4)
+        }
+
+    def _current_path(self) -> str:
+        return os.path.join(self.directory, "CURRENT")
+
+    def save(self):
+        """写入快照：新快照目录写完后再原子地切换CURRENT指针，旧快照随后删除"""
+        with self._lock:
+            if self._index is None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            start_time = time.time()
+            snapshot_id = self._snapshot_id + 1
+            snapshot_dir = os.path.join(self.directory, f"snapshot-{snapshot_id}")
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            os.makedirs(snapshot_dir)
+
+            self._index.save_index(os.path.join(snapshot_dir, "hnsw.bin"))
+            np.savez(
+                os.path.join(snapshot_dir, "labels.npz"),
+                paper_codes=self._paper_codes[:self._next_label],
+                section_codes=self._section_codes[:self._next_label]
+            )
+            with open(os.path.join(snapshot_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": self.VERSION,
+                    "dim": self.dim,
+                    "M": self.M,
+                    "ef_construction": self.ef_construction,
+                    "max_elements": self._index.get_max_elements(),
+                    "next_label": self._next_label,
+                    "papers": self._papers,
+                    "sections": self._sections,
+                    "chunk_uids": self._chunk_uids,
+                    "paper_labels": self._paper_labels
+                }, f, ensure_ascii=False)
+
+            tmp_path = self._current_path() + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(os.path.basename(snapshot_dir))
+            os.replace(tmp_path, self._current_path())
+
+            previous = os.path.join(self.directory, f"snapshot-{self._snapshot_id}")
+            if self._snapshot_id and previous != snapshot_dir:
+                shutil.rmtree(previous, ignore_errors=True)
+            self._snapshot_id = snapshot_id
+
+        logger.info(f"论文库索引快照已保存: {len(self)} 个文档块，耗时 {time.time() - start_time:.2f}秒")
+
+    def load(self) -> bool:
+        """加载最近一次快照，不存在或损坏时从空索引开始"""
+        if not os.path.exists(self._current_path()):
+            return False
+        try:
+            with open(self._current_path(), "r", encoding="utf-8") as f:
+                snapshot_name = f.read().strip()
+            snapshot_dir = os.path.join(self.directory, snapshot_name)
+            with open(os.path.join(snapshot_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != self.VERSION:
+                logger.warning("论文库索引快照版本不兼容，将重新建立")
+                return False
+
+            labels = np.load(os.path.join(snapshot_dir, "labels.npz"))
+            index = hnswlib.Index(space="ip", dim=meta["dim"])
+            index.load_index(
+                os.path.join(snapshot_dir, "hnsw.bin"),
+                max_elements=meta["max_elements"],
+                allow_replace_deleted=True
+            )
+            index.set_ef(self.ef_search)
+        except Exception as e:
+            logger.warning(f"论文库索引快照读取失败，将重新建立: {e}")
+            return False
+
+        with self._lock:
+            self._index = index
+            self.dim = meta["dim"]
+            self.M = meta.get("M", self.M)
+            self.ef_construction = meta.get("ef_construction", self.ef_construction)
+            self._next_label = meta["next_label"]
+            self._paper_codes = labels["paper_codes"].astype(np.int32)
+            self._section_codes = labels["section_codes"].astype(np.int32)
+            self._papers = meta["papers"]
+            self._paper_lookup = {paper_id: code for code, paper_id in enumerate(self._papers)}
+            self._sections = meta["sections"]
+            self._section_lookup = {section: code for code, section in enumerate(self._sections)}
+            self._chunk_uids = meta["chunk_uids"]
+            self._paper_labels = meta["paper_labels"]
+            # 图中仍保留的已删除标签可以复用（旧版本快照中被替换掉的标签已不在图中）
+            stored = set(index.get_ids_list())
+            self._free_labels = [
+                label for label in range(self._next_label)
+                if self._paper_codes[label] < 0 and label in stored
+            ]
+            self._snapshot_id = int(snapshot_name.rsplit("-", 1)[-1])
+
+        logger.info(f"论文库索引已加载: {len(self)} 个文档块，{len(self._paper_labels)} 篇论文")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "papers": len(self._paper_labels),
+                "chunks": len(self),
+                "dim": self.dim,
+                "M": self.M,
+                "ef_construction": self.ef_construction,
+                "ef_search": self.ef_search,
+                "capacity": self._index.get_max_elements() if self._index is not None else 0,
+                "vector_storage": self.codec.name if self.codec.fitted else "float32",
+                "vector_cache_papers": len(self._paper_vectors),
+                "vector_cache_bytes": sum(vectors.nbytes for vectors in self._paper_vectors.values())
+            }
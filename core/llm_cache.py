@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """LLM响应缓存：内存LRU + SQLite磁盘层（带TTL）
+
+    键为 (模型名, temperature, max_tokens, stop, prompt哈希)，只缓存成功的响应。
+    """
+
+    def __init__(self, db_path: str = None, memory_size: int = None, ttl: float = None, max_disk_entries: int = None):
+        self.db_path = db_path or Config.LLM_CACHE_DB_PATH
+        self.memory_size = memory_size or Config.LLM_CACHE_MEMORY_SIZE
+        self.ttl = ttl if ttl is not None else Config.LLM_CACHE_TTL
+        self.max_disk_entries = max_disk_entries or Config.LLM_CACHE_MAX_DISK_ENTRIES
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON responses(created_at)")
+        self._conn.commit()
+        self.purge_expired()
+
+    @staticmethod
+    def make_key(model_name: str, temperature: float, max_tokens: int, prompt: str,
+                 stop: Optional[List[str]] = None) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = json.dumps([model_name, temperature, max_tokens, stop or [], prompt_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl) and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1]):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def put(self, key: str, response: str, model_name: str = ""):
+        if not response:
+            return
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, response, created_at)
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model_name, response, created_at)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM缓存写入失败: {e}")
+                return
+
+            # 每写入一批检查一次磁盘条目上限
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= 100:
+                self._puts_since_trim = 0
+                self._trim_disk()
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def _remember(self, key: str, response: str, created_at: float):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self):
+        """超出磁盘条目上限时删除最旧的条目"""
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+        self._conn.commit()
+
+    def purge_expired(self):
+        """删除过期条目"""
+        if not self.ttl:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory)
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_initialized = False
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """获取进程内共享的LLM响应缓存（未启用或初始化失败时返回None）"""
+    global _cache, _cache_initialized
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if not _cache_initialized:
+            _cache_initialized = True
+            try:
+                _cache = LLMResponseCache()
+            except Exception as e:
+                # 初始化失败后不再重试，直接调用模型
+                logger.warning(f"LLM缓存初始化失败，跳过缓存: {e}")
+        return _cache
@@ -1,12 +1,66 @@
 import dashscope
 from dashscope import Generation
-from typing import Optional, List, Any, Dict
+import httpx
+import asyncio
+from typing import Optional, List, Any, AsyncIterator, Dict, Iterator
 import logging
 import json
+import threading
+import weakref
+from core.executors import IO, get_executor
+from core.llm_cache import LLMResponseCache, get_llm_cache
 from utils.config import Config
 
 logger = logging.getLogger(__name__)
 
+GENERATION_PATH = "/services/aigc/text-generation/generation"
+
+
+class AsyncHTTPPool:
+    """异步HTTP连接池 - 每个事件循环一个keep-alive客户端，按配置限制连接数和超时
+
+    客户端按事件循环对象弱引用保存，事件循环销毁后对应条目自动移除；
+    事件循环结束前应调用aclose()关闭其客户端（服务关闭时、asyncio.run结束前）。
+    """
+
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环对应的客户端（httpx客户端不能跨事件循环使用）"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    base_url=Config.DASHSCOPE_BASE_URL,
+                    limits=httpx.Limits(
+                        max_connections=Config.LLM_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=Config.LLM_HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=Config.LLM_HTTP_KEEPALIVE_EXPIRY
+                    ),
+                    timeout=httpx.Timeout(
+                        Config.LLM_HTTP_TIMEOUT,
+                        connect=Config.LLM_HTTP_CONNECT_TIMEOUT
+                    )
+                )
+                self._clients[loop] = client
+            return client
+
+    async def aclose(self):
+        """关闭当前事件循环的客户端"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+# 进程内共享的连接池
+http_pool = AsyncHTTPPool()
+
 
 class QwenLLM:
     """通义千问LLM封装 - 简化版本，避免LangChain兼容性问题"""
@@ -17,15 +71,20 @@ class QwenLLM:
             model_name: str = None,
             temperature: float = 0.1,
             max_tokens: int = 2000,
+            cache: Optional[LLMResponseCache] = None,
             **kwargs
     ):
         self.api_key = api_key or Config.DASHSCOPE_API_KEY
         self.model_name = model_name or Config.LLM_MODEL
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # 高温度模型输出本身带随机性，不做缓存
+        self.cache = cache or get_llm_cache()
+        self.cacheable = self.cache is not None and temperature <= Config.LLM_CACHE_MAX_TEMPERATURE
 
-        # 设置API密钥
+        # 设置API密钥和服务地址（服务地址可指向本地替身服务做离线测试）
         dashscope.api_key = self.api_key
+        dashscope.base_http_api_url = Config.DASHSCOPE_BASE_URL
 
         if not self.api_key:
             raise ValueError("请设置DASHSCOPE_API_KEY环境变量")
@@ -36,8 +95,44 @@ class QwenLLM:
         """直接调用方法"""
         return self._call(prompt, stop)
 
+    def _cache_key(self, prompt: str, stop: Optional[List[str]] = None) -> Optional[str]:
+        """响应缓存键，不走缓存时返回None"""
+        if not self.cacheable:
+            if self.cache is not None:
+                self.cache.record_bypass()
+            return None
+        return LLMResponseCache.make_key(self.model_name, self.temperature, self.max_tokens, prompt, stop)
+
+    def _cache_get(self, key: Optional[str]) -> Optional[str]:
+        return self.cache.get(key) if key else None
+
+    def _cache_put(self, key: Optional[str], text: str):
+        if key:
+            self.cache.put(key, text, self.model_name)
+
+    @staticmethod
+    async def _in_io_stage(fn, *args):
+        """在I/O阶段线程池中执行同步的缓存读写；事件循环本身跑在该池的线程中时直接执行，避免嵌套提交占满线程池"""
+        executor = get_executor(IO)
+        if executor.in_worker():
+            return fn(*args)
+        return await executor.run(fn, *args)
+
+    async def _acache_get(self, key: Optional[str]) -> Optional[str]:
+        """异步路径读缓存：磁盘层是同步SQLite，不在事件循环线程上执行"""
+        return await self._in_io_stage(self._cache_get, key) if key else None
+
+    async def _acache_put(self, key: Optional[str], text: str):
+        if key:
+            await self._in_io_stage(self._cache_put, key, text)
+
     def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        """调用通义千问API"""
+        """调用通义千问API（命中响应缓存时直接返回）"""
+        cache_key = self._cache_key(prompt, stop)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             response = Generation.call(
                 model=self.model_name,
@@ -48,7 +143,9 @@ class QwenLLM:
             )
 
             if response.status_code == 200:
-                return response.output.text.strip()
+                text = response.output.text.strip()
+                self._cache_put(cache_key, text)
+                return text
             else:
                 error_msg = f"API调用失败: {response.message}"
                 logger.error(error_msg)
@@ -58,6 +155,138 @@ class QwenLLM:
             logger.error(f"LLM调用异常: {e}")
             raise
 
+    def stream(self, prompt: str, stop: Optional[List[str]] = None) -> Iterator[str]:
+        """流式调用通义千问API，逐段产出增量文本（命中缓存时一次性产出）"""
+        cache_key = self._cache_key(prompt, stop)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        try:
+            responses = Generation.call(
+                model=self.model_name,
+                prompt=prompt,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stop=stop,
+                stream=True,
+                incremental_output=True
+            )
+
+            for response in responses:
+                if response.status_code == 200:
+                    if response.output and response.output.text:
+                        parts.append(response.output.text)
+                        yield response.output.text
+                else:
+                    error_msg = f"API调用失败: {response.message}"
+                    logger.error(error_msg)
+                    raise Exception(error_msg)
+
+            # 完整读完才写入缓存，中途断开的不缓存
+            self._cache_put(cache_key, "".join(parts).strip())
+
+        except Exception as e:
+            logger.error(f"LLM流式调用异常: {e}")
+            raise
+
+    def _build_payload(self, prompt: str, stop: Optional[List[str]] = None, stream: bool = False) -> Dict[str, Any]:
+        """构造DashScope HTTP接口的请求体"""
+        payload = {
+            "model": self.model_name,
+            "input": {"prompt": prompt},
+            "parameters": {
+                "temperature": self.temperature,
+                "max_tokens": self.max_tokens
+            }
+        }
+        if stop:
+            payload["parameters"]["stop"] = stop
+        if stream:
+            payload["parameters"]["incremental_output"] = True
+        return payload
+
+    async def astream(self, prompt: str, stop: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """异步流式调用（SSE），逐段产出增量文本（命中缓存时一次性产出）"""
+        cache_key = self._cache_key(prompt, stop)
+        cached = await self._acache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Accept": "text/event-stream",
+            "X-DashScope-SSE": "enable"
+        }
+        try:
+            async with http_pool.get_client().stream(
+                    "POST", GENERATION_PATH, json=self._build_payload(prompt, stop, stream=True), headers=headers
+            ) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    try:
+                        message = json.loads(body).get("message", response.status_code)
+                    except ValueError:
+                        message = body.decode("utf-8", errors="replace")
+                    raise Exception(f"API调用失败: {message}")
+
+                is_error = False
+                async for line in response.aiter_lines():
+                    if line.startswith("event:error"):
+                        is_error = True
+                    elif line.startswith("data:"):
+                        data = json.loads(line[len("data:"):])
+                        if is_error:
+                            raise Exception(f"API调用失败: {data.get('message')}")
+                        text = (data.get("output") or {}).get("text")
+                        if text:
+                            parts.append(text)
+                            yield text
+
+            await self._acache_put(cache_key, "".join(parts).strip())
+
+        except Exception as e:
+            logger.error(f"LLM异步流式调用异常: {e}")
+            raise
+
+    async def acall(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        """异步调用通义千问API（复用连接池，不占用线程）"""
+        cache_key = self._cache_key(prompt, stop)
+        cached = await self._acache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        payload = self._build_payload(prompt, stop)
+
+        try:
+            response = await http_pool.get_client().post(
+                GENERATION_PATH,
+                json=payload,
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+
+            try:
+                data = response.json()
+            except ValueError:
+                data = {"message": response.text}
+
+            if response.status_code == 200:
+                text = data["output"]["text"].strip()
+                await self._acache_put(cache_key, text)
+                return text
+            else:
+                error_msg = f"API调用失败: {data.get('message', response.status_code)}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+
+        except Exception as e:
+            logger.error(f"LLM异步调用异常: {e}")
+            raise
+
     @property
     def _llm_type(self) -> str:
         return "qwen"
@@ -151,6 +380,34 @@ class ModelManager:
 
         raise Exception("模型调用失败，已达到最大重试次数")
 
+    async def acall_with_retry(
+            self,
+            task_type: str,
+            prompt: str,
+            max_retries: int = 3
+    ) -> str:
+        """带重试的异步模型调用"""
+        model = self.get_model(task_type)
+
+        for attempt in range(max_retries):
+            try:
+                return await model.acall(prompt)
+            except Exception as e:
+                logger.warning(f"模型异步调用失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                if attempt == max_retries - 1:
+                    raise
+
+        raise Exception("模型调用失败，已达到最大重试次数")
+
+    async def aclose(self):
+        """释放当前事件循环的HTTP连接"""
+        await http_pool.aclose()
+
+    def cache_stats(self) -> Optional[Dict[str, float]]:
+        """LLM响应缓存命中统计，未启用缓存时返回None"""
+        cache = get_llm_cache()
+        return cache.stats() if cache else None
+
     def parse_json_response(self, response: str) -> Dict:
         """解析JSON格式的响应"""
         try:
@@ -0,0 +1,101 @@
+from sentence_transformers import SentenceTransformer
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _get_rss_bytes() -> int:
+    """读取当前进程常驻内存（RSS），单位字节"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        # 非Linux平台退化为峰值RSS（macOS单位为字节，Linux为KB）
+        try:
+            import resource
+            import sys
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+        except Exception:
+            return 0
+
+
+class ModelRegistry:
+    """进程级模型注册表 - 每个模型在进程内只加载一次，线程安全"""
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """获取模型，不存在时调用loader加载（同一模型并发请求只加载一次）"""
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        # 每个模型一把加载锁，不同模型可以并行加载
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            rss_before = _get_rss_bytes()
+            start_time = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                logger.error(f"模型加载失败: {key}: {e}")
+                raise
+            load_time = time.perf_counter() - start_time
+            rss_delta = max(_get_rss_bytes() - rss_before, 0)
+
+            with self._lock:
+                self._models[key] = model
+                self._stats[key] = {
+                    "load_time_s": round(load_time, 3),
+                    "rss_delta_mb": round(rss_delta / 1024 / 1024, 1),
+                    "loaded_at": time.time()
+                }
+
+            logger.info(f"模型加载完成: {key}，耗时 {load_time:.2f}秒，"
+                        f"常驻内存增加 {rss_delta / 1024 / 1024:.1f}MB")
+            return model
+
+    def get_embedding_model(self, model_name: str = None) -> SentenceTransformer:
+        """获取共享的SentenceTransformer模型"""
+        model_name = model_name or Config.EMBEDDING_MODEL
+        return self.get(f"embedding:{model_name}", lambda: SentenceTransformer(model_name))
+
+    def warmup(self, model_names: Optional[Iterable[str]] = None):
+        """启动时预热embedding模型，避免首次上传时才加载"""
+        for model_name in model_names or [Config.EMBEDDING_MODEL]:
+            model = self.get_embedding_model(model_name)
+            # 做一次前向推理，完成底层的惰性初始化
+            model.encode(["warmup"], normalize_embeddings=True)
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._models
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """每个模型的加载耗时与内存占用"""
+        with self._lock:
+            stats = {key: dict(value) for key, value in self._stats.items()}
+        return {
+            "models": stats,
+            "process_rss_mb": round(_get_rss_bytes() / 1024 / 1024, 1)
+        }
+
+
+# 进程级单例
+model_registry = ModelRegistry()
@@ -0,0 +1,352 @@
+from langchain.embeddings.base import Embeddings
+from langchain.vectorstores import Chroma
+import chromadb
+import numpy as np
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from utils.config import Config
+from core.library_index import LibraryIndex
+
+logger = logging.getLogger(__name__)
+
+
+class PaperLibrary:
+    """持久化论文库 - 按内容哈希管理，每篇论文一个collection
+
+    同一篇论文再次上传时直接复用已有collection，切换论文不需要重新向量化，
+    超出数量或长期未访问的论文按LRU/时间策略回收。
+    同一篇论文同时只允许一个入库：入库进行中时create()返回None，调用方用wait_ingest()等待后直接打开。
+    所有论文的文档块向量另外汇总到一个HNSW索引中，用于跨论文检索。
+    """
+
+    def __init__(self, embeddings: Embeddings, persist_directory: str = None):
+        self.embeddings = embeddings
+        self.persist_directory = persist_directory or Config.CHROMA_DB_PATH
+        os.makedirs(self.persist_directory, exist_ok=True)
+
+        # 同一路径共用一个客户端，所有collection都通过它访问
+        self.client = chromadb.PersistentClient(path=self.persist_directory)
+        self.manifest_path = os.path.join(self.persist_directory, "library.json")
+        self.artifacts_dir = os.path.join(self.persist_directory, "papers")
+
+        self._lock = threading.RLock()
+        self._papers: Dict[str, Dict[str, Any]] = self._load_manifest()
+        # 正在入库的论文ID -> 入库结束（mark_ready或abort）时置位的事件
+        self._ingesting: Dict[str, threading.Event] = {}
+
+        # 跨论文检索索引：快照可能落后于清单，首次检索前与清单对齐
+        self.index = LibraryIndex(os.path.join(self.persist_directory, "library_index"))
+        self._index_synced = False
+        self._last_snapshot = 0.0
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"论文库清单读取失败，将重新建立: {e}")
+            return {}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._papers, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def collection_name(paper_id: str) -> str:
+        return f"paper_{paper_id[:16]}"
+
+    def _vectorstore(self, paper_id: str) -> Chroma:
+        return Chroma(
+            client=self.client,
+            collection_name=self.collection_name(paper_id),
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory,
+            # 向量已归一化，使用余弦距离
+            collection_metadata={"hnsw:space": "cosine"}
+        )
+
+    def has_paper(self, paper_id: str) -> bool:
+        """论文是否已完整入库"""
+        record = self._papers.get(paper_id)
+        return bool(record) and record.get("status") == "ready"
+
+    def get_record(self, paper_id: str) -> Optional[Dict[str, Any]]:
+        record = self._papers.get(paper_id)
+        return dict(record) if record else None
+
+    def list_papers(self) -> List[Dict[str, Any]]:
+        """按最近访问时间倒序列出论文"""
+        with self._lock:
+            records = [dict(record, paper_id=paper_id) for paper_id, record in self._papers.items()]
+        return sorted(records, key=lambda r: r.get("last_accessed", 0), reverse=True)
+
+    def create(
+            self,
+            paper_id: str,
+            title: str = "",
+            metadata: Dict[str, Any] = None,
+            pinned: bool = False,
+            in_use: Callable[[str], bool] = None
+    ) -> Optional[Chroma]:
+        """为新论文创建collection并登记入库（清理同一论文未完成的旧collection）
+
+        同一论文已有入库在进行、已入库完成或有记录且正被会话使用（in_use）时返回None，不删除已有数据；
+        入库结束时必须调用mark_ready或abort。
+        pinned的论文不参与回收，也不计入数量上限（如批量入库的论文集），只能显式删除。
+        """
+        # 会话管理器有自己的锁，在论文库锁之外判断论文是否被使用
+        busy = in_use is not None and in_use(paper_id)
+        with self._lock:
+            if paper_id in self._ingesting:
+                logger.info(f"论文正在其他会话中入库，不重复创建: {paper_id[:12]}")
+                return None
+            record = self._papers.get(paper_id)
+            if record is not None and (record.get("status") == "ready" or busy):
+                logger.info(f"论文已入库或正被会话使用，不重新创建: {paper_id[:12]}")
+                return None
+            self._ingesting[paper_id] = threading.Event()
+            self._drop_collection(paper_id)
+            self.index.remove_paper(paper_id)
+            now = time.time()
+            self._papers[paper_id] = {
+                "title": title,
+                "collection": self.collection_name(paper_id),
+                "status": "indexing",
+                "chunk_count": 0,
+                "pages": (metadata or {}).get("pages", 0),
+                "created_at": now,
+                "last_accessed": now,
+                "pinned": pinned
+            }
+            self._save_manifest()
+
+        logger.info(f"论文库新建collection: {self.collection_name(paper_id)}")
+        return self._vectorstore(paper_id)
+
+    def is_ingesting(self, paper_id: str) -> bool:
+        return paper_id in self._ingesting
+
+    def wait_ingest(self, paper_id: str, timeout: float = None) -> bool:
+        """等待该论文进行中的入库结束，返回是否已结束（没有进行中的入库时立即返回True）"""
+        event = self._ingesting.get(paper_id)
+        return event is None or event.wait(timeout)
+
+    def _end_ingest(self, paper_id: str):
+        """结束入库登记并唤醒等待者（调用方持有锁）"""
+        event = self._ingesting.pop(paper_id, None)
+        if event is not None:
+            event.set()
+
+    def abort(self, paper_id: str) -> bool:
+        """入库失败或取消时清理：只删除由进行中的入库创建的论文，没有进行中的入库时不做任何事"""
+        with self._lock:
+            if paper_id not in self._ingesting:
+                return False
+            try:
+                self.delete(paper_id)
+            finally:
+                self._end_ingest(paper_id)
+        return True
+
+    def mark_ready(self, paper_id: str, chunk_count: int) -> bool:
+        """标记论文入库完成；入库期间记录已被删除时返回False（入库结果没有保存）"""
+        with self._lock:
+            self._end_ingest(paper_id)
+            record = self._papers.get(paper_id)
+            if record is None:
+                logger.warning(f"论文记录在入库期间被删除，无法标记完成: {paper_id[:12]}")
+                return False
+            record.update({"status": "ready", "chunk_count": chunk_count, "indexed_at": time.time()})
+            self._save_manifest()
+
+        try:
+            self._index_paper(paper_id)
+            self._snapshot_index()
+        except Exception as e:
+            # 跨论文索引失败不影响单篇论文问答，下次同步时补齐
+            logger.error(f"论文写入论文库索引失败: {e}")
+        return True
+
+    def open(self, paper_id: str) -> Optional[Chroma]:
+        """打开已入库的论文，不存在或未完成时返回None"""
+        if not self.has_paper(paper_id):
+            return None
+        with self._lock:
+            self._papers[paper_id]["last_accessed"] = time.time()
+            self._save_manifest()
+        return self._vectorstore(paper_id)
+
+    def delete(self, paper_id: str) -> bool:
+        """删除论文的collection、附属文件和清单记录"""
+        with self._lock:
+            if paper_id not in self._papers:
+                return False
+            self._drop_collection(paper_id)
+            shutil.rmtree(self._artifact_dir(paper_id), ignore_errors=True)
+            del self._papers[paper_id]
+            self._save_manifest()
+            if self.index.remove_paper(paper_id):
+                self._snapshot_index()
+        logger.info(f"论文已从库中删除: {paper_id[:12]}")
+        return True
+
+    def gc(
+            self,
+            max_papers: int = None,
+            max_age_days: float = None,
+            keep: List[str] = None,
+            in_use: Callable[[str], bool] = None
+    ) -> List[str]:
+        """按时间和LRU策略回收论文，返回被删除的论文ID
+
+        只回收已入库完成的论文：仍在入库中的、keep中的和in_use返回True的（有会话正在使用）不回收，
+        但计入数量上限；pinned的论文既不回收也不计入上限。
+        """
+        max_papers = max_papers if max_papers is not None else Config.LIBRARY_MAX_PAPERS
+        max_age_days = max_age_days if max_age_days is not None else Config.LIBRARY_MAX_AGE_DAYS
+        keep = set(keep or [])
+
+        # 会话管理器有自己的锁，在论文库锁之外判断论文是否被使用
+        with self._lock:
+            paper_ids = list(self._papers)
+        if in_use is not None:
+            keep.update(paper_id for paper_id in paper_ids if in_use(paper_id))
+
+        with self._lock:
+            now = time.time()
+            # 最久未访问的在前
+            unpinned = [paper_id for paper_id, record in self._papers.items() if not record.get("pinned")]
+            candidates = sorted(
+                (paper_id for paper_id in unpinned if paper_id not in keep and self.has_paper(paper_id)),
+                key=lambda pid: self._papers[pid].get("last_accessed", 0)
+            )
+
+            expired = []
+            if max_age_days:
+                expired = [pid for pid in candidates
+                           if now - self._papers[pid].get("last_accessed", 0) > max_age_days * 86400]
+
+            remaining = [pid for pid in candidates if pid not in expired]
+            overflow = len(unpinned) - len(expired) - max_papers if max_papers else 0
+            removed = expired + remaining[:max(overflow, 0)]
+
+            for paper_id in removed:
+                self.delete(paper_id)
+
+        if removed:
+            logger.info(f"论文库回收 {len(removed)} 篇论文")
+        return removed
+
+    def _index_paper(self, paper_id: str) -> int:
+        """把论文collection中的全部向量写入论文库索引"""
+        data = self._vectorstore(paper_id)._collection.get(include=["embeddings", "metadatas"])
+        if not data["ids"]:
+            return 0
+        sections = [(metadata or {}).get("section", "") for metadata in data["metadatas"]]
+        return self.index.add_paper(paper_id, data["ids"], np.asarray(data["embeddings"]), sections)
+
+    def _snapshot_index(self, force: bool = False):
+        """按最小间隔写入索引快照，间隔内的变更在下次启动同步时从collection补齐"""
+        if not force and time.time() - self._last_snapshot < Config.LIBRARY_INDEX_SNAPSHOT_INTERVAL:
+            return
+        self.index.save()
+        self._last_snapshot = time.time()
+
+    def save_index(self):
+        """立即写入论文库索引快照（批量入库结束时调用）"""
+        with self._lock:
+            self._snapshot_index(force=True)
+
+    def sync_index(self) -> int:
+        """让论文库索引与清单一致：补入缺失的论文、移除已删除的论文，返回变更的论文数"""
+        with self._lock:
+            ready = {paper_id for paper_id in self._papers if self.has_paper(paper_id)}
+            stale = [paper_id for paper_id in self.index.paper_ids if paper_id not in ready]
+            missing = [paper_id for paper_id in ready if not self.index.has_paper(paper_id)]
+
+            for paper_id in stale:
+                self.index.remove_paper(paper_id)
+            for paper_id in missing:
+                try:
+                    self._index_paper(paper_id)
+                except Exception as e:
+                    logger.error(f"论文写入论文库索引失败 {paper_id[:12]}: {e}")
+
+            if stale or missing:
+                self._snapshot_index(force=True)
+                logger.info(f"论文库索引已同步: 新增 {len(missing)} 篇，移除 {len(stale)} 篇")
+            self._index_synced = True
+        return len(stale) + len(missing)
+
+    def search(
+            self,
+            query_embedding: List[float],
+            k: int = 10,
+            paper_ids: Optional[List[str]] = None,
+            sections: Optional[List[str]] = None,
+            ef: int = None
+    ) -> List[Dict[str, Any]]:
+        """跨论文检索文档块，可按论文ID和章节过滤，返回带论文标题和内容的结果"""
+        if not self._index_synced:
+            self.sync_index()
+
+        hits = self.index.search(query_embedding, k=k, paper_ids=paper_ids, sections=sections, ef=ef)
+
+        # 按论文分组，到各自的collection中取回文档块内容
+        by_paper: Dict[str, List[str]] = {}
+        for hit in hits:
+            by_paper.setdefault(hit["paper_id"], []).append(hit["chunk_uid"])
+        contents: Dict[str, Dict[str, Any]] = {}
+        for paper_id, chunk_uids in by_paper.items():
+            data = self._vectorstore(paper_id)._collection.get(ids=chunk_uids, include=["documents", "metadatas"])
+            for chunk_uid, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+                contents[chunk_uid] = {"content": text, "page": (metadata or {}).get("page", 0)}
+
+        results = []
+        for hit in hits:
+            record = self._papers.get(hit["paper_id"]) or {}
+            content = contents.get(hit["chunk_uid"])
+            if content is None:
+                continue
+            results.append(dict(hit, title=record.get("title", ""), **content))
+        return results
+
+    def _drop_collection(self, paper_id: str):
+        try:
+            self.client.delete_collection(self.collection_name(paper_id))
+        except Exception:
+            # collection不存在
+            pass
+
+    def _artifact_dir(self, paper_id: str) -> str:
+        return os.path.join(self.artifacts_dir, paper_id)
+
+    def save_artifact(self, paper_id: str, name: str, data: Any):
+        """保存论文附属数据（章节、摘要等），以JSON存放"""
+        artifact_dir = self._artifact_dir(paper_id)
+        os.makedirs(artifact_dir, exist_ok=True)
+        path = os.path.join(artifact_dir, f"{name}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_artifact(self, paper_id: str, name: str) -> Optional[Any]:
+        path = os.path.join(self._artifact_dir(paper_id), f"{name}.json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"论文附属数据读取失败 {name}: {e}")
+            return None
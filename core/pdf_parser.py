@@ -1,12 +1,125 @@
 import PyPDF2
 import re
+import os
+import json
+import bisect
+import hashlib
 import logging
-from typing import Dict, List
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
+from utils.config import Config
 
 logger = logging.getLogger(__name__)
 
 
+def _read_pages(pdf_reader: PyPDF2.PdfReader, start: int, end: int) -> List[str]:
+    """从已打开的PdfReader中提取[start, end)范围内各页文本"""
+    pages = []
+    for page_num in range(start, end):
+        try:
+            pages.append(pdf_reader.pages[page_num].extract_text() or "")
+        except Exception as e:
+            logger.warning(f"第{page_num + 1}页提取失败: {e}")
+            pages.append("")
+    return pages
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """提取[start, end)范围内各页文本（进程池worker入口，每个worker自行打开PDF）"""
+    with open(pdf_path, 'rb') as file:
+        return _read_pages(PyPDF2.PdfReader(file), start, end)
+
+
+def file_sha256(file_path: str) -> str:
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class ParsedPaper:
+    """一次PDF解析的完整结果"""
+    sha256: str
+    sections: Dict[str, str]
+    metadata: Dict[str, Any]
+    pages: List[str] = field(default_factory=list)
+    # 每页正文在 sections['full_text'] 中的起始字符偏移
+    page_offsets: List[int] = field(default_factory=list)
+
+    @property
+    def title(self) -> str:
+        return self.sections.get('title') or self.metadata.get('title') or ""
+
+    def page_of(self, offset: int) -> int:
+        """full_text中的字符偏移所在页码（从1开始）"""
+        return max(bisect.bisect_right(self.page_offsets, offset), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ParsedPaper":
+        return cls(**data)
+
+
+class ParseCache:
+    """解析结果缓存：内存LRU + 磁盘JSON，按文件SHA-256索引"""
+
+    def __init__(self, cache_dir: str = None, memory_size: int = None):
+        self.cache_dir = cache_dir or Config.PARSE_CACHE_DIR
+        self.memory_size = memory_size or Config.PARSE_CACHE_MEMORY_SIZE
+        self._memory: "OrderedDict[str, ParsedPaper]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{sha256}.json")
+
+    def get(self, sha256: str) -> Optional[ParsedPaper]:
+        with self._lock:
+            parsed = self._memory.get(sha256)
+            if parsed is not None:
+                self._memory.move_to_end(sha256)
+                return parsed
+
+        path = self._path(sha256)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                parsed = ParsedPaper.from_dict(json.load(f))
+        except Exception as e:
+            logger.warning(f"解析缓存读取失败，重新解析: {e}")
+            return None
+
+        self._remember(parsed)
+        return parsed
+
+    def put(self, parsed: ParsedPaper):
+        self._remember(parsed)
+        try:
+            tmp_path = self._path(parsed.sha256) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(parsed.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(parsed.sha256))
+        except Exception as e:
+            logger.warning(f"解析缓存写入失败: {e}")
+
+    def _remember(self, parsed: ParsedPaper):
+        with self._lock:
+            self._memory[parsed.sha256] = parsed
+            self._memory.move_to_end(parsed.sha256)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
 class PaperParser:
     def __init__(self):
         # 章节识别模式
@@ -18,32 +131,113 @@ class PaperParser:
             'conclusion': re.compile(r'(conclusion|discussion|结论|讨论)', re.IGNORECASE),
             'references': re.compile(r'(reference|bibliography|参考文献)', re.IGNORECASE)
         }
+        self.parse_cache = ParseCache() if Config.PARSE_CACHE_ENABLED else None
+
+    def parse(self, pdf_path: str, use_cache: bool = True) -> ParsedPaper:
+        """单次打开PDF，一并得到章节、元信息、逐页文本和页偏移
+
+        结果按文件SHA-256缓存，重复上传同一文件时不再解析PDF。
+        """
+        sha256 = file_sha256(pdf_path)
+        cache = self.parse_cache if use_cache else None
+        if cache is not None:
+            parsed = cache.get(sha256)
+            if parsed is not None:
+                logger.info(f"命中解析缓存: {sha256[:12]}")
+                return parsed
 
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """从PDF提取文本"""
         try:
             with open(pdf_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        text += f"\n--- Page {page_num + 1} ---\n"
-                        text += page_text
-                    except Exception as e:
-                        logger.warning(f"第{page_num + 1}页提取失败: {e}")
-                        continue
-
-                return text
+                metadata = self._metadata_from_reader(pdf_reader, pdf_path)
+                page_count = metadata['pages']
+                if page_count >= Config.PDF_PARALLEL_MIN_PAGES:
+                    pages = self._extract_pages_parallel(pdf_path, page_count)
+                else:
+                    pages = _read_pages(pdf_reader, 0, page_count)
         except Exception as e:
             logger.error(f"PDF解析失败: {e}")
             raise
 
+        full_text, page_offsets = self._join_pages(pages)
+        # 章节切分会去掉full_text开头的空白，页偏移随之前移
+        leading = len(full_text) - len(full_text.lstrip())
+        parsed = ParsedPaper(
+            sha256=sha256,
+            sections=self._split_sections(full_text),
+            metadata=metadata,
+            pages=pages,
+            page_offsets=[offset - leading for offset in page_offsets]
+        )
+
+        if cache is not None:
+            cache.put(parsed)
+        return parsed
+
+    def extract_pages(self, pdf_path: str, parallel: bool = None, max_workers: int = None) -> List[str]:
+        """按页提取文本，返回按页序排列的文本列表
+
+        parallel为None时按页数自动选择：页数达到PDF_PARALLEL_MIN_PAGES才启用进程池。
+        """
+        try:
+            with open(pdf_path, 'rb') as file:
+                page_count = len(PyPDF2.PdfReader(file).pages)
+
+            if parallel is None:
+                parallel = page_count >= Config.PDF_PARALLEL_MIN_PAGES
+            if not parallel:
+                return _extract_page_range(pdf_path, 0, page_count)
+            return self._extract_pages_parallel(pdf_path, page_count, max_workers)
+        except Exception as e:
+            logger.error(f"PDF解析失败: {e}")
+            raise
+
+    def _extract_pages_parallel(self, pdf_path: str, page_count: int, max_workers: int = None) -> List[str]:
+        """把页范围切段分给进程池，按页序合并结果"""
+        workers = min(max_workers or Config.PDF_PARSE_WORKERS or os.cpu_count() or 1, page_count)
+        if workers <= 1:
+            return _extract_page_range(pdf_path, 0, page_count)
+
+        # 切成比worker数更多的页段，平衡各页解析耗时差异
+        batch_size = max(1, -(-page_count // (workers * 4)))
+        ranges = [(start, min(start + batch_size, page_count))
+                  for start in range(0, page_count, batch_size)]
+
+        pages = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_extract_page_range, pdf_path, start, end)
+                       for start, end in ranges]
+            for future in futures:
+                pages.extend(future.result())
+
+        logger.info(f"并行提取完成: {page_count} 页，{workers} 个进程")
+        return pages
+
+    def extract_text_from_pdf(self, pdf_path: str, parallel: bool = None) -> str:
+        """从PDF提取文本"""
+        pages = self.extract_pages(pdf_path, parallel=parallel)
+        return self._join_pages(pages)[0]
+
+    @staticmethod
+    def _join_pages(pages: List[str]):
+        """拼接逐页文本（带页标记），同时返回每页正文的起始偏移"""
+        parts = []
+        page_offsets = []
+        offset = 0
+        for page_num, page_text in enumerate(pages):
+            marker = f"\n--- Page {page_num + 1} ---\n"
+            page_offsets.append(offset + len(marker))
+            parts.append(marker)
+            parts.append(page_text)
+            offset += len(marker) + len(page_text)
+        return "".join(parts), page_offsets
+
     def extract_sections(self, pdf_path: str) -> Dict[str, str]:
         """提取论文章节"""
-        text = self.extract_text_from_pdf(pdf_path)
+        return self._split_sections(self.extract_text_from_pdf(pdf_path))
 
+    def _split_sections(self, text: str) -> Dict[str, str]:
+        """按章节标题把全文切分成各章节"""
         sections = {
             'title': '',
             'abstract': '',
@@ -56,17 +250,33 @@ class PaperParser:
         }
 
         # 简单的章节分割（可以优化）
-        lines = text.split('\n')
+        for _, section_name, line in self._classify_lines((None, line) for line in text.split('\n')):
+            sections[section_name] += line + '\n'
+
+        # 清理空白
+        for key in sections:
+            sections[key] = sections[key].strip()
+
+        logger.info(f"成功解析论文，提取到 {len([s for s in sections.values() if s])} 个非空章节")
+        return sections
+
+    def _classify_lines(self, tagged_lines: Iterable[Tuple[Any, str]]) -> Iterator[Tuple[Any, str, str]]:
+        """逐行判断章节归属，产出 (标签, 章节名, 行文本)，章节标题行本身不产出
+
+        标签原样透传（如页码），便于流式处理时追踪行的来源。
+        """
+        has_title = False
         current_section = 'introduction'  # 默认放到introduction
 
-        for line in lines:
+        for tag, line in tagged_lines:
             line = line.strip()
             if not line:
                 continue
 
             # 检查是否是标题（第一行且较短）
-            if not sections['title'] and len(line) < 200 and len(line) > 10:
-                sections['title'] = line
+            if not has_title and len(line) < 200 and len(line) > 10:
+                has_title = True
+                yield tag, 'title', line
                 continue
 
             # 识别章节
@@ -79,34 +289,46 @@ class PaperParser:
 
             # 如果不是章节标题，则添加到当前章节
             if not section_found:
-                sections[current_section] += line + '\n'
+                yield tag, current_section, line
 
-        # 清理空白
-        for key in sections:
-            sections[key] = sections[key].strip()
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
+        """逐页产出文本，内存中只保留当前页"""
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page_num in range(len(pdf_reader.pages)):
+                yield _read_pages(pdf_reader, page_num, page_num + 1)[0]
 
-        logger.info(f"成功解析论文，提取到 {len([s for s in sections.values() if s])} 个非空章节")
-        return sections
+    def iter_page_sections(self, pages: Iterable[str]) -> Iterator[Tuple[int, str, str]]:
+        """流式章节归属：按页产出 (页码, 章节名, 行文本)，与extract_sections的切分结果一致"""
+        def tagged_lines():
+            for page_num, page_text in enumerate(pages, start=1):
+                yield page_num, f"--- Page {page_num} ---"
+                for line in page_text.split('\n'):
+                    yield page_num, line
+
+        return self._classify_lines(tagged_lines())
 
     def extract_metadata(self, pdf_path: str) -> Dict[str, str]:
         """提取论文元信息"""
         try:
             with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                metadata = pdf_reader.metadata or {}
-
-                return {
-                    'title': metadata.get('/Title', ''),
-                    'author': metadata.get('/Author', ''),
-                    'subject': metadata.get('/Subject', ''),
-                    'creator': metadata.get('/Creator', ''),
-                    'pages': len(pdf_reader.pages),
-                    'file_size': Path(pdf_path).stat().st_size
-                }
+                return self._metadata_from_reader(PyPDF2.PdfReader(file), pdf_path)
         except Exception as e:
             logger.error(f"元信息提取失败: {e}")
             return {}
 
+    @staticmethod
+    def _metadata_from_reader(pdf_reader: PyPDF2.PdfReader, pdf_path: str) -> Dict[str, Any]:
+        metadata = pdf_reader.metadata or {}
+        return {
+            'title': str(metadata.get('/Title') or ''),
+            'author': str(metadata.get('/Author') or ''),
+            'subject': str(metadata.get('/Subject') or ''),
+            'creator': str(metadata.get('/Creator') or ''),
+            'pages': len(pdf_reader.pages),
+            'file_size': Path(pdf_path).stat().st_size
+        }
+
     def clean_text(self, text: str) -> str:
         """清理文本"""
         # 去除多余空白
@@ -1,13 +1,31 @@
 from langchain.vectorstores import Chroma
+from langchain.docstore.document import Document
 from core.llm_client import ModelManager
 from core.embeddings import DocumentProcessor
+from core.ingestion import IngestionPipeline
+from core.paper_library import PaperLibrary
+from core.lexical_index import LexicalIndex, chunk_key, rrf_fuse
+from core.chunk_hierarchy import ChunkHierarchy
+from core.context_builder import ContextBuilder
+from core.reranker import CrossEncoderReranker
+from core.answer_cache import SemanticAnswerCache
+from core.flat_index import FlatIndex, mmr_select
+from core.executors import IO, get_executor
 from utils.prompts import (
     PAPER_QA_PROMPT,
     TERM_EXPLANATION_PROMPT,
     KEYPOINTS_EXTRACTION_PROMPT
 )
+import numpy as np
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, List, Any
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Any, Optional
+from utils.config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -15,70 +33,588 @@ logger = logging.getLogger(__name__)
 class PaperQASystem:
     """论文问答系统"""
 
-    def __init__(self, model_manager: ModelManager):
+    # 向量检索参数：相似度检索条数、MMR返回条数、MMR候选条数
+    SIMILARITY_K = 6
+    MMR_K = 4
+    MMR_FETCH_K = 10
+
+    def __init__(
+            self,
+            model_manager: ModelManager,
+            processor: DocumentProcessor = None,
+            library: PaperLibrary = None,
+            reranker: CrossEncoderReranker = None,
+            answer_cache: SemanticAnswerCache = None,
+            in_use: Callable[[str], bool] = None
+    ):
         self.model_manager = model_manager
+        # 文档处理器（及其共享的embedding模型）在系统生命周期内复用
+        self.processor = processor or DocumentProcessor()
+        # 持久化论文库，同一篇论文只向量化一次
+        self.library = library or PaperLibrary(self.processor.embeddings)
+        # 可选的交叉编码器重排序阶段
+        self.reranker = reranker or (CrossEncoderReranker() if Config.RERANK_ENABLED else None)
+        # 语义回答缓存，换一种说法的同一问题直接返回已有回答
+        self.answer_cache = answer_cache or (SemanticAnswerCache() if Config.ANSWER_CACHE_ENABLED else None)
+        # 判断论文是否正被其他会话使用，论文库回收时跳过这些论文
+        self.in_use = in_use
         self.vectorstore = None
+        # 当前论文的BM25倒排索引，与向量检索结果融合
+        self.lexical_index: Optional[LexicalIndex] = None
+        # 当前论文的父子块偏移表，回答时把命中的子块扩展为父窗口
+        self.chunk_hierarchy: Optional[ChunkHierarchy] = None
+        self.current_paper_id = None
         self.current_paper_info = {}
+        self.indexing_complete = threading.Event()
+        self.indexing_complete.set()
+
+    @staticmethod
+    def _content_id(sections: Dict[str, str]) -> str:
+        """没有文件哈希时，用章节内容计算论文ID"""
+        content = sections.get("full_text") or json.dumps(sections, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def open_paper(self, paper_id: str) -> bool:
+        """切换到论文库中已入库的论文，无需重新解析和向量化"""
+        collection = self.library.open(paper_id)
+        if collection is None:
+            return False
+        vectorstore = self.processor.wrap_vectorstore(collection)
+
+        record = self.library.get_record(paper_id)
+        self.vectorstore = vectorstore
+        self.lexical_index = self._load_lexical_index(paper_id, collection)
+        # 父子分块之前入库的论文没有偏移表，回答时不做扩展
+        self.chunk_hierarchy = ChunkHierarchy.from_dict(self.library.load_artifact(paper_id, "chunk_hierarchy"))
+        self.current_paper_id = paper_id
+        self.current_paper_info = {
+            "paper_id": paper_id,
+            "title": record.get("title", ""),
+            "sections": self.library.load_artifact(paper_id, "sections") or {},
+            "total_docs": record.get("chunk_count", 0),
+            "indexing": False,
+            "status": "ready"
+        }
+        self.indexing_complete = threading.Event()
+        self.indexing_complete.set()
+
+        logger.info(f"从论文库打开论文: {self.current_paper_info['title']}")
+        return True
+
+    def _close_paper(self):
+        """释放当前论文的内存索引"""
+        self.vectorstore = None
+        self.lexical_index = None
+        self.chunk_hierarchy = None
+        self.current_paper_id = None
+        self.current_paper_info = {}
+
+    def _load_lexical_index(self, paper_id: str, collection: Chroma) -> LexicalIndex:
+        """读取论文的倒排索引（文本和元数据取自collection），没有保存过时从collection重建并补存"""
+        data = collection._collection.get(include=["documents", "metadatas"])
+        index = LexicalIndex.from_dict(
+            self.library.load_artifact(paper_id, "lexical_index"), data["documents"], data["metadatas"], data["ids"]
+        )
+        if index is None:
+            index = LexicalIndex.from_texts(data["documents"], data["metadatas"], data["ids"])
+            self.library.save_artifact(paper_id, "lexical_index", index.to_dict())
+            logger.info(f"已重建倒排索引: {len(index)} 个文档块")
+        return index
+
+    def _join_ingest(self, paper_id: str, should_stop: Callable[[], bool] = None) -> bool:
+        """同一论文正在其他会话中入库：等待其结束后直接打开，不重复入库"""
+        logger.info(f"同一论文正在入库，等待完成后打开: {paper_id[:12]}")
+        while not self.library.wait_ingest(paper_id, timeout=0.5):
+            if should_stop is not None and should_stop():
+                return False
+        return self.open_paper(paper_id)
+
+    def load_paper(self, sections: Dict[str, str], paper_title: str = "", paper_id: str = None):
+        """加载论文到问答系统（已入库的论文直接复用）"""
+        paper_id = paper_id or self._content_id(sections)
+        if self.open_paper(paper_id):
+            return True
+
+        # 为论文创建独立的collection
+        title = paper_title or sections.get("title", "")
+        collection = self.library.create(paper_id, title, in_use=self.in_use)
+        if collection is None:
+            return self._join_ingest(paper_id)
 
-    def load_paper(self, sections: Dict[str, str], paper_title: str = ""):
-        """加载论文到问答系统"""
         try:
             # 处理文档
-            processor = DocumentProcessor()
-            documents = processor.process_paper_sections(sections)
-
-            # 创建新的向量数据库（避免污染）
-            self.vectorstore = processor.create_vectorstore(documents)
+            hierarchy = ChunkHierarchy()
+            documents = self.processor.process_paper_sections(sections, parents=hierarchy.parents)
+            for i, doc in enumerate(documents):
+                doc.metadata['chunk_uid'] = f"{paper_id[:16]}-{i}"
+            hierarchy.add_documents(documents)
+
+            vectorstore = self.processor.wrap_vectorstore(collection)
+            self._invalidate_answers(paper_id)
+            self.processor.add_documents(vectorstore, documents)
+            lexical_index = LexicalIndex()
+            lexical_index.add_documents(documents)
+            self.library.save_artifact(paper_id, "sections", sections)
+            self.library.save_artifact(paper_id, "lexical_index", lexical_index.to_dict())
+            self.library.save_artifact(paper_id, "chunk_hierarchy", hierarchy.to_dict())
+            if not self.library.mark_ready(paper_id, len(documents)):
+                raise Exception("论文记录在入库期间被删除")
 
             # 保存论文信息
+            self.vectorstore = vectorstore
+            self.lexical_index = lexical_index
+            self.chunk_hierarchy = hierarchy
+            self.current_paper_id = paper_id
             self.current_paper_info = {
-                "title": paper_title or sections.get("title", ""),
+                "paper_id": paper_id,
+                "title": title,
                 "sections": sections,
                 "total_docs": len(documents)
             }
+            # 切换到新论文后再回收，本会话之前打开的论文不再算作使用中
+            self.library.gc(keep=[paper_id], in_use=self.in_use)
 
             logger.info(f"论文加载成功: {self.current_paper_info['title']}")
             return True
 
         except Exception as e:
             logger.error(f"论文加载失败: {e}")
+            self.library.abort(paper_id)
             return False
 
+    def load_paper_streaming(
+            self,
+            pages: Iterable[str],
+            paper_title: str = "",
+            sections: Dict[str, str] = None,
+            paper_id: str = None,
+            metadata: Dict[str, Any] = None,
+            should_stop: Callable[[], bool] = None,
+            on_progress: Callable[[Dict[str, Any]], None] = None
+    ) -> bool:
+        """流式加载论文：后台逐批入库，摘要和引言入库后即返回并开放问答
+
+        剩余章节继续在后台线程写入同一个向量库，完成后indexing_complete被置位，
+        current_paper_info["status"]记录入库结果（ready / failed / cancelled），失败时error记录原因。
+        已完整入库的论文直接从论文库打开；同一论文正在其他会话中入库时等待其结束后打开，不重复入库。
+        should_stop在批次之间检查，返回True时停止入库并删除未完成的论文；入库失败的论文同样删除。
+        on_progress在每个批次写入后调用。
+        """
+        sections = sections or {}
+        paper_id = paper_id or (self._content_id(sections) if sections else uuid.uuid4().hex)
+        if self.open_paper(paper_id):
+            return True
+
+        title = paper_title or sections.get("title", "")
+        collection = self.library.create(paper_id, title, metadata, in_use=self.in_use)
+        if collection is None:
+            return self._join_ingest(paper_id, should_stop)
+        try:
+            vectorstore = self.processor.wrap_vectorstore(collection)
+            self._invalidate_answers(paper_id)
+            if sections:
+                self.library.save_artifact(paper_id, "sections", sections)
+        except Exception as e:
+            logger.error(f"论文加载失败: {e}")
+            self.library.abort(paper_id)
+            return False
+
+        lexical_index = LexicalIndex()
+        hierarchy = ChunkHierarchy()
+        self.vectorstore = None
+        self.lexical_index = lexical_index
+        self.chunk_hierarchy = hierarchy
+        self.current_paper_id = paper_id
+        self.current_paper_info = {
+            "paper_id": paper_id,
+            "title": title,
+            "sections": sections,
+            "total_docs": 0,
+            "indexing": True
+        }
+
+        ready = threading.Event()
+        indexing_complete = self.indexing_complete = threading.Event()
+        pipeline = IngestionPipeline(self.processor)
+        paper_info = self.current_paper_info
+        cancelled = threading.Event()
+
+        def stop_requested() -> bool:
+            # 流水线只在批次之间检查，最后一个批次写入后再取消不影响论文完整入库
+            if should_stop is not None and should_stop():
+                cancelled.set()
+            return cancelled.is_set()
+
+        def _ingest():
+            status = "failed"
+            try:
+                for progress in pipeline.run(pages, vectorstore, chunk_prefix=paper_id[:16],
+                                             lexical_index=lexical_index, hierarchy=hierarchy,
+                                             should_stop=stop_requested):
+                    paper_info["total_docs"] = progress["chunks"]
+                    if on_progress is not None:
+                        on_progress(progress)
+                    if progress["ready"] and not ready.is_set():
+                        if self.current_paper_id == paper_id:
+                            self.vectorstore = vectorstore
+                        ready.set()
+                        logger.info(f"优先章节入库完成，问答已开放 ({progress['chunks']} 个文档块)")
+
+                if cancelled.is_set():
+                    status = "cancelled"
+                elif not paper_info["total_docs"]:
+                    paper_info["error"] = "没有可入库的内容"
+                else:
+                    self.library.save_artifact(paper_id, "lexical_index", lexical_index.to_dict())
+                    self.library.save_artifact(paper_id, "chunk_hierarchy", hierarchy.to_dict())
+                    if not self.library.mark_ready(paper_id, paper_info["total_docs"]):
+                        raise Exception("论文记录在入库期间被删除")
+                    status = "ready"
+                    self.library.gc(keep=[paper_id], in_use=self.in_use)
+            except Exception as e:
+                logger.error(f"流式入库失败: {e}")
+                paper_info["error"] = str(e)
+            finally:
+                if status != "ready":
+                    # 本次入库创建的未完成论文不保留（清单记录和已写入部分的collection一并删除），下次上传重新入库
+                    try:
+                        self.library.abort(paper_id)
+                    except Exception as e:
+                        logger.error(f"未完成的论文清理失败: {e}")
+                    if self.current_paper_id == paper_id:
+                        self.vectorstore = None
+                        self.lexical_index = None
+                        self.chunk_hierarchy = None
+                        self.current_paper_id = None
+                # 入库结果记录在论文信息中，indexing_complete置位后可读取
+                paper_info["status"] = status
+                paper_info["indexing"] = False
+                ready.set()
+                indexing_complete.set()
+
+        threading.Thread(target=_ingest, name="paper-ingest", daemon=True).start()
+        ready.wait()
+
+        if cancelled.is_set():
+            logger.info(f"论文加载已取消: {title}")
+            return False
+        if not self.vectorstore or self.current_paper_id != paper_id:
+            logger.error(f"论文加载失败: {paper_info.get('error', '没有可入库的内容')}")
+            return False
+
+        logger.info(f"论文加载成功: {self.current_paper_info['title']}")
+        return True
+
     def ask_question(self, question: str) -> Dict[str, Any]:
         """回答问题 - 改进检索策略"""
-        if not self.vectorstore:
+        try:
+            cached, cache_key = self._cached_answer(question)
+            if cached:
+                return cached
+
+            early_result, prompt, filtered_docs = self._prepare_answer(question)
+            if early_result:
+                return early_result
+
+            # 生成回答
+            qwen_model = self.model_manager.get_model("qa")
+            answer = qwen_model(prompt)
+
+            result = self._answer_result(question, answer, filtered_docs)
+            self._store_answer(cache_key, question, result)
+            return result
+
+        except Exception as e:
+            logger.error(f"问答失败: {e}")
             return {
-                "answer": "请先上传论文",
+                "answer": f"回答生成时出现错误: {str(e)}",
                 "sources": [],
                 "confidence": 0
             }
 
+    def ask_question_stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        """流式回答问题：逐个产出token事件，最后产出带来源和置信度的done事件
+
+        事件格式: {"type": "token", "text": ...} / {"type": "done", ...} / {"type": "error", "message": ...}
+        """
+        start_time = time.time()
+        try:
+            cached, cache_key = self._cached_answer(question)
+            if cached:
+                yield {"type": "token", "text": cached["answer"]}
+                latency = round(time.time() - start_time, 3)
+                yield dict(cached, type="done", first_token_latency=latency, total_latency=latency)
+                return
+
+            early_result, prompt, filtered_docs = self._prepare_answer(question)
+            if early_result:
+                yield {"type": "token", "text": early_result["answer"]}
+                yield dict(early_result, type="done")
+                return
+
+            qwen_model = self.model_manager.get_model("qa")
+            parts = []
+            first_token_latency = None
+            for token in qwen_model.stream(prompt):
+                if first_token_latency is None:
+                    first_token_latency = time.time() - start_time
+                    logger.info(f"首token延迟: {first_token_latency:.2f}秒")
+                parts.append(token)
+                yield {"type": "token", "text": token}
+
+            result = self._answer_result(question, "".join(parts).strip(), filtered_docs)
+            self._store_answer(cache_key, question, result)
+            result.update({
+                "type": "done",
+                "first_token_latency": round(first_token_latency or 0, 3),
+                "total_latency": round(time.time() - start_time, 3)
+            })
+            yield result
+
+        except Exception as e:
+            logger.error(f"流式问答失败: {e}")
+            yield {"type": "error", "message": f"回答生成时出现错误: {str(e)}"}
+
+    async def aask_question(self, question: str) -> Dict[str, Any]:
+        """异步回答问题：检索在I/O线程池中执行，生成走异步HTTP连接池，等待LLM时不占用线程"""
+        io_stage = get_executor(IO)
         try:
-            # 改进的检索策略
-            relevant_docs = self._smart_retrieve(question)
+            cached, cache_key = await io_stage.run(self._cached_answer, question)
+            if cached:
+                return cached
 
-            if not relevant_docs:
-                return {
-                    "answer": "抱歉，我在论文中没有找到与您问题相关的内容。",
-                    "sources": [],
-                    "confidence": 0
-                }
+            early_result, prompt, filtered_docs = await io_stage.run(self._prepare_answer, question)
+            if early_result:
+                return early_result
 
-            # 过滤检索结果，确保相关性
-            filtered_docs = self._filter_relevant_docs(question, relevant_docs)
+            answer = await self.model_manager.get_model("qa").acall(prompt)
 
-            if not filtered_docs:
-                return {
-                    "answer": "抱歉，检索到的内容与您的问题相关性较低，请尝试重新表述问题。",
-                    "sources": [],
-                    "confidence": 0
-                }
+            result = self._answer_result(question, answer, filtered_docs)
+            self._store_answer(cache_key, question, result)
+            return result
+
+        except Exception as e:
+            logger.error(f"问答失败: {e}")
+            return {
+                "answer": f"回答生成时出现错误: {str(e)}",
+                "sources": [],
+                "confidence": 0
+            }
+
+    async def aask_question_stream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """异步流式回答问题，事件格式与ask_question_stream相同，token通过异步SSE连接逐个产出"""
+        start_time = time.time()
+        io_stage = get_executor(IO)
+        try:
+            cached, cache_key = await io_stage.run(self._cached_answer, question)
+            if cached:
+                yield {"type": "token", "text": cached["answer"]}
+                latency = round(time.time() - start_time, 3)
+                yield dict(cached, type="done", first_token_latency=latency, total_latency=latency)
+                return
+
+            early_result, prompt, filtered_docs = await io_stage.run(self._prepare_answer, question)
+            if early_result:
+                yield {"type": "token", "text": early_result["answer"]}
+                yield dict(early_result, type="done")
+                return
 
-            # 构建高质量上下文
-            context = self._build_context(filtered_docs)
+            qwen_model = self.model_manager.get_model("qa")
+            parts = []
+            first_token_latency = None
+            async for token in qwen_model.astream(prompt):
+                if first_token_latency is None:
+                    first_token_latency = time.time() - start_time
+                    logger.info(f"首token延迟: {first_token_latency:.2f}秒")
+                parts.append(token)
+                yield {"type": "token", "text": token}
+
+            result = self._answer_result(question, "".join(parts).strip(), filtered_docs)
+            self._store_answer(cache_key, question, result)
+            result.update({
+                "type": "done",
+                "first_token_latency": round(first_token_latency or 0, 3),
+                "total_latency": round(time.time() - start_time, 3)
+            })
+            yield result
 
-            # 改进的prompt
-            improved_prompt = f"""
+        except Exception as e:
+            logger.error(f"流式问答失败: {e}")
+            yield {"type": "error", "message": f"回答生成时出现错误: {str(e)}"}
+
+    @staticmethod
+    def _batch_error_result(question: str, e: Exception) -> Dict[str, Any]:
+        logger.error(f"问答失败: {e}")
+        return {
+            "answer": f"回答生成时出现错误: {str(e)}",
+            "sources": [],
+            "confidence": 0,
+            "question": question
+        }
+
+    def _prepare_batch(self, questions: List[str]):
+        """批量问答的检索阶段，返回 (已有的结果, 写回缓存用的键, 需生成的 {序号: (prompt, 文档)})
+
+        所有问题一次批量向量化、一次批量检索；语义回答缓存命中的问题不再检索和生成。
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        cache_keys = [None] * len(questions)
+        pending: List[int] = []
+
+        try:
+            embeddings = self.processor.embeddings
+            query_embeddings = None
+            if self.vectorstore and hasattr(embeddings, "embed_queries"):
+                # 一次encode，同时写入查询向量缓存，之后按问题查回答缓存时不再编码
+                query_embeddings = embeddings.embed_queries(questions)
+
+            for i, question in enumerate(questions):
+                cached, cache_keys[i] = self._cached_answer(question)
+                if cached:
+                    results[i] = cached
+                else:
+                    pending.append(i)
+
+            vector_results = [None] * len(questions)
+            if pending and self.vectorstore:
+                vectors = [query_embeddings[i] if query_embeddings else embeddings.embed_query(questions[i])
+                           for i in pending]
+                for i, found in zip(pending, self._batch_vector_search(vectors)):
+                    vector_results[i] = found
+        except Exception as e:
+            # 批量阶段失败时逐个问题单独检索
+            logger.warning(f"批量检索失败，逐个检索: {e}")
+            pending = [i for i in range(len(questions)) if results[i] is None]
+            vector_results = [None] * len(questions)
+
+        prompts: Dict[int, Any] = {}
+        for i in pending:
+            try:
+                early_result, prompt, filtered_docs = self._prepare_answer(questions[i], vector_results[i])
+                if early_result:
+                    results[i] = dict(early_result, question=questions[i])
+                else:
+                    prompts[i] = (prompt, filtered_docs)
+            except Exception as e:
+                results[i] = self._batch_error_result(questions[i], e)
+
+        logger.info(f"批量问答: {len(questions)} 个问题，缓存命中 {len(questions) - len(pending)} 个，"
+                    f"需生成 {len(prompts)} 个")
+        return results, cache_keys, prompts
+
+    async def aask_questions(self, questions: List[str], max_concurrency: int = None) -> AsyncIterator[Dict[str, Any]]:
+        """批量回答问题，按问题顺序逐个产出结果（结果带index字段）
+
+        检索阶段在I/O线程池中执行；生成走异步HTTP连接池并发执行（并发数受BATCH_MAX_CONCURRENCY限制），
+        等待LLM时不占用线程。
+        """
+        results, cache_keys, prompts = await get_executor(IO).run(self._prepare_batch, questions)
+        semaphore = asyncio.Semaphore(max(1, min(max_concurrency or Config.BATCH_MAX_CONCURRENCY, len(prompts))))
+
+        async def generate(prompt: str) -> str:
+            async with semaphore:
+                return await self.model_manager.acall_with_retry("qa", prompt)
+
+        tasks = {i: asyncio.ensure_future(generate(prompt)) for i, (prompt, _) in prompts.items()}
+        try:
+            for i, question in enumerate(questions):
+                if i in tasks:
+                    try:
+                        results[i] = self._answer_result(question, await tasks[i], prompts[i][1])
+                        self._store_answer(cache_keys[i], question, results[i])
+                    except Exception as e:
+                        results[i] = self._batch_error_result(question, e)
+                yield dict(results[i], index=i)
+        finally:
+            # 调用方提前停止迭代时（如客户端断开），未完成的生成一并取消
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    def _invalidate_answers(self, paper_id: str):
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(paper_id)
+
+    def _cached_answer(self, question: str):
+        """查询语义回答缓存，返回 (命中的回答结果, 写回缓存用的键)
+
+        论文仍在入库时不使用缓存，此时的回答只基于部分内容。
+        """
+        if self.answer_cache is None or not self.vectorstore or self.current_paper_info.get("indexing"):
+            return None, None
+
+        record = self.library.get_record(self.current_paper_id) or {}
+        version = record.get("indexed_at")
+        if version is None:
+            return None, None
+
+        # 查询向量有LRU缓存，随后的检索不会重复编码
+        query_embedding = self.processor.embeddings.embed_query(question)
+        cache_key = (self.current_paper_id, version, query_embedding)
+        hit = self.answer_cache.lookup(self.current_paper_id, version, question, query_embedding)
+        if hit is None:
+            return None, cache_key
+
+        result, similarity = hit
+        result.pop("cached_at", None)
+        result.update({
+            "cached_question": result.get("question"),
+            "question": question,
+            "cached": True,
+            "cache_similarity": round(similarity, 4)
+        })
+        return result, cache_key
+
+    def _store_answer(self, cache_key, question: str, result: Dict[str, Any]):
+        if cache_key is None:
+            return
+        paper_id, version, query_embedding = cache_key
+        self.answer_cache.store(paper_id, version, question, query_embedding, result)
+
+    def _prepare_answer(self, question: str, vector_results=None):
+        """检索并构建prompt，返回 (提前结束时的结果, prompt, 相关文档)
+
+        vector_results为批量检索预先取得的 (相似度检索结果, MMR结果)，为None时单独检索。
+        """
+        if not self.vectorstore:
+            return {
+                "answer": "请先上传论文",
+                "sources": [],
+                "confidence": 0
+            }, None, []
+
+        # 改进的检索策略
+        relevant_docs = self._smart_retrieve(question, vector_results)
+
+        if not relevant_docs:
+            return {
+                "answer": "抱歉，我在论文中没有找到与您问题相关的内容。",
+                "sources": [],
+                "confidence": 0
+            }, None, []
+
+        # 交叉编码器重排序，只保留最相关的几个文档块送入LLM
+        if self.reranker is not None:
+            relevant_docs = self.reranker.rerank(question, relevant_docs)
+
+        # 过滤检索结果，确保相关性
+        filtered_docs = self._filter_relevant_docs(question, relevant_docs)
+
+        if not filtered_docs:
+            return {
+                "answer": "抱歉，检索到的内容与您的问题相关性较低，请尝试重新表述问题。",
+                "sources": [],
+                "confidence": 0
+            }, None, []
+
+        # 命中的子块扩展为父窗口上下文
+        filtered_docs = self._expand_to_parents(filtered_docs)
+
+        # 构建高质量上下文
+        context = self._build_context(filtered_docs)
+
+        # 改进的prompt
+        improved_prompt = f"""
             请基于以下论文内容回答用户问题。注意：
 
             1. 只基于提供的论文内容回答，不要添加论文中没有的信息
@@ -94,63 +630,48 @@ class PaperQASystem:
             回答：
             """
 
-            # 生成回答
-            qwen_model = self.model_manager.get_model("qa")
-            answer = qwen_model(improved_prompt)
+        return None, improved_prompt, filtered_docs
 
-            # 格式化来源信息
-            sources = self._format_sources(filtered_docs)
+    def _answer_result(self, question: str, answer: str, filtered_docs: List) -> Dict[str, Any]:
+        """组装回答结果：来源信息和置信度"""
+        # 格式化来源信息
+        sources = self._format_sources(filtered_docs)
 
-            # 评估置信度
-            confidence = self._estimate_confidence(question, filtered_docs)
+        # 评估置信度
+        confidence = self._estimate_confidence(question, filtered_docs)
 
-            return {
-                "answer": answer,
-                "sources": sources,
-                "confidence": confidence,
-                "question": question
-            }
-
-        except Exception as e:
-            logger.error(f"问答失败: {e}")
-            return {
-                "answer": f"回答生成时出现错误: {str(e)}",
-                "sources": [],
-                "confidence": 0
-            }
+        return {
+            "answer": answer,
+            "sources": sources,
+            "confidence": confidence,
+            "question": question
+        }
 
-    def _smart_retrieve(self, question: str) -> List:
+    def _smart_retrieve(self, question: str, vector_results=None) -> List:
         """智能检索策略"""
         try:
-            # 多种检索策略结合
-            results = []
-
-            # 1. 基本相似性检索
-            similarity_results = self.vectorstore.similarity_search(
-                question,
-                k=6,
-                filter=None  # 确保不使用过时的filter
-            )
-            results.extend(similarity_results)
+            # 多种检索策略结合，问题只向量化一次
+            if vector_results is None:
+                vector_results = self._vector_search(self.processor.embeddings.embed_query(question))
+            scored_results, mmr_results = vector_results
 
+            # 1. 基本相似性检索（带分数，分数随文档元数据传递给置信度估算）
+            similarity_results = self._attach_similarity(scored_results)
             # 2. MMR检索（最大边际相关性）
-            try:
-                mmr_results = self.vectorstore.max_marginal_relevance_search(
-                    question,
-                    k=4,
-                    fetch_k=10
-                )
-                results.extend(mmr_results)
-            except:
-                logger.warning("MMR检索失败，使用基本检索")
+            results = similarity_results + mmr_results
+
+            # 3. BM25关键词检索，与向量检索结果做倒数排名融合（按chunk_uid去重）
+            if self._use_hybrid():
+                lexical_results = self.lexical_index.search(question, k=Config.LEXICAL_TOP_K)
+                return rrf_fuse([similarity_results, mmr_results, lexical_results], limit=8)
 
             # 去重
-            seen_content = set()
+            seen_keys = set()
             unique_results = []
             for doc in results:
-                content_hash = hash(doc.page_content[:100])
-                if content_hash not in seen_content:
-                    seen_content.add(content_hash)
+                key = chunk_key(doc)
+                if key not in seen_keys:
+                    seen_keys.add(key)
                     unique_results.append(doc)
 
             return unique_results[:8]  # 限制结果数量
@@ -159,6 +680,80 @@ class PaperQASystem:
             logger.error(f"检索失败: {e}")
             return []
 
+    def _vector_search(self, query_embedding: List[float]):
+        """单个问题的向量检索，返回 (相似度检索结果[(文档, 距离)], MMR结果)"""
+        scored_results = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+            query_embedding,
+            k=self.SIMILARITY_K,
+            filter=None  # 确保不使用过时的filter
+        )
+        mmr_results = []
+        try:
+            mmr_results = self.vectorstore.max_marginal_relevance_search_by_vector(
+                query_embedding,
+                k=self.MMR_K,
+                fetch_k=self.MMR_FETCH_K
+            )
+        except:
+            logger.warning("MMR检索失败，使用基本检索")
+        return scored_results, mmr_results
+
+    def _batch_vector_search(self, query_embeddings: List[List[float]]) -> List:
+        """多个问题的向量检索合并为一次查询，返回每个问题的 (相似度检索结果, MMR结果)
+
+        内存索引做一次矩阵乘法；Chroma一次query取回候选及其向量，MMR在本地计算。
+        """
+        vectorstore = self.vectorstore
+        if isinstance(vectorstore, FlatIndex):
+            return vectorstore.search_batch(
+                query_embeddings, k=self.SIMILARITY_K, mmr_k=self.MMR_K, fetch_k=self.MMR_FETCH_K
+            )
+
+        collection = getattr(vectorstore, "_collection", None)
+        if collection is None or collection.count() == 0:
+            return [self._vector_search(embedding) for embedding in query_embeddings]
+
+        data = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=min(max(self.SIMILARITY_K, self.MMR_FETCH_K), collection.count()),
+            include=["documents", "metadatas", "distances", "embeddings"]
+        )
+        results = []
+        for i, embedding in enumerate(query_embeddings):
+            texts, metadatas, distances = data["documents"][i], data["metadatas"][i], data["distances"][i]
+            scored = [
+                (Document(page_content=text, metadata=dict(metadata or {})), distance)
+                for text, metadata, distance in list(zip(texts, metadatas, distances))[:self.SIMILARITY_K]
+            ]
+            candidates = np.asarray(data["embeddings"][i], dtype=np.float32)
+            candidates /= np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+            query = np.asarray(embedding, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            picked = mmr_select(query, candidates, self.MMR_K)
+            mmr = [Document(page_content=texts[j], metadata=dict(metadatas[j] or {})) for j in sorted(picked)]
+            results.append((scored, mmr))
+        return results
+
+    def _attach_similarity(self, scored_results: List) -> List:
+        """把向量库返回的距离换算成余弦相似度，写入文档元数据"""
+        if not scored_results:
+            return []
+        distances = np.array([distance for _, distance in scored_results], dtype=np.float32)
+
+        collection = getattr(self.vectorstore, "_collection", None)
+        space = (collection.metadata or {}).get("hnsw:space", "l2") if collection is not None else "cosine"
+        # 向量已归一化：余弦距离 d = 1 - cos，平方L2距离 d = 2 - 2cos
+        similarities = 1.0 - distances if space == "cosine" else 1.0 - distances / 2.0
+
+        docs = []
+        for (doc, _), similarity in zip(scored_results, similarities):
+            doc.metadata['similarity'] = float(similarity)
+            docs.append(doc)
+        return docs
+
+    def _use_hybrid(self) -> bool:
+        return Config.HYBRID_RETRIEVAL and self.lexical_index is not None and len(self.lexical_index) > 0
+
     def _filter_relevant_docs(self, question: str, docs: List) -> List:
         """过滤相关文档"""
         if not docs:
@@ -188,6 +783,16 @@ class PaperQASystem:
 
         return filtered[:6]  # 限制数量
 
+    def _expand_to_parents(self, docs: List) -> List:
+        """按父子块偏移表把子块扩展为父窗口，同一父窗口的子块合并"""
+        if self.chunk_hierarchy is None or not len(self.chunk_hierarchy):
+            return docs
+        expanded = self.chunk_hierarchy.expand(docs)
+        logger.info(f"上下文扩展: {len(docs)} 个子块 -> {len(expanded)} 段，"
+                    f"{sum(len(doc.page_content) for doc in docs)} -> "
+                    f"{sum(len(doc.page_content) for doc in expanded)} 字符")
+        return expanded
+
     def explain_term(self, term: str) -> str:
         """解释术语"""
         if not self.vectorstore:
@@ -195,16 +800,20 @@ class PaperQASystem:
 
         try:
             # 搜索术语相关内容
-            relevant_docs = self.vectorstore.similarity_search(term, k=3)
+            query_embedding = self.processor.embeddings.embed_query(term)
+            relevant_docs = self.vectorstore.similarity_search_by_vector(query_embedding, k=3)
+            if self._use_hybrid():
+                # 术语多为专有名词和缩写，关键词检索更容易精确命中
+                relevant_docs = rrf_fuse([relevant_docs, self.lexical_index.search(term, k=3)], limit=3)
 
             # 过滤相关文档
-            filtered_docs = self._filter_relevant_docs(term, relevant_docs)
+            filtered_docs = self._expand_to_parents(self._filter_relevant_docs(term, relevant_docs))
 
             if not filtered_docs:
                 return f"在论文中没有找到关于'{term}'的相关内容。"
 
             # 构建上下文
-            context = self._build_context(filtered_docs)
+            context = self._build_context(filtered_docs, task_type="explanation")
 
             # 生成解释
             qwen_model = self.model_manager.get_model("explanation")
@@ -217,6 +826,17 @@ class PaperQASystem:
             logger.error(f"术语解释失败: {e}")
             return f"术语解释时出现错误: {str(e)}"
 
+    def search_library(
+            self,
+            query: str,
+            k: int = 10,
+            paper_ids: Optional[List[str]] = None,
+            sections: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """在整个论文库中检索相关文档块（不限于当前论文）"""
+        query_embedding = self.processor.embeddings.embed_query(query)
+        return self.library.search(query_embedding, k=k, paper_ids=paper_ids, sections=sections)
+
     def get_section_keypoints(self, section_name: str) -> List[str]:
         """提取章节关键点"""
         if section_name not in self.current_paper_info.get("sections", {}):
@@ -283,15 +903,14 @@ class PaperQASystem:
             logger.error(f"摘要生成失败: {e}")
             return f"摘要生成时出现错误: {str(e)}"
 
-    def _build_context(self, documents) -> str:
-        """构建上下文"""
-        context_parts = []
-        for i, doc in enumerate(documents):
-            section = doc.metadata.get('section', 'unknown')
-            content = doc.page_content.strip()
-            context_parts.append(f"[章节:{section}] {content}")
-
-        return "\n\n".join(context_parts)
+    def _build_context(self, documents, task_type: str = "qa") -> str:
+        """构建上下文：相邻文档块合并去重叠，按相关性在对应模型的token预算内放入"""
+        builder = ContextBuilder(self.model_manager.get_model(task_type).model_name)
+        context, _, stats = builder.build(documents)
+        logger.info(f"上下文组装: {stats['chunks']} 个文档块 -> {stats['segments']} 段，"
+                    f"{stats['tokens']}/{stats['budget']} tokens，节省 {stats['saved_tokens']} tokens"
+                    f"{'' if stats['exact_tokens'] else '（估算）'}")
+        return context
 
     def _format_sources(self, documents) -> List[Dict[str, str]]:
         """格式化来源信息"""
@@ -305,28 +924,22 @@ class PaperQASystem:
         return sources
 
     def _estimate_confidence(self, question: str, documents) -> float:
-        """估算回答置信度"""
+        """基于检索相似度估算回答置信度
+
+        取最高相似度与平均相似度的加权和，经logistic曲线校准到0~1；
+        只由关键词检索召回、没有向量相似度的文档不参与计算。
+        """
         if not documents:
             return 0.0
 
-        # 基于检索到的文档质量评估置信度
-        doc_count_score = min(len(documents) / 4.0, 1.0)
-
-        # 基于文档内容长度和质量
-        total_content_length = sum(len(doc.page_content) for doc in documents)
-        content_score = min(total_content_length / 1500.0, 1.0)
-
-        # 检查内容相关性
-        question_words = set(question.lower().split())
-        relevance_scores = []
-        for doc in documents:
-            doc_words = set(doc.page_content.lower().split())
-            intersection = len(question_words & doc_words)
-            relevance = intersection / max(len(question_words), 1)
-            relevance_scores.append(relevance)
-
-        avg_relevance = sum(relevance_scores) / len(relevance_scores) if relevance_scores else 0
+        similarities = np.array(
+            [doc.metadata.get('similarity', np.nan) for doc in documents], dtype=np.float32
+        )
+        similarities = similarities[~np.isnan(similarities)]
+        if similarities.size == 0:
+            return 0.0
 
-        # 综合得分
-        confidence = (doc_count_score + content_score + avg_relevance) / 3.0
-        return round(min(confidence, 0.95), 2)  # 最高95%
\ No newline at end of file
+        raw = (Config.CONFIDENCE_TOP_WEIGHT * similarities.max()
+               + (1 - Config.CONFIDENCE_TOP_WEIGHT) * similarities.mean())
+        confidence = 1.0 / (1.0 + np.exp(-Config.CONFIDENCE_SLOPE * (raw - Config.CONFIDENCE_MIDPOINT)))
+        return round(float(min(confidence, Config.CONFIDENCE_MAX)), 2)
@@ -0,0 +1,146 @@
+import numpy as np
+import logging
+from typing import Any, Dict, Optional
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 分块打分时每块的行数：块缓冲留在CPU缓存中，也避免整个矩阵一次性转换成float32
+SCORE_BLOCK_ROWS = 512
+
+
+class VectorCodec:
+    """向量存储编码 - 以压缩格式存放，查询向量保持float32做非对称打分"""
+
+    name = "float32"
+    dtype = np.dtype(np.float32)
+
+    @property
+    def fitted(self) -> bool:
+        return True
+
+    def fit(self, vectors: np.ndarray):
+        pass
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def _prepare_query(self, query: np.ndarray):
+        """返回 (作用于编码的查询向量, 常数偏置)"""
+        return query, 0.0
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """计算 decode(codes) @ query，分块转换为float32，不解码整个矩阵"""
+        query = np.asarray(query, dtype=np.float32)
+        if codes.dtype == np.float32:
+            return codes @ query
+
+        weights, bias = self._prepare_query(query)
+        out = np.empty(len(codes), dtype=np.float32)
+        buffer = np.empty((min(SCORE_BLOCK_ROWS, len(codes)), codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            converted = buffer[:len(block)]
+            converted[...] = block
+            np.dot(converted, weights, out=out[start:start + len(block)])
+        return out + bias if bias else out
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return dim * self.dtype.itemsize
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class Float16Codec(VectorCodec):
+    """半精度存储，内存减半，归一化向量的精度损失可以忽略
+
+    NumPy的半精度到单精度转换没有向量化加速，大库查询耗时明显高于int8。
+    """
+
+    name = "float16"
+    dtype = np.dtype(np.float16)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32).astype(np.float16)
+
+
+class Int8Codec(VectorCodec):
+    """8位标量量化：每个维度按 [min, max] 线性映射到 0~255
+
+    x ≈ offset + scale * code，因此 q·x ≈ (q * scale)·code + q·offset，
+    查询时只需把查询向量按维度缩放一次，编码矩阵无需解码。
+    需要先用样本fit出每个维度的范围，超出范围的分量会被截断。
+    """
+
+    name = "int8"
+    dtype = np.dtype(np.uint8)
+
+    def __init__(self, margin: float = None):
+        # 在样本范围两端各留出一定余量，减少后续写入的截断
+        self.margin = margin if margin is not None else Config.QUANTIZATION_RANGE_MARGIN
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.offset is not None
+
+    def fit(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        padding = (high - low) * self.margin
+        low, high = low - padding, high + padding
+        self.offset = low.astype(np.float32)
+        self.scale = np.maximum((high - low) / 255.0, 1e-8).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if not self.fitted:
+            raise ValueError("int8量化器尚未fit")
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.offset + codes.astype(np.float32) * self.scale
+
+    def _prepare_query(self, query: np.ndarray):
+        return query * self.scale, float(query @ self.offset)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "margin": self.margin,
+            "offset": self.offset.tolist() if self.fitted else None,
+            "scale": self.scale.tolist() if self.fitted else None
+        }
+
+
+_CODECS = {
+    "float32": VectorCodec,
+    "float16": Float16Codec,
+    "int8": Int8Codec
+}
+
+# 支持的向量存储格式名
+STORAGE_FORMATS = tuple(_CODECS)
+
+
+def get_codec(name: str = None) -> VectorCodec:
+    """按名称创建向量编码（float32 / float16 / int8）"""
+    name = name or Config.VECTOR_STORAGE
+    if name not in _CODECS:
+        raise ValueError(f"不支持的向量存储格式: {name}")
+    return _CODECS[name]()
+
+
+def codec_from_dict(data: Dict[str, Any]) -> VectorCodec:
+    codec = get_codec(data.get("name"))
+    if isinstance(codec, Int8Codec):
+        codec.margin = data.get("margin", codec.margin)
+        if data.get("offset") is not None:
+            codec.offset = np.asarray(data["offset"], dtype=np.float32)
+            codec.scale = np.asarray(data["scale"], dtype=np.float32)
+    return codec
@@ -0,0 +1,179 @@
+from langchain.docstore.document import Document
+from sentence_transformers import CrossEncoder
+import numpy as np
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from utils.config import Config
+from core.embedding_cache import normalize_text
+from core.model_registry import model_registry
+from core.executors import CPU, run_stage
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """交叉编码器重排序 - 所有 (问题, 文档块) 对一次批量CPU前向推理，保留前N个
+
+    打分结果按 (问题, 文档块内容) 缓存；按历史耗时的指数滑动平均预估本次耗时，
+    超出延迟预算时跳过重排序，保持检索原顺序。
+    """
+
+    # 连续跳过这么多次后放行一次，用实测耗时修正预估（负载下降后能恢复重排序）
+    PROBE_AFTER_SKIPS = 20
+
+    def __init__(
+            self,
+            model_name: str = None,
+            top_n: int = None,
+            budget_ms: float = None,
+            cache_size: int = None
+    ):
+        self.model_name = model_name or Config.RERANK_MODEL
+        self.top_n = top_n or Config.RERANK_TOP_N
+        self.budget_ms = budget_ms if budget_ms is not None else Config.RERANK_BUDGET_MS
+        self.cache_size = cache_size or Config.RERANK_CACHE_SIZE
+
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 耗时模型: 固定开销 + 每对耗时，均为毫秒的指数滑动平均，首次调用前未知
+        self._overhead_ms: Optional[float] = None
+        self._per_pair_ms: Optional[float] = None
+        self._consecutive_skips = 0
+        self.calls = 0
+        self.skipped = 0
+        self.cache_hits = 0
+        self.pairs_scored = 0
+
+    @property
+    def model(self) -> CrossEncoder:
+        return model_registry.get(
+            f"cross_encoder:{self.model_name}",
+            lambda: CrossEncoder(self.model_name, max_length=Config.RERANK_MAX_LENGTH, device="cpu")
+        )
+
+    def warmup(self):
+        """预加载模型并做一次前向推理"""
+        self.model.predict([("warmup", "warmup")], show_progress_bar=False)
+
+    def _pair_key(self, question: str, doc: Document) -> str:
+        raw = f"{self.model_name}\0{normalize_text(question)}\0{doc.page_content}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def estimate_ms(self, num_pairs: int) -> float:
+        """预估给num_pairs对打分的耗时，没有历史数据时返回0"""
+        if not num_pairs or self._per_pair_ms is None:
+            return 0.0
+        return self._overhead_ms + self._per_pair_ms * num_pairs
+
+    def _record_latency(self, num_pairs: int, elapsed_ms: float):
+        alpha = Config.RERANK_EWMA_ALPHA
+        per_pair = elapsed_ms / num_pairs
+        with self._lock:
+            if self._per_pair_ms is None:
+                self._per_pair_ms, self._overhead_ms = per_pair, 0.0
+            else:
+                # 固定开销取实测值与每对耗时预估之差
+                overhead = max(elapsed_ms - self._per_pair_ms * num_pairs, 0.0)
+                self._per_pair_ms = (1 - alpha) * self._per_pair_ms + alpha * per_pair
+                self._overhead_ms = (1 - alpha) * self._overhead_ms + alpha * overhead
+
+    def score(self, question: str, docs: List[Document], deadline: float = None) -> Optional[List[float]]:
+        """给文档块打分，预估超出预算或截止时间（time.perf_counter()）时返回None"""
+        keys = [self._pair_key(question, doc) for doc in docs]
+        with self._lock:
+            scores = [self._cache.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._cache.move_to_end(key)
+            self.cache_hits += sum(score is not None for score in scores)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            budget_ms = self.budget_ms
+            if deadline is not None:
+                budget_ms = min(budget_ms, (deadline - time.perf_counter()) * 1000)
+            estimate_ms = self.estimate_ms(len(missing))
+            with self._lock:
+                probe = self._consecutive_skips >= self.PROBE_AFTER_SKIPS
+                skip = budget_ms <= 0 or (estimate_ms > budget_ms and not probe)
+                if skip:
+                    self._consecutive_skips += 1
+                    self.skipped += 1
+                else:
+                    self._consecutive_skips = 0
+            if skip:
+                logger.info(f"跳过重排序: 预估 {estimate_ms:.0f}ms 超出预算 {budget_ms:.0f}ms")
+                return None
+
+            model = self.model
+            start_time = time.perf_counter()
+            pairs = [(question, docs[i].page_content) for i in missing]
+            # 所有未命中的对放在同一个batch里，一次前向推理
+            predicted = np.asarray(
+                run_stage(CPU, model.predict, pairs, batch_size=len(pairs), show_progress_bar=False),
+                dtype=np.float32
+            ).reshape(-1)
+            self._record_latency(len(pairs), (time.perf_counter() - start_time) * 1000)
+
+            with self._lock:
+                for i, value in zip(missing, predicted):
+                    scores[i] = float(value)
+                    self._cache[keys[i]] = float(value)
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self.pairs_scored += len(pairs)
+
+        with self._lock:
+            self.calls += 1
+        return scores
+
+    def rerank(
+            self,
+            question: str,
+            docs: List[Document],
+            top_n: int = None,
+            deadline: float = None
+    ) -> List[Document]:
+        """按交叉编码器分数重排并保留前top_n个；跳过时原样返回"""
+        return [doc for doc, _ in self.rerank_with_scores(question, docs, top_n, deadline)]
+
+    def rerank_with_scores(
+            self,
+            question: str,
+            docs: List[Document],
+            top_n: int = None,
+            deadline: float = None
+    ) -> List[Tuple[Document, Optional[float]]]:
+        """返回 (文档, 分数)，跳过重排序时分数为None"""
+        top_n = top_n or self.top_n
+        if not docs:
+            return []
+
+        scores = self.score(question, docs, deadline)
+        if scores is None:
+            return [(doc, None) for doc in docs]
+
+        order = np.argsort(-np.asarray(scores), kind="stable")[:top_n]
+        kept = [(docs[i], scores[i]) for i in order]
+        dropped_chars = sum(len(doc.page_content) for doc in docs) - sum(len(doc.page_content) for doc, _ in kept)
+        logger.info(f"重排序完成: {len(docs)} -> {len(kept)} 个文档块，上下文减少 {dropped_chars} 字符")
+        return kept
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "calls": self.calls,
+                "skipped": self.skipped,
+                "cache_hits": self.cache_hits,
+                "pairs_scored": self.pairs_scored,
+                "cache_entries": len(self._cache),
+                "estimated_ms_per_pair": round(self._per_pair_ms, 3) if self._per_pair_ms is not None else None,
+                "estimated_overhead_ms": round(self._overhead_ms, 3) if self._overhead_ms is not None else None
+            }
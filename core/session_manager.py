@@ -0,0 +1,269 @@
+import copy
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from utils.config import Config
+from core.llm_client import ModelManager
+from core.embeddings import DocumentProcessor
+from core.paper_library import PaperLibrary
+from core.reranker import CrossEncoderReranker
+from core.answer_cache import SemanticAnswerCache
+from core.qa_chain import PaperQASystem
+
+logger = logging.getLogger(__name__)
+
+
+class PaperSession:
+    """单个会话的问答状态：当前论文、检索索引、摘要，会话之间不共享可变状态"""
+
+    def __init__(self, session_id: str, qa_system: PaperQASystem):
+        self.session_id = session_id
+        self.qa_system = qa_system
+        self.current_paper: Optional[Dict[str, Any]] = None
+        self.current_summary: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.last_accessed = self.created_at
+        # 上传、切换论文等修改会话状态的操作串行执行
+        self.lock = threading.RLock()
+        # 排队或执行中的后台任务数（如上传任务），有任务时会话不能回收
+        self.active_jobs = 0
+        self._jobs_lock = threading.Lock()
+
+    @property
+    def paper_id(self) -> Optional[str]:
+        return self.qa_system.current_paper_id
+
+    @property
+    def busy(self) -> bool:
+        """论文仍在后台入库或有未结束的后台任务时不能回收"""
+        return self.active_jobs > 0 or bool(self.qa_system.current_paper_info.get("indexing"))
+
+    def job_started(self):
+        # 不使用会话锁：上传任务执行期间一直持有会话锁，提交新任务不应等待
+        with self._jobs_lock:
+            self.active_jobs += 1
+
+    def job_finished(self):
+        with self._jobs_lock:
+            self.active_jobs -= 1
+
+    def snapshot(self, timeout: float = None) -> "PaperSession":
+        """在会话锁内取会话的快照（会话和问答系统的浅拷贝，共享索引对象）
+
+        问答在快照上执行，上传或切换论文替换索引时不影响进行中的问答；
+        timeout内拿不到会话锁（论文正在入库切换）时抛出TimeoutError。
+        """
+        timeout = Config.SESSION_LOCK_TIMEOUT if timeout is None else timeout
+        if not self.lock.acquire(timeout=timeout):
+            raise TimeoutError("论文正在切换，请稍后重试")
+        try:
+            snapshot = copy.copy(self)
+            snapshot.qa_system = copy.copy(self.qa_system)
+            return snapshot
+        finally:
+            self.lock.release()
+
+    def open_paper(self, paper_id: str) -> bool:
+        """从论文库打开论文（无需重新向量化），恢复论文信息和已保存的摘要"""
+        with self.lock:
+            if not self.qa_system.open_paper(paper_id):
+                return False
+            library = self.qa_system.library
+            paper_info = self.qa_system.current_paper_info
+            record = library.get_record(paper_id) or {}
+            self.current_paper = {
+                "sections": paper_info["sections"],
+                "metadata": {"pages": record.get("pages", 0)},
+                "title": paper_info["title"]
+            }
+            self.current_summary = library.load_artifact(paper_id, "summary")
+            return True
+
+    def close(self):
+        """释放内存中的索引，论文本身保留在持久化论文库中"""
+        qa_system = self.qa_system
+        qa_system.vectorstore = None
+        qa_system.lexical_index = None
+        qa_system.chunk_hierarchy = None
+        # 论文ID一并清除：已关闭的会话不再算作使用该论文，恢复时重新打开
+        qa_system.current_paper_id = None
+        qa_system.current_paper_info = {}
+        self.current_paper = None
+        self.current_summary = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "paper_id": self.paper_id,
+            "paper_title": self.current_paper.get("title") if self.current_paper else None,
+            "indexing": bool(self.qa_system.current_paper_info.get("indexing")),
+            "active_jobs": self.active_jobs,
+            "created_at": self.created_at,
+            "last_accessed": self.last_accessed
+        }
+
+
+class SessionManager:
+    """会话管理 - 每个会话独立的问答状态，按LRU和空闲时间回收
+
+    embedding模型、论文库、重排序模型和回答缓存在所有会话间共享；
+    被回收的会话只释放内存中的索引，再次访问时从论文库重新打开同一篇论文。
+    按论文ID访问时使用该论文的共享会话（只读问答，多个用户共用一份索引）。
+    """
+
+    PAPER_SESSION_PREFIX = "paper:"
+
+    def __init__(
+            self,
+            model_manager: ModelManager,
+            processor: DocumentProcessor = None,
+            library: PaperLibrary = None,
+            max_sessions: int = None,
+            idle_ttl: float = None
+    ):
+        self.model_manager = model_manager
+        self.processor = processor or DocumentProcessor()
+        self.library = library or PaperLibrary(self.processor.embeddings)
+        self.reranker = CrossEncoderReranker() if Config.RERANK_ENABLED else None
+        self.answer_cache = SemanticAnswerCache() if Config.ANSWER_CACHE_ENABLED else None
+        self.max_sessions = max_sessions or Config.SESSION_MAX_ACTIVE
+        self.idle_ttl = idle_ttl if idle_ttl is not None else Config.SESSION_IDLE_TTL
+
+        self._sessions: "OrderedDict[str, PaperSession]" = OrderedDict()
+        # 已回收会话 -> 其论文ID，用于再次访问时恢复
+        self._evicted: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.restores = 0
+
+    def _new_session(self, session_id: str) -> PaperSession:
+        qa_system = PaperQASystem(
+            self.model_manager,
+            processor=self.processor,
+            library=self.library,
+            reranker=self.reranker,
+            answer_cache=self.answer_cache,
+            in_use=self.paper_in_use
+        )
+        return PaperSession(session_id, qa_system)
+
+    def create(self, session_id: str = None) -> PaperSession:
+        """新建会话（指定的ID已存在时返回已有会话）"""
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._new_session(session_id)
+                self._sessions[session_id] = session
+                self._evicted.pop(session_id, None)
+            session.last_accessed = time.time()
+            self._sessions.move_to_end(session_id)
+            evicted = self._evict_locked(keep=session_id)
+
+        self._close_evicted(evicted)
+        return session
+
+    def get(self, session_id: str) -> Optional[PaperSession]:
+        """获取会话，已被回收的会话从论文库恢复，不存在时返回None"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_accessed = time.time()
+                self._sessions.move_to_end(session_id)
+                return session
+            paper_id = self._evicted.get(session_id)
+
+        if paper_id is None:
+            return None
+
+        session = self.create(session_id)
+        with session.lock:
+            if session.paper_id is None and session.open_paper(paper_id):
+                self.restores += 1
+                logger.info(f"会话已恢复: {session_id[:12]}，论文 {paper_id[:12]}")
+        return session
+
+    def get_or_create(self, session_id: str = None) -> PaperSession:
+        if session_id:
+            session = self.get(session_id)
+            if session is not None:
+                return session
+        return self.create(session_id)
+
+    def for_paper(self, paper_id: str) -> Optional[PaperSession]:
+        """按论文ID获取共享会话，论文不在库中时返回None"""
+        if not self.library.has_paper(paper_id):
+            return None
+        session = self.get_or_create(f"{self.PAPER_SESSION_PREFIX}{paper_id}")
+        with session.lock:
+            if session.paper_id != paper_id and not session.open_paper(paper_id):
+                self.delete(session.session_id)
+                return None
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            self._evicted.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def paper_in_use(self, paper_id: str) -> bool:
+        """是否有活跃会话正在使用该论文"""
+        with self._lock:
+            return any(session.paper_id == paper_id for session in self._sessions.values())
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [session.to_dict() for session in reversed(self._sessions.values())]
+
+    def _evict_locked(self, keep: str = None) -> List[PaperSession]:
+        """按空闲时间和LRU挑出要回收的会话（调用方持有锁），正在入库的会话跳过"""
+        now = time.time()
+        evicted = []
+        # 最久未访问的在前
+        for session_id, session in list(self._sessions.items()):
+            if session_id == keep or session.busy:
+                continue
+            idle = self.idle_ttl and now - session.last_accessed > self.idle_ttl
+            overflow = len(self._sessions) > self.max_sessions
+            if not idle and not overflow:
+                continue
+            del self._sessions[session_id]
+            if session.paper_id:
+                self._evicted[session_id] = session.paper_id
+            evicted.append(session)
+
+        while len(self._evicted) > Config.SESSION_EVICTED_MEMORY:
+            self._evicted.popitem(last=False)
+        return evicted
+
+    def _close_evicted(self, evicted: List[PaperSession]):
+        for session in evicted:
+            with session.lock:
+                session.close()
+        if evicted:
+            self.evictions += len(evicted)
+            logger.info(f"回收 {len(evicted)} 个会话，当前活跃会话 {len(self._sessions)} 个")
+
+    def evict_idle(self) -> int:
+        """回收超过空闲时间的会话，返回回收数量"""
+        with self._lock:
+            evicted = self._evict_locked()
+        self._close_evicted(evicted)
+        return len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "max_active": self.max_sessions,
+                "evicted_restorable": len(self._evicted),
+                "evictions": self.evictions,
+                "restores": self.restores
+            }
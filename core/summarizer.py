@@ -1,12 +1,16 @@
 from core.llm_client import ModelManager
+from utils.config import Config
 from utils.prompts import (
     PAPER_SUMMARY_PROMPT,
     INNOVATION_ANALYSIS_PROMPT,
     KEYPOINTS_EXTRACTION_PROMPT
 )
+import asyncio
 import logging
 import json
-from typing import Dict, List, Any
+import time
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Any
 
 logger = logging.getLogger(__name__)
 
@@ -18,32 +22,55 @@ class PaperSummarizer:
         self.model_manager = model_manager
 
     def generate_comprehensive_summary(self, sections: Dict[str, str]) -> Dict[str, Any]:
-        """生成全面的论文摘要"""
-        title = sections.get('title', '未知标题')
+        """生成全面的论文摘要（同步入口，在没有事件循环的工作线程中调用，如上传任务和Gradio回调）"""
+        async def run():
+            try:
+                return await self.agenerate_comprehensive_summary(sections)
+            finally:
+                # 本次调用的事件循环即将结束，关闭其连接池客户端
+                await self.model_manager.aclose()
 
-        try:
-            # 1. 生成整体摘要
-            overall_summary = self._generate_overall_summary(sections, title)
+        return asyncio.run(run())
 
-            # 2. 提取各章节关键点
-            section_summaries = self._extract_section_summaries(sections)
+    async def agenerate_comprehensive_summary(self, sections: Dict[str, str]) -> Dict[str, Any]:
+        """生成全面的论文摘要
 
-            # 3. 分析创新点
-            innovations = self._analyze_innovations(sections, title)
+        各阶段的LLM调用互不依赖，通过异步连接池并发执行（并发数受SUMMARY_MAX_CONCURRENCY限制），
+        单个阶段超时或失败时记入failed_stages、对应部分留空，其余阶段的结果照常返回。
+        """
+        title = sections.get('title', '未知标题')
+
+        try:
+            stages = {
+                # 整体摘要、创新点、研究方法、主要结论
+                "overall_summary": lambda: self._generate_overall_summary(sections, title),
+                "innovations": lambda: self._analyze_innovations(sections, title),
+                "methodology": lambda: self._summarize_methodology(sections),
+                "main_findings": lambda: self._extract_main_findings(sections),
+            }
+            # 各章节关键点
+            for section_name in self._summary_section_names(sections):
+                stages[f"section:{section_name}"] = partial(
+                    self._summarize_section, section_name, sections[section_name]
+                )
 
-            # 4. 生成研究方法总结
-            methodology_summary = self._summarize_methodology(sections)
+            results, failed, timings = await self._run_stages(stages)
 
-            # 5. 提取主要结论
-            main_findings = self._extract_main_findings(sections)
+            section_summaries = {}
+            for section_name in self._summary_section_names(sections):
+                summary = results.get(f"section:{section_name}")
+                if summary:
+                    section_summaries[section_name] = summary
 
             return {
-                "overall_summary": overall_summary,
+                "overall_summary": results.get("overall_summary", ""),
                 "section_summaries": section_summaries,
-                "innovations": innovations,
-                "methodology": methodology_summary,
-                "main_findings": main_findings,
-                "paper_title": title
+                "innovations": results.get("innovations", self._empty_innovations()),
+                "methodology": results.get("methodology", ""),
+                "main_findings": results.get("main_findings", []),
+                "paper_title": title,
+                "failed_stages": failed,
+                "stage_timings": timings
             }
 
         except Exception as e:
@@ -57,7 +84,65 @@ class PaperSummarizer:
                 "paper_title": title
             }
 
-    def _generate_overall_summary(self, sections: Dict[str, str], title: str) -> str:
+    async def _run_stages(self, stages: Dict[str, Callable[[], Awaitable[Any]]]):
+        """并发执行各阶段，返回 (结果, 失败原因, 各阶段耗时)
+
+        每个阶段从真正开始执行时计时，超过SUMMARY_STAGE_TIMEOUT即取消；
+        整体超过SUMMARY_TOTAL_TIMEOUT时，所有未完成阶段一并取消。
+        """
+        semaphore = asyncio.Semaphore(max(1, min(Config.SUMMARY_MAX_CONCURRENCY, len(stages))))
+        timings: Dict[str, float] = {}
+
+        async def run(name: str, fn: Callable[[], Awaitable[Any]]):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    return await asyncio.wait_for(fn(), Config.SUMMARY_STAGE_TIMEOUT)
+                finally:
+                    timings[name] = round(time.monotonic() - started, 2)
+
+        tasks = {name: asyncio.ensure_future(run(name, fn)) for name, fn in stages.items()}
+        _, pending = await asyncio.wait(tasks.values(), timeout=Config.SUMMARY_TOTAL_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        # 等待被取消的阶段退出，释放其HTTP连接
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        results: Dict[str, Any] = {}
+        failed: Dict[str, str] = {}
+        for name, task in tasks.items():
+            if task in pending or isinstance(task.exception(), asyncio.TimeoutError):
+                logger.warning(f"摘要阶段 {name} 超时，已取消")
+                failed[name] = "timeout"
+            elif task.exception() is not None:
+                logger.warning(f"摘要阶段 {name} 失败: {task.exception()}")
+                failed[name] = str(task.exception())
+            else:
+                results[name] = task.result()
+
+        logger.info(f"摘要生成完成: {len(results)}/{len(stages)} 个阶段成功")
+        return results, failed, timings
+
+    @staticmethod
+    def _summary_section_names(sections: Dict[str, str]) -> List[str]:
+        """需要单独总结的章节"""
+        important_sections = [
+            "abstract", "introduction", "methodology",
+            "results", "conclusion", "discussion"
+        ]
+        return [name for name in important_sections if sections.get(name)]
+
+    @staticmethod
+    def _empty_innovations(practical_value: str = "") -> Dict[str, Any]:
+        return {
+            "technical_innovations": [],
+            "methodological_contributions": [],
+            "theoretical_contributions": [],
+            "practical_value": practical_value,
+            "differences_from_existing_work": []
+        }
+
+    async def _generate_overall_summary(self, sections: Dict[str, str], title: str) -> str:
         """生成整体摘要"""
         # 构建摘要内容
         content_parts = []
@@ -73,36 +158,10 @@ class PaperSummarizer:
 
         content = "\n\n".join(content_parts)
 
-        try:
-            qwen_model = self.model_manager.get_model("summary")
-            prompt = PAPER_SUMMARY_PROMPT.format(title=title, content=content)
-            return qwen_model(prompt)
-        except Exception as e:
-            logger.error(f"整体摘要生成失败: {e}")
-            return f"摘要生成失败: {str(e)}"
+        prompt = PAPER_SUMMARY_PROMPT.format(title=title, content=content)
+        return await self.model_manager.acall_with_retry("summary", prompt)
 
-    def _extract_section_summaries(self, sections: Dict[str, str]) -> Dict[str, str]:
-        """提取各章节摘要"""
-        section_summaries = {}
-
-        important_sections = [
-            "abstract", "introduction", "methodology",
-            "results", "conclusion", "discussion"
-        ]
-
-        for section_name in important_sections:
-            if section_name in sections and sections[section_name]:
-                try:
-                    summary = self._summarize_section(section_name, sections[section_name])
-                    if summary:
-                        section_summaries[section_name] = summary
-                except Exception as e:
-                    logger.warning(f"章节 {section_name} 摘要失败: {e}")
-                    continue
-
-        return section_summaries
-
-    def _summarize_section(self, section_name: str, content: str) -> str:
+    async def _summarize_section(self, section_name: str, content: str) -> str:
         """总结单个章节"""
         if len(content) < 100:  # 内容太短不需要总结
             return content
@@ -122,14 +181,9 @@ class PaperSummarizer:
         总结：
         """
 
-        try:
-            qwen_model = self.model_manager.get_model("summary")
-            return qwen_model(prompt)
-        except Exception as e:
-            logger.error(f"章节总结失败: {e}")
-            return ""
+        return await self.model_manager.acall_with_retry("summary", prompt)
 
-    def _analyze_innovations(self, sections: Dict[str, str], title: str) -> Dict[str, Any]:
+    async def _analyze_innovations(self, sections: Dict[str, str], title: str) -> Dict[str, Any]:
         """分析创新点"""
         # 构建分析内容
         analysis_content = ""
@@ -141,33 +195,21 @@ class PaperSummarizer:
         if not analysis_content:
             analysis_content = sections.get("full_text", "")[:2000]
 
-        try:
-            qwen_model = self.model_manager.get_model("analysis")
-            prompt = INNOVATION_ANALYSIS_PROMPT.format(
-                title=title,
-                content=analysis_content
-            )
-
-            response = qwen_model(prompt)
+        prompt = INNOVATION_ANALYSIS_PROMPT.format(
+            title=title,
+            content=analysis_content
+        )
 
-            # 尝试解析JSON响应
-            innovations = self.model_manager.parse_json_response(response)
+        response = await self.model_manager.acall_with_retry("analysis", prompt)
 
-            # 如果解析失败，返回默认格式
-            if "error" in innovations:
-                return self._parse_innovations_from_text(response)
+        # 尝试解析JSON响应
+        innovations = self.model_manager.parse_json_response(response)
 
-            return innovations
+        # 如果解析失败，从文本中解析
+        if "error" in innovations:
+            return self._parse_innovations_from_text(response)
 
-        except Exception as e:
-            logger.error(f"创新点分析失败: {e}")
-            return {
-                "technical_innovations": [],
-                "methodological_contributions": [],
-                "theoretical_contributions": [],
-                "practical_value": "分析失败",
-                "differences_from_existing_work": []
-            }
+        return innovations
 
     def _parse_innovations_from_text(self, text: str) -> Dict[str, Any]:
         """从文本中解析创新点"""
@@ -207,7 +249,7 @@ class PaperSummarizer:
 
         return innovations
 
-    def _summarize_methodology(self, sections: Dict[str, str]) -> str:
+    async def _summarize_methodology(self, sections: Dict[str, str]) -> str:
         """总结研究方法"""
         methodology_content = sections.get("methodology", "")
 
@@ -235,14 +277,9 @@ class PaperSummarizer:
         总结：
         """
 
-        try:
-            qwen_model = self.model_manager.get_model("summary")
-            return qwen_model(prompt)
-        except Exception as e:
-            logger.error(f"方法论总结失败: {e}")
-            return f"方法论总结失败: {str(e)}"
+        return await self.model_manager.acall_with_retry("summary", prompt)
 
-    def _extract_main_findings(self, sections: Dict[str, str]) -> List[str]:
+    async def _extract_main_findings(self, sections: Dict[str, str]) -> List[str]:
         """提取主要发现"""
         findings_content = ""
 
@@ -277,21 +314,15 @@ class PaperSummarizer:
         主要发现：
         """
 
-        try:
-            qwen_model = self.model_manager.get_model("summary")
-            response = qwen_model(prompt)
-
-            # 解析发现列表
-            findings = []
-            for line in response.split('\n'):
-                line = line.strip()
-                if line.startswith(('-', '•', '*')):
-                    findings.append(line[1:].strip())
-                elif line and not line.startswith(('主要发现', '发现', '结论')):
-                    findings.append(line)
+        response = await self.model_manager.acall_with_retry("summary", prompt)
 
-            return findings[:5]  # 最多返回5个发现
+        # 解析发现列表
+        findings = []
+        for line in response.split('\n'):
+            line = line.strip()
+            if line.startswith(('-', '•', '*')):
+                findings.append(line[1:].strip())
+            elif line and not line.startswith(('主要发现', '发现', '结论')):
+                findings.append(line)
 
-        except Exception as e:
-            logger.error(f"主要发现提取失败: {e}")
-            return [f"发现提取失败: {str(e)}"]
\ No newline at end of file
+        return findings[:5]  # 最多返回5个发现
\ No newline at end of file
@@ -13,6 +13,7 @@ from core.pdf_parser import PaperParser
 from core.llm_client import ModelManager
 from core.qa_chain import PaperQASystem
 from core.summarizer import PaperSummarizer
+from core.model_registry import model_registry
 import logging
 
 # 配置日志
@@ -28,11 +29,17 @@ class PaperAssistantUI:
             # 验证配置
             Config.validate()
 
+            # 预加载共享的embedding模型，避免首次上传时才加载
+            if Config.EMBEDDING_WARMUP:
+                model_registry.warmup()
+
             # 初始化组件
             self.model_manager = ModelManager()
             self.parser = PaperParser()
             self.qa_system = PaperQASystem(self.model_manager)
             self.summarizer = PaperSummarizer(self.model_manager)
+            if self.qa_system.reranker is not None and Config.EMBEDDING_WARMUP:
+                self.qa_system.reranker.warmup()
 
             # 状态变量
             self.current_paper = None
@@ -55,8 +62,9 @@ class PaperAssistantUI:
 
             # 进度1: 解析PDF
             progress(0.1, desc="正在解析PDF文件...")
-            sections = self.parser.extract_sections(file.name)
-            metadata = self.parser.extract_metadata(file.name)
+            parsed = self.parser.parse(file.name)
+            sections = parsed.sections
+            metadata = parsed.metadata
 
             progress(0.3, desc="PDF解析完成，准备向量化...")
 
@@ -65,7 +73,9 @@ class PaperAssistantUI:
 
             # 进度2: 加载到问答系统
             progress(0.5, desc="正在创建向量数据库...")
-            success = self.qa_system.load_paper(sections, paper_title)
+            success = self.qa_system.load_paper_streaming(
+                parsed.pages, paper_title, sections, paper_id=parsed.sha256, metadata=metadata
+            )
             if not success:
                 return "❌ 论文加载失败", "", {}, []
 
@@ -115,45 +125,56 @@ class PaperAssistantUI:
             return error_msg, "", {}, []
 
     def ask_question(self, question, history):
-        """处理问答 - 优化响应"""
+        """处理问答 - 流式输出，token到达即渲染"""
         if not question.strip():
-            return history, ""
+            yield history, ""
+            return
 
         if not self.current_paper:
             history.append([question, "❌ 请先上传论文"])
-            return history, ""
-
-        try:
-            start_time = time.time()
+            yield history, ""
+            return
 
-            # 获取回答
-            result = self.qa_system.ask_question(question)
+        start_time = time.time()
+        history.append([question, ""])
+        answer = ""
 
-            processing_time = time.time() - start_time
-
-            # 构建回答
-            answer = result["answer"]
-            confidence = result.get("confidence", 0)
-            sources = result.get("sources", [])
+        try:
+            for event in self.qa_system.ask_question_stream(question):
+                if event["type"] == "token":
+                    answer += event["text"]
+                    history[-1][1] = answer
+                    yield history, ""
+                    continue
+
+                if event["type"] == "error":
+                    history[-1][1] = f"❌ {event['message']}"
+                    break
+
+                # done事件：补充置信度、耗时和来源
+                processing_time = time.time() - start_time
+                confidence = event.get("confidence", 0)
+                sources = event.get("sources", [])
+                first_token = event.get("first_token_latency", processing_time)
 
-            # 优化回答格式
-            full_answer = f"{answer}\n\n"
-            full_answer += f"🎯 **置信度**: {confidence:.0%} | ⏱️ **响应时间**: {processing_time:.1f}秒\n\n"
+                # 优化回答格式
+                full_answer = f"{event.get('answer', answer)}\n\n"
+                full_answer += (f"🎯 **置信度**: {confidence:.0%} | ⚡ **首字**: {first_token:.1f}秒 | "
+                                f"⏱️ **响应时间**: {processing_time:.1f}秒\n\n")
 
-            if sources:
-                full_answer += "📚 **参考来源**:\n"
-                for i, source in enumerate(sources[:3], 1):
-                    section = source.get('section', 'unknown')
-                    content = source.get('content', '')[:80]  # 缩短显示长度
-                    full_answer += f"{i}. [{section}] {content}...\n"
+                if sources:
+                    full_answer += "📚 **参考来源**:\n"
+                    for i, source in enumerate(sources[:3], 1):
+                        section = source.get('section', 'unknown')
+                        content = source.get('content', '')[:80]  # 缩短显示长度
+                        full_answer += f"{i}. [{section}] {content}...\n"
 
-            history.append([question, full_answer])
+                history[-1][1] = full_answer
 
         except Exception as e:
-            error_msg = f"❌ 回答生成失败: {str(e)}"
-            history.append([question, error_msg])
+            history[-1][1] = f"❌ 回答生成失败: {str(e)}"
 
-        return history, ""
+        yield history, ""
 
     def explain_term(self, term):
         """解释术语"""
@@ -0,0 +1,43 @@
+import hashlib
+import numpy as np
+import pytest
+from langchain.embeddings.base import Embeddings
+from utils.config import Config
+
+
+class HashEmbeddings(Embeddings):
+    """测试用embedding：字符二元组哈希到固定维度后归一化，同一文本得到同一向量，无需加载模型"""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(max(len(text) - 1, 1)):
+            digest = hashlib.md5(text[i:i + 2].encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        vector /= np.linalg.norm(vector) or 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def embeddings():
+    return HashEmbeddings()
+
+
+@pytest.fixture
+def isolated_config(tmp_path, monkeypatch):
+    """把论文库和各类缓存指向临时目录，关闭需要加载模型的组件"""
+    monkeypatch.setattr(Config, "CHROMA_DB_PATH", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(Config, "LLM_CACHE_DB_PATH", str(tmp_path / "llm_responses.sqlite3"))
+    monkeypatch.setattr(Config, "EMBEDDING_CACHE_DIR", str(tmp_path / "embeddings"))
+    monkeypatch.setattr(Config, "PARSE_CACHE_DIR", str(tmp_path / "parsed"))
+    monkeypatch.setattr(Config, "RERANK_ENABLED", False)
+    monkeypatch.setattr(Config, "ANSWER_CACHE_ENABLED", False)
+    return tmp_path
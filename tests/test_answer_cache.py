@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import core.answer_cache as answer_cache
+from core.answer_cache import SemanticAnswerCache
+
+RESULT = {"answer": "It uses graphs.", "sources": [], "confidence": 0.8, "question": "What does it use?"}
+
+
+def _vector(angle: float):
+    """与 [1, 0] 夹角为angle（弧度）的单位向量，余弦相似度为cos(angle)"""
+    return [float(np.cos(angle)), float(np.sin(angle))]
+
+
+def test_hit_requires_similarity_above_threshold():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=8, ttl=0)
+    cache.store("p", 1, "What does it use?", _vector(0.0), RESULT)
+
+    result, similarity = cache.lookup("p", 1, "Which method does it use?", _vector(0.3))
+    assert result["answer"] == RESULT["answer"]
+    assert similarity == pytest.approx(np.cos(0.3), abs=1e-6)
+    assert cache.lookup("p", 1, "Who wrote it?", _vector(0.6)) is None
+    # 规范化后相同的问题按完全命中处理
+    assert cache.lookup("p", 1, "What  does it use?", _vector(1.0))[1] == 1.0
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=8, ttl=60)
+    cache.store("p", 1, "What does it use?", _vector(0.0), RESULT)
+
+    now[0] += 59
+    assert cache.lookup("p", 1, "What does it use?", _vector(0.0)) is not None
+    now[0] += 2
+    assert cache.lookup("p", 1, "What does it use?", _vector(0.0)) is None
+
+
+def test_papers_and_versions_are_isolated():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=8, ttl=0)
+    cache.store("p", 1, "What does it use?", _vector(0.0), RESULT)
+
+    assert cache.lookup("q", 1, "What does it use?", _vector(0.0)) is None
+    # 论文重新入库后旧版本的回答整体失效
+    assert cache.lookup("p", 2, "What does it use?", _vector(0.0)) is None
+    assert cache.lookup("p", 1, "What does it use?", _vector(0.0)) is None
+
+
+def test_zero_confidence_answers_are_not_cached():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=8, ttl=0)
+    cache.store("p", 1, "What does it use?", _vector(0.0), dict(RESULT, confidence=0))
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_hit_entry_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=2, ttl=0)
+    for i, question in enumerate(["a", "b"]):
+        now[0] += 1
+        cache.store("p", 1, question, _vector(i), dict(RESULT, question=question))
+    now[0] += 1
+    cache.lookup("p", 1, "a", _vector(0))
+    now[0] += 1
+    cache.store("p", 1, "c", _vector(2), dict(RESULT, question="c"))
+
+    assert cache.lookup("p", 1, "b", _vector(1)) is None
+    assert cache.lookup("p", 1, "a", _vector(0))[0]["question"] == "a"
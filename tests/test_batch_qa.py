@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from core.embeddings import DocumentProcessor
+from core.session_manager import SessionManager
+
+
+class FakeModelManager:
+    """记录同时进行的生成数；问题越靠前回答越慢，完成顺序与问题顺序相反"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    def get_model(self, task_type: str):
+        return SimpleNamespace(model_name="qwen-turbo")
+
+    async def acall_with_retry(self, task_type: str, prompt: str) -> str:
+        question = prompt.rsplit("Question", 1)[-1]
+        index = int(question.split("number", 1)[1].split()[0])
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.05 * (6 - index))
+            if index == 3:
+                raise RuntimeError("generation failed")
+            return f"answer {index}"
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def qa_system(isolated_config, embeddings):
+    model_manager = FakeModelManager()
+    processor = DocumentProcessor(embeddings=embeddings, vector_backend="chroma")
+    session = SessionManager(model_manager=model_manager, processor=processor).create("batch")
+    body = "\n".join(f"Sentence number {i} describes the proposed method." for i in range(8))
+    assert session.qa_system.load_paper({"title": "Paper", "abstract": body, "full_text": body}, paper_id="a" * 64)
+    return session.qa_system
+
+
+async def _collect(qa_system, questions, max_concurrency):
+    return [result async for result in qa_system.aask_questions(questions, max_concurrency=max_concurrency)]
+
+
+def test_results_keep_question_order_under_concurrency_cap(qa_system):
+    questions = [f"Question number {i} : what does the proposed method do?" for i in range(6)]
+    results = asyncio.run(_collect(qa_system, questions, max_concurrency=2))
+
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["question"] for result in results] == questions
+    assert [result["answer"] for result in results if result["index"] != 3] == \
+        [f"answer {i}" for i in (0, 1, 2, 4, 5)]
+    # 单个问题生成失败不影响其余问题
+    assert "generation failed" in results[3]["answer"]
+    assert qa_system.model_manager.peak == 2
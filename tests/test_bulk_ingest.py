@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from bulk_ingest import BulkIngester, IngestManifest
+from core.embeddings import DocumentProcessor
+from core.paper_library import PaperLibrary
+from core.pdf_parser import ParsedPaper
+
+
+def _parsed(name: str, pages: int) -> ParsedPaper:
+    texts = ["Abstract\n" + "\n".join(f"{name} page {page} line {i} covers the data pipeline." for i in range(12))
+             for page in range(pages)]
+    return ParsedPaper(sha256=name * 64, sections={"title": f"Paper {name}"}, metadata={"pages": pages}, pages=texts)
+
+
+@pytest.fixture
+def ingester(isolated_config, embeddings, tmp_path):
+    processor = DocumentProcessor(embeddings=embeddings, vector_backend="chroma")
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    return BulkIngester(PaperLibrary(embeddings), processor, manifest, batch_size=8)
+
+
+def _add(ingester, tmp_path, parsed: ParsedPaper):
+    path = tmp_path / f"{parsed.sha256[0]}.pdf"
+    path.write_bytes(b"%PDF")
+    ingester.add_paper(parsed, path.name, str(path))
+    return path.name
+
+
+def test_stop_writes_buffered_papers_and_aborts_partial_one(ingester, tmp_path):
+    library = ingester.library
+    small = _add(ingester, tmp_path, _parsed("a", 1))
+    assert library.get_record("a" * 64)["status"] == "indexing"
+
+    # 第二篇切块途中收到中断：缓冲中第一篇的文档块写完，第二篇撤销
+    ingester.stop_event.set()
+    large = _add(ingester, tmp_path, _parsed("b", 6))
+
+    assert library.get_record("a" * 64)["status"] == "ready"
+    assert library.get_record("b" * 64) is None
+    assert not library.is_ingesting("b" * 64)
+    assert ingester.manifest.files[small]["status"] == "done"
+    assert large not in ingester.manifest.files
+    assert ingester.stats["failed"] == 0
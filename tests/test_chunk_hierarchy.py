@@ -0,0 +1,52 @@
+from langchain.docstore.document import Document
+
+from core.chunk_hierarchy import ChunkHierarchy
+
+PARENT = "".join(f"{i:02d}-" for i in range(40))  # 120个字符，每3个字符一个编号
+
+
+def _child(uid: str, start: int, end: int, parent_id: str = "p1", similarity: float = None) -> Document:
+    metadata = {"chunk_uid": uid, "parent_id": parent_id, "child_start": start, "child_end": end}
+    if similarity is not None:
+        metadata["similarity"] = similarity
+    return Document(page_content=PARENT[start:end], metadata=metadata)
+
+
+def _hierarchy(*children: Document) -> ChunkHierarchy:
+    hierarchy = ChunkHierarchy({"p1": PARENT, "p2": PARENT.upper()})
+    hierarchy.add_documents(children)
+    return hierarchy
+
+
+def test_children_of_one_parent_merge_in_relevance_order():
+    first, second, other = _child("a", 60, 66, similarity=0.9), _child("b", 30, 36), _child("c", 0, 6, "p2")
+    lexical = Document(page_content="keyword hit", metadata={"chunk_uid": "x"})
+    expanded = _hierarchy(first, second, other).expand([first, lexical, other, second], window_chars=30)
+
+    assert len(expanded) == 3
+    merged = expanded[0]
+    # 命中范围30~66已超过窗口，原样保留；元数据取相关性最高的子块
+    assert merged.page_content == PARENT[30:66]
+    assert merged.metadata["expanded_from"] == ["a", "b"]
+    assert merged.metadata["similarity"] == 0.9
+    assert expanded[1] is lexical
+    assert expanded[2].metadata["expanded_from"] == ["c"]
+
+
+def test_window_grows_evenly_and_shifts_at_boundaries():
+    hierarchy = _hierarchy(_child("mid", 60, 66), _child("head", 3, 9), _child("tail", 111, 117))
+
+    assert hierarchy.expand([_child("mid", 60, 66)], window_chars=30)[0].page_content == PARENT[48:78]
+    # 一侧到达父窗口边界时，余量补给另一侧
+    assert hierarchy.expand([_child("head", 3, 9)], window_chars=30)[0].page_content == PARENT[0:30]
+    assert hierarchy.expand([_child("tail", 111, 117)], window_chars=30)[0].page_content == PARENT[90:120]
+    # 父窗口比预算短时取整个父窗口
+    assert hierarchy.expand([_child("mid", 60, 66)], window_chars=500)[0].page_content == PARENT
+
+
+def test_round_trip_and_version_check():
+    hierarchy = _hierarchy(_child("a", 60, 66))
+    restored = ChunkHierarchy.from_dict(hierarchy.to_dict())
+    assert restored.expand([_child("a", 60, 66)], 30)[0].page_content == PARENT[48:78]
+    assert ChunkHierarchy.from_dict(dict(hierarchy.to_dict(), version=0)) is None
+    assert ChunkHierarchy.from_dict(None) is None
@@ -0,0 +1,33 @@
+import pytest
+from langchain.docstore.document import Document
+
+pytest.importorskip("sentence_transformers")
+
+from utils.config import Config
+from core.qa_chain import PaperQASystem
+
+
+def _confidence(*similarities):
+    docs = [Document(page_content=str(i), metadata={} if s is None else {"similarity": s})
+            for i, s in enumerate(similarities)]
+    return PaperQASystem._estimate_confidence(None, "question", docs)
+
+
+def test_confidence_is_monotonic_in_similarity():
+    values = [_confidence(s, s - 0.1) for s in (0.1, 0.3, 0.45, 0.6, 0.8, 1.0)]
+    assert values == sorted(values)
+    assert values[0] < 0.1
+    # 最高相似度与平均相似度的加权和等于中点时置信度为50%
+    assert _confidence(Config.CONFIDENCE_MIDPOINT) == 0.5
+    assert values[-1] == Config.CONFIDENCE_MAX
+
+
+def test_top_hit_weighs_more_than_the_tail():
+    assert _confidence(0.8, 0.2) > _confidence(0.5, 0.5)
+    assert _confidence(0.7, 0.4) > _confidence(0.6, 0.4)
+
+
+def test_lexical_only_documents_are_ignored():
+    assert _confidence() == 0.0
+    assert _confidence(None, None) == 0.0
+    assert _confidence(0.6, None) == _confidence(0.6)
@@ -0,0 +1,70 @@
+from langchain.docstore.document import Document
+
+from utils.config import Config
+from core.context_builder import ContextBuilder
+
+SENTENCES = [f"Sentence {i} explains part {i} of the method in detail. " for i in range(12)]
+TEXT = "".join(SENTENCES)
+
+
+class WordCounter:
+    """按空白分词计数，结果可手算"""
+    exact = True
+
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+
+def _doc(uid: str, text: str, section: str = "method") -> Document:
+    return Document(page_content=text, metadata={"chunk_uid": uid, "section": section})
+
+
+def _builder(budget: int = 1000) -> ContextBuilder:
+    return ContextBuilder("qwen-turbo", budget=budget, counter=WordCounter())
+
+
+def test_overlapping_and_contained_chunks_are_merged_once():
+    docs = [
+        _doc("p-7", TEXT[300:]),
+        _doc("p-3", TEXT[:200]),
+        _doc("p-4", TEXT[150:350]),
+        _doc("p-5", TEXT[160:190]),
+        _doc("q-0", "Results improve.", section="results"),
+    ]
+    context, used, stats = _builder().build(docs)
+
+    # 首尾重叠的文档块拼成一段，被包含的文档块丢弃，文本不重复
+    assert context == f"[章节:method] {TEXT.strip()}\n\n[章节:results] Results improve."
+    assert stats["segments"] == 2
+    assert {doc.metadata["chunk_uid"] for doc in used} == {"p-3", "p-4", "p-5", "p-7", "q-0"}
+    assert stats["saved_tokens"] > 0
+
+
+def test_adjacent_chunks_join_and_segments_follow_relevance():
+    docs = [
+        _doc("r-9", "Unrelated results.", section="results"),
+        _doc("m-2", "Second part."),
+        _doc("m-1", "First part."),
+    ]
+    context, _, _ = _builder().build(docs)
+    # 顺序号相邻的文档块按论文顺序换行拼接；各段按段内最高排名排序
+    assert context == "[章节:results] Unrelated results.\n\n[章节:method] First part.\nSecond part."
+
+
+def test_budget_truncates_at_sentence_end_and_skips_tiny_remainders(monkeypatch):
+    monkeypatch.setattr(Config, "CONTEXT_MIN_SEGMENT_TOKENS", 5)
+    docs = [_doc("a-0", TEXT), _doc("b-0", "Short tail.", section="results")]
+    context, used, stats = _builder(budget=25).build(docs)
+
+    # 第一段截断在句末，剩余预算仍放得下后面的短段
+    first, second = context.split("\n\n")
+    assert first == "[章节:method] " + "".join(SENTENCES[:2]).strip()
+    assert second == "[章节:results] Short tail."
+    assert stats["tokens"] <= 25
+    assert stats["truncated"] == 1
+    assert [doc.metadata["chunk_uid"] for doc in used] == ["a-0", "b-0"]
+
+    # 剩余预算不足以放下有意义的一段时跳过，后面更短的段仍可放入
+    monkeypatch.setattr(Config, "CONTEXT_MIN_SEGMENT_TOKENS", 30)
+    context, used, _ = _builder(budget=25).build(docs)
+    assert context == "[章节:results] Short tail."
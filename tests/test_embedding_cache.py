@@ -0,0 +1,57 @@
+import sqlite3
+import numpy as np
+
+from core.embedding_cache import EmbeddingCache
+
+
+def _cache(directory, capacity: int = 3) -> EmbeddingCache:
+    return EmbeddingCache("test/model", 4, cache_dir=str(directory), max_entries=capacity, dtype="float32")
+
+
+def test_lru_eviction_survives_reopen(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put_many(["a", "b", "c"], np.eye(4)[:3])
+    cache.get_many(["a"])
+    cache.put_many(["d"], np.eye(4)[3:])
+    assert cache.stats()["evictions"] == 1
+
+    reopened = _cache(tmp_path)
+    a, b, d = reopened.get_many(["a", "b", "d"])
+    # b最久未用，被d挤出；a的访问顺序随写入一起持久化
+    assert b is None
+    np.testing.assert_array_equal(a, np.eye(4)[0])
+    np.testing.assert_array_equal(d, np.eye(4)[3])
+
+
+def test_layout_change_rebuilds_cache(tmp_path):
+    _cache(tmp_path).put_many(["a"], np.eye(4)[:1])
+    assert _cache(tmp_path, capacity=5).get_many(["a"]) == [None]
+
+
+class _FailingDeletes:
+    """删除被淘汰映射时失败的索引连接"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def executemany(self, sql, rows):
+        if sql.startswith("DELETE"):
+            raise sqlite3.OperationalError("database is locked")
+        return self._conn.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_failed_eviction_keeps_old_slot_intact(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put_many(["a", "b", "c"], np.eye(4)[:3])
+    cache._conn = _FailingDeletes(cache._conn)
+    cache.put_many(["d"], np.eye(4)[3:])
+    cache._conn = cache._conn._conn
+
+    # 旧映射未能删除时不改写它的槽位，重新打开后a的向量仍然正确
+    reopened = _cache(tmp_path)
+    a, d = reopened.get_many(["a", "d"])
+    np.testing.assert_array_equal(a, np.eye(4)[0])
+    assert d is None
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from utils.config import Config
+from core.flat_index import FlatIndex, mmr_select
+
+
+def _vectors(rng, n: int, dim: int = 32) -> np.ndarray:
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _index(embeddings, vectors: np.ndarray, storage: str = "float32") -> FlatIndex:
+    index = FlatIndex(embeddings, storage=storage)
+    index.add_embeddings(
+        [f"text-{i}" for i in range(len(vectors))],
+        vectors,
+        [{"section": "method" if i % 2 else "abstract"} for i in range(len(vectors))],
+        [str(i) for i in range(len(vectors))]
+    )
+    return index
+
+
+def _reference_mmr(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float):
+    """逐个候选计算的MMR，作为向量化实现的对照"""
+    selected = []
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i in range(len(candidates)):
+            if i in selected:
+                continue
+            similarity = float(candidates[i] @ query)
+            if selected:
+                redundancy = max(float(candidates[i] @ candidates[j]) for j in selected)
+                score = lambda_mult * similarity - (1 - lambda_mult) * redundancy
+            else:
+                score = similarity
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+def test_top_k_matches_brute_force(embeddings):
+    rng = np.random.default_rng(0)
+    vectors = _vectors(rng, 200)
+    index = _index(embeddings, vectors)
+
+    for query in _vectors(rng, 5):
+        expected = np.argsort(-(vectors @ query), kind="stable")[:10]
+        results = index.similarity_search_by_vector_with_relevance_scores(query.tolist(), k=10)
+        assert [doc.page_content for doc, _ in results] == [f"text-{i}" for i in expected]
+        np.testing.assert_allclose([1.0 - distance for _, distance in results], (vectors @ query)[expected], atol=1e-5)
+
+
+def test_filtered_top_k_matches_brute_force(embeddings):
+    rng = np.random.default_rng(1)
+    vectors = _vectors(rng, 100)
+    index = _index(embeddings, vectors)
+    query = _vectors(rng, 1)[0]
+
+    rows = np.arange(1, 100, 2)
+    expected = rows[np.argsort(-(vectors[rows] @ query), kind="stable")[:5]]
+    results = index.similarity_search_by_vector(query.tolist(), k=5, filter={"section": "method"})
+    assert [doc.page_content for doc in results] == [f"text-{i}" for i in expected]
+
+
+def test_mmr_matches_reference():
+    rng = np.random.default_rng(2)
+    candidates = _vectors(rng, 30)
+    query = _vectors(rng, 1)[0]
+    for lambda_mult in (0.0, 0.5, 1.0):
+        assert mmr_select(query, candidates, 6, lambda_mult) == _reference_mmr(query, candidates, 6, lambda_mult)
+
+
+def test_mmr_search_returns_selection_in_similarity_order(embeddings):
+    rng = np.random.default_rng(3)
+    vectors = _vectors(rng, 100)
+    index = _index(embeddings, vectors)
+    query = _vectors(rng, 1)[0]
+
+    fetched = np.argsort(-(vectors @ query), kind="stable")[:20]
+    picked = sorted(_reference_mmr(query, vectors[fetched], 4, 0.5))
+    results = index.max_marginal_relevance_search_by_vector(query.tolist(), k=4, fetch_k=20)
+    assert [doc.page_content for doc in results] == [f"text-{fetched[i]}" for i in picked]
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_quantized_top_k_close_to_brute_force(embeddings, monkeypatch, storage):
+    monkeypatch.setattr(Config, "QUANTIZATION_MIN_TRAIN", 100)
+    rng = np.random.default_rng(4)
+    vectors = _vectors(rng, 500)
+    index = _index(embeddings, vectors, storage=storage)
+    assert index._matrix.dtype == index.codec.dtype
+
+    recall = []
+    for query in _vectors(rng, 20):
+        expected = {f"text-{i}" for i in np.argsort(-(vectors @ query))[:10]}
+        found = {doc.page_content for doc in index.similarity_search_by_vector(query.tolist(), k=10)}
+        recall.append(len(expected & found) / 10)
+    assert np.mean(recall) >= 0.9
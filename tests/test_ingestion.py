@@ -0,0 +1,89 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from utils.config import Config
+from core.embeddings import DocumentProcessor
+from core.ingestion import IngestionPipeline
+from core.paper_library import PaperLibrary
+from core.qa_chain import PaperQASystem
+
+PAPER_ID = "f" * 64
+
+
+def _pages(count: int = 6):
+    pages = ["Abstract\n" + "\n".join(f"This work studies graph learning, sentence {i}." for i in range(12))]
+    for page in range(1, count):
+        pages.append(("Conclusion\n" if page == 1 else "") + "\n".join(f"Training details on page {page} line {i} cover the data pipeline." for i in range(12)))
+    return pages
+
+
+class FailingProcessor(DocumentProcessor):
+    """写入指定批次数后抛出异常，模拟入库中途失败"""
+
+    def __init__(self, *args, fail_after: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_after = fail_after
+        self.batches = 0
+
+    def add_documents(self, vectorstore, documents):
+        if self.batches >= self.fail_after:
+            raise RuntimeError("disk full")
+        self.batches += 1
+        return super().add_documents(vectorstore, documents)
+
+
+@pytest.fixture
+def make_system(isolated_config, embeddings, monkeypatch):
+    monkeypatch.setattr(Config, "INGEST_BATCH_SIZE", 4)
+
+    def make(processor=None):
+        processor = processor or DocumentProcessor(embeddings=embeddings, vector_backend="chroma")
+        return PaperQASystem(None, processor=processor, library=PaperLibrary(embeddings))
+    return make
+
+
+def test_failed_ingest_drops_partial_paper(make_system, embeddings):
+    qa_system = make_system(FailingProcessor(embeddings=embeddings, vector_backend="chroma", fail_after=2))
+    assert qa_system.load_paper_streaming(_pages(), "Paper", paper_id=PAPER_ID)
+    paper_info = qa_system.current_paper_info
+    assert qa_system.indexing_complete.wait(10)
+
+    assert paper_info["status"] == "failed"
+    assert "disk full" in paper_info["error"]
+    assert qa_system.library.get_record(PAPER_ID) is None
+    assert qa_system.vectorstore is None
+    collections = [c.name for c in qa_system.library.client.list_collections()]
+    assert PaperLibrary.collection_name(PAPER_ID) not in collections
+
+
+def test_cancel_after_last_batch_keeps_paper(make_system):
+    qa_system = make_system()
+    total = sum(1 for _ in IngestionPipeline(qa_system.processor).iter_chunks(_pages()))
+    written = []
+
+    # 全部批次写入之后才请求取消
+    assert qa_system.load_paper_streaming(
+        _pages(), "Paper", paper_id=PAPER_ID,
+        on_progress=lambda progress: written.append(progress["chunks"]),
+        should_stop=lambda: bool(written) and written[-1] >= total
+    )
+    assert qa_system.indexing_complete.wait(10)
+    assert written[-1] == total
+    assert qa_system.current_paper_info["status"] == "ready"
+    assert qa_system.library.has_paper(PAPER_ID)
+
+
+def test_cancel_between_batches_drops_paper(make_system):
+    qa_system = make_system()
+    progress_seen = []
+
+    def on_progress(progress):
+        progress_seen.append(progress)
+
+    # 第一个批次写入后取消
+    assert not qa_system.load_paper_streaming(_pages(), "Paper", paper_id=PAPER_ID, on_progress=on_progress,
+                                              should_stop=lambda: bool(progress_seen))
+    assert qa_system.indexing_complete.wait(10)
+    assert len(progress_seen) == 1
+    assert qa_system.library.get_record(PAPER_ID) is None
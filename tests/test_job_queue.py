@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from utils.config import Config
+from core.job_queue import CANCELLED, FAILED, SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    yield queue
+    queue.shutdown()
+
+
+def _blocking_job(started: threading.Event, release: threading.Event):
+    def run(job):
+        started.set()
+        release.wait(5)
+        return "done"
+    return run
+
+
+def test_cancel_queued_job_skips_it_and_runs_cleanup(queue):
+    started, release = threading.Event(), threading.Event()
+    first = queue.submit("upload", _blocking_job(started, release))
+    started.wait(5)
+
+    ran, cleaned = [], []
+    second = queue.submit("upload", lambda job: ran.append(job), cleanup=lambda: cleaned.append(True))
+    queue.cancel(second.job_id)
+    assert second.status == CANCELLED
+
+    release.set()
+    first.future.result(5)
+    second.future.result(5)
+    assert first.status == SUCCEEDED and first.result == "done"
+    assert ran == [] and cleaned == [True]
+
+
+def test_running_job_stops_at_next_checkpoint(queue):
+    started, stop_seen = threading.Event(), []
+
+    def run(job):
+        with job.stage("parse"):
+            started.set()
+            while not job.should_stop():
+                threading.Event().wait(0.01)
+            stop_seen.append(True)
+
+    job = queue.submit("upload", run, stages=["parse", "index"])
+    started.wait(5)
+    queue.cancel(job.job_id)
+    job.future.result(5)
+
+    assert stop_seen == [True]
+    assert job.status == CANCELLED
+    assert job.to_dict()["stages"]["parse"]["status"] == CANCELLED
+    assert job.to_dict()["stages"]["index"]["status"] == "pending"
+
+
+def test_failed_job_records_error(queue):
+    def run(job):
+        raise RuntimeError("boom")
+
+    job = queue.submit("upload", run)
+    job.future.result(5)
+    assert job.status == FAILED and job.error == "boom"
+
+
+def test_submit_rejects_when_queue_is_full(queue):
+    started, release = threading.Event(), threading.Event()
+    queue.submit("upload", _blocking_job(started, release))
+    started.wait(5)
+    assert queue.submit("upload", lambda job: None) is not None
+    assert queue.submit("upload", lambda job: None) is not None
+    assert queue.submit("upload", lambda job: None) is None
+    release.set()
+
+
+def test_finished_jobs_are_pruned(queue, monkeypatch):
+    monkeypatch.setattr(Config, "JOB_MAX_HISTORY", 2)
+    jobs = [queue.submit("upload", lambda job: None) for _ in range(3)]
+    for job in jobs:
+        job.future.result(5)
+
+    # 提交新任务时清理超出历史上限的已结束任务，最早的先被清理
+    queue.submit("upload", lambda job: None).future.result(5)
+    assert queue.get(jobs[0].job_id) is None
+    assert queue.get(jobs[2].job_id) is not None
+
+    # 超过保留时间的已结束任务全部清理，只剩新提交的任务
+    monkeypatch.setattr(Config, "JOB_RETENTION", -1)
+    latest = queue.submit("upload", lambda job: None)
+    latest.future.result(5)
+    assert [job["job_id"] for job in queue.list_jobs()] == [latest.job_id]
+
+
+def test_cleared_cancel_finishes_as_succeeded(queue):
+    started, cancelled = threading.Event(), threading.Event()
+
+    def run(job):
+        started.set()
+        cancelled.wait(5)
+        # 取消请求到达时工作已经完成
+        job.clear_cancel()
+        return "done"
+
+    job = queue.submit("upload", run)
+    started.wait(5)
+    queue.cancel(job.job_id)
+    cancelled.set()
+    job.future.result(5)
+    assert job.status == SUCCEEDED and job.result == "done"
@@ -0,0 +1,94 @@
+import math
+
+import pytest
+from langchain.docstore.document import Document
+
+from core.lexical_index import LexicalIndex, rrf_fuse, tokenize
+
+
+def _doc(uid: str, text: str, section: str = "method") -> Document:
+    return Document(page_content=text, metadata={"chunk_uid": uid, "section": section})
+
+
+def _bm25(tf: int, doc_len: int, avg_len: float, doc_count: int, doc_freq: int, k1: float, b: float) -> float:
+    idf = math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avg_len))
+
+
+def test_tokenize_mixed_text():
+    assert tokenize("BERT-base 模型训练") == ["bert-base", "bert", "base", "模型", "型训", "训练"]
+
+
+def test_bm25_scores_match_formula():
+    docs = [
+        _doc("a", "transformer attention attention layer"),
+        _doc("b", "convolution layer"),
+        _doc("c", "recurrent network layer with attention"),
+    ]
+    index = LexicalIndex(k1=1.2, b=0.75)
+    index.add_documents(docs)
+
+    results = index.search_with_scores("attention", k=10)
+    avg_len = (4 + 2 + 5) / 3
+    expected = {
+        "a": _bm25(2, 4, avg_len, 3, 2, 1.2, 0.75),
+        "c": _bm25(1, 5, avg_len, 3, 2, 1.2, 0.75),
+    }
+    assert [doc.metadata["chunk_uid"] for doc, _ in results] == ["a", "c"]
+    for doc, score in results:
+        assert score == pytest.approx(expected[doc.metadata["chunk_uid"]], rel=1e-5)
+
+
+def test_bm25_prefers_rare_terms_and_applies_filter():
+    index = LexicalIndex()
+    index.add_documents([
+        _doc("a", "layer layer layer", section="method"),
+        _doc("b", "layer dropout", section="method"),
+        _doc("c", "layer norm", section="experiments"),
+    ])
+    # 只出现在一篇文档中的词项权重更高
+    assert index.search("layer dropout", k=1)[0].metadata["chunk_uid"] == "b"
+    assert [doc.metadata["chunk_uid"] for doc in index.search("layer", filter={"section": "experiments"})] == ["c"]
+    # 重复写入同一chunk_uid不改变索引
+    index.add_documents([_doc("a", "something else")])
+    assert len(index) == 3
+
+
+def test_rrf_fuse_sums_reciprocal_ranks():
+    a, b, c, d = (_doc(uid, uid) for uid in "abcd")
+    fused = rrf_fuse([[a, b, c], [c, b, d]], k=60)
+    # c: 1/63 + 1/61 > b: 1/62 + 1/62 > a: 1/61 > d: 1/63
+    assert [doc.metadata["chunk_uid"] for doc in fused] == ["c", "b", "a", "d"]
+    # 同分时保持首次出现的顺序
+    assert [doc.metadata["chunk_uid"] for doc in rrf_fuse([[a, b], [b, a]], k=60, limit=1)] == ["a"]
+
+
+def test_incremental_batches_match_single_batch():
+    docs = [_doc(uid, text) for uid, text in zip("abcd", ["attention layer", "layer norm", "attention heads", "norm"])]
+    single = LexicalIndex()
+    single.add_documents(docs)
+    incremental = LexicalIndex()
+    incremental.add_documents(docs[:2])
+    incremental.add_documents(docs[2:])
+
+    for query in ("attention", "layer norm"):
+        assert single.search_with_scores(query) == incremental.search_with_scores(query)
+
+
+def test_round_trip_stores_ids_not_texts():
+    docs = [_doc("a", "transformer attention layer"), _doc("b", "convolution layer", section="intro")]
+    index = LexicalIndex()
+    index.add_documents(docs)
+    data = index.to_dict()
+    assert "texts" not in data and "metadatas" not in data
+    assert data["ids"] == ["a", "b"]
+
+    # 文本和元数据从collection读取，顺序不必与索引一致
+    texts = [doc.page_content for doc in reversed(docs)]
+    metadatas = [doc.metadata for doc in reversed(docs)]
+    restored = LexicalIndex.from_dict(data, texts, metadatas, ["b", "a"])
+    assert restored.search_with_scores("layer") == index.search_with_scores("layer")
+    assert restored.search("layer", filter={"section": "intro"})[0].page_content == "convolution layer"
+
+    # collection缺少索引中的文档块时放弃旧索引，由调用方重建
+    assert LexicalIndex.from_dict(data, texts[:1], metadatas[:1], ["b"]) is None
@@ -0,0 +1,41 @@
+import numpy as np
+
+from utils.config import Config
+from core.library_index import LibraryIndex
+
+
+def _vectors(rng, n: int, dim: int = 32) -> np.ndarray:
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_replaced_papers_reuse_labels(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LIBRARY_INDEX_BRUTE_FORCE_MAX", 0)
+    rng = np.random.default_rng(0)
+    index = LibraryIndex(str(tmp_path))
+    for round_ in range(10):
+        for paper in "abc":
+            vectors = _vectors(rng, 20)
+            index.add_paper(paper, [f"{paper}-{round_}-{i}" for i in range(20)], vectors, ["method"] * 20)
+
+    # 反复替换同一批论文，标签和HNSW槽位不会只增不减
+    assert len(index) == 60
+    assert index._next_label == 60
+    assert index._index.get_current_count() == 60
+    hits = index.search(vectors[3], k=1, paper_ids=["c"])
+    assert hits[0]["chunk_uid"] == "c-9-3"
+
+    index.save()
+    reopened = LibraryIndex(str(tmp_path))
+    reopened.remove_paper("a")
+    reopened.add_paper("d", [f"d-{i}" for i in range(20)], _vectors(rng, 20), ["method"] * 20)
+    assert reopened._next_label == 60
+
+
+def test_filtered_search_returns_fewer_hits_than_k(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LIBRARY_INDEX_BRUTE_FORCE_MAX", 0)
+    rng = np.random.default_rng(1)
+    index = LibraryIndex(str(tmp_path))
+    index.add_paper("a", [f"a-{i}" for i in range(50)], _vectors(rng, 50), ["method"] * 49 + ["abstract"])
+    hits = index.search(_vectors(rng, 1)[0], k=10, sections=["abstract"])
+    assert [hit["chunk_uid"] for hit in hits] == ["a-49"]
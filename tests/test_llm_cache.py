@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import core.llm_cache as llm_cache
+import core.llm_client as llm_client
+from core.llm_cache import LLMResponseCache
+from core.llm_client import QwenLLM
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(db_path=str(tmp_path / "llm.sqlite3"), memory_size=2, ttl=60, max_disk_entries=100)
+
+
+@pytest.fixture
+def api_calls(monkeypatch):
+    """替换DashScope调用，记录实际发出的请求"""
+    calls = []
+
+    def fake_call(model, prompt, **kwargs):
+        calls.append(prompt)
+        return SimpleNamespace(status_code=200, output=SimpleNamespace(text=f"answer {len(calls)}"))
+
+    monkeypatch.setattr(llm_client.Generation, "call", fake_call)
+    return calls
+
+
+def test_entries_expire_after_ttl(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    key = LLMResponseCache.make_key("qwen-turbo", 0.1, 100, "prompt")
+    cache.put(key, "response")
+
+    now[0] += 59
+    assert cache.get(key) == "response"
+    now[0] += 2
+    assert cache.get(key) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_layer_survives_memory_eviction(cache):
+    keys = [LLMResponseCache.make_key("qwen-turbo", 0.1, 100, f"prompt {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, f"response {i}")
+    # 内存层只保留2条，最早的一条从SQLite读回
+    assert cache.get(keys[0]) == "response 0"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_key_covers_generation_parameters():
+    base = LLMResponseCache.make_key("qwen-turbo", 0.1, 100, "prompt")
+    assert base != LLMResponseCache.make_key("qwen-plus", 0.1, 100, "prompt")
+    assert base != LLMResponseCache.make_key("qwen-turbo", 0.2, 100, "prompt")
+    assert base != LLMResponseCache.make_key("qwen-turbo", 0.1, 100, "prompt", stop=["\n"])
+
+
+def test_low_temperature_calls_are_cached(cache, api_calls):
+    llm = QwenLLM(api_key="test", model_name="qwen-turbo", temperature=0.1, cache=cache)
+    assert llm("question") == llm("question") == "answer 1"
+    assert len(api_calls) == 1
+
+
+def test_high_temperature_calls_bypass_cache(cache, api_calls):
+    llm = QwenLLM(api_key="test", model_name="qwen-turbo", temperature=0.9, cache=cache)
+    assert llm("question") == "answer 1"
+    assert llm("question") == "answer 2"
+    assert cache.stats()["bypassed"] == 2
+
+
+def test_async_cache_access_runs_off_the_event_loop(cache, monkeypatch):
+    llm = QwenLLM(api_key="test", model_name="qwen-turbo", temperature=0.1, cache=cache)
+    key = llm._cache_key("question")
+    cache.put(key, "cached answer")
+    threads = []
+    cache_get = cache.get
+    monkeypatch.setattr(cache, "get", lambda key: threads.append(threading.current_thread()) or cache_get(key))
+
+    # 命中缓存时不发起请求，SQLite读取在I/O阶段的线程池中完成
+    assert asyncio.run(llm.acall("question")) == "cached answer"
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,153 @@
+import threading
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from utils.config import Config
+from core.embeddings import DocumentProcessor
+from core.session_manager import SessionManager
+
+
+def _sections(name: str):
+    body = "\n".join(f"{name} paper sentence number {i} describes the proposed method." for i in range(8))
+    return {"title": f"Paper {name}", "abstract": body, "full_text": body}
+
+
+def _paper_id(name: str) -> str:
+    return name * 64
+
+
+@pytest.fixture
+def sessions(isolated_config, embeddings, monkeypatch):
+    monkeypatch.setattr(Config, "LIBRARY_MAX_PAPERS", 2)
+    processor = DocumentProcessor(embeddings=embeddings, vector_backend="chroma")
+    return SessionManager(model_manager=None, processor=processor)
+
+
+def test_gc_skips_papers_open_in_other_sessions(sessions):
+    reader = sessions.create("reader")
+    assert reader.qa_system.load_paper(_sections("a"), paper_id=_paper_id("a"))
+
+    uploader = sessions.create("uploader")
+    for name in "bcd":
+        assert uploader.qa_system.load_paper(_sections(name), paper_id=_paper_id(name))
+
+    library = sessions.library
+    assert library.has_paper(_paper_id("a"))
+    assert library.has_paper(_paper_id("d"))
+    assert not library.has_paper(_paper_id("b"))
+    assert not library.has_paper(_paper_id("c"))
+    # 读者会话的索引仍然可用
+    assert reader.qa_system.vectorstore._collection.count() > 0
+
+
+def test_gc_skips_papers_still_indexing(sessions):
+    library = sessions.library
+    library.create(_paper_id("x"), "indexing")
+    for name in "bcd":
+        assert sessions.create(name).qa_system.load_paper(_sections(name), paper_id=_paper_id(name))
+        sessions.delete(name)
+
+    assert library.get_record(_paper_id("x"))["status"] == "indexing"
+    assert library.has_paper(_paper_id("d"))
+
+
+def test_gc_skips_pinned_papers(sessions):
+    library = sessions.library
+    for name in "xyz":
+        library.create(_paper_id(name), name, pinned=True)
+        library.mark_ready(_paper_id(name), 0)
+
+    session = sessions.create("uploader")
+    for name in "bcd":
+        assert session.qa_system.load_paper(_sections(name), paper_id=_paper_id(name))
+
+    assert all(library.has_paper(_paper_id(name)) for name in "xyz")
+    # 固定的论文不计入上限，未固定的论文仍按上限回收
+    assert [library.has_paper(_paper_id(name)) for name in "bcd"] == [False, True, True]
+
+
+def test_concurrent_upload_of_same_paper_joins_first_ingest(sessions, monkeypatch):
+    processor = sessions.processor
+    add_documents = processor.add_documents
+    writing, release = threading.Event(), threading.Event()
+
+    def slow_add_documents(vectorstore, documents):
+        writing.set()
+        release.wait(5)
+        return add_documents(vectorstore, documents)
+
+    monkeypatch.setattr(processor, "add_documents", slow_add_documents)
+    results = {}
+
+    def upload(name):
+        results[name] = sessions.create(name).qa_system.load_paper(_sections("a"), paper_id=_paper_id("a"))
+
+    first = threading.Thread(target=upload, args=("first",))
+    first.start()
+    writing.wait(5)
+    second = threading.Thread(target=upload, args=("second",))
+    second.start()
+    second.join(0.3)
+    # 第二次上传等待第一次入库，不重新创建collection
+    assert second.is_alive()
+
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert results == {"first": True, "second": True}
+    assert sessions.get("second").qa_system.vectorstore._collection.count() > 0
+
+
+def test_failed_ingest_only_cleans_up_its_own_paper(sessions):
+    library = sessions.library
+    paper_id = _paper_id("a")
+    assert library.create(paper_id, "a") is not None
+    assert library.create(paper_id, "a") is None
+
+    results = {}
+    waiter = threading.Thread(target=lambda: results.update(
+        joined=sessions.create("s").qa_system.load_paper(_sections("a"), paper_id=paper_id)
+    ))
+    waiter.start()
+    waiter.join(0.3)
+    assert waiter.is_alive()
+
+    # 第一次入库失败：只清理它自己创建的论文，等待者得到失败结果而不是删除别人的记录
+    assert library.abort(paper_id)
+    waiter.join(5)
+    assert results == {"joined": False}
+    assert not library.abort(paper_id)
+    assert library.get_record(paper_id) is None
+
+
+def test_create_refuses_ready_or_open_papers(sessions):
+    library = sessions.library
+    reader = sessions.create("reader")
+    assert reader.qa_system.load_paper(_sections("a"), paper_id=_paper_id("a"))
+    # 已入库的论文不会被重新创建（删除已有collection）
+    assert library.create(_paper_id("a"), "a") is None
+    assert reader.qa_system.vectorstore._collection.count() > 0
+
+    # 进程重启后遗留的未完成记录可以重新创建，但正被会话使用时不重新创建
+    assert library.create(_paper_id("b"), "b") is not None
+    library._ingesting.clear()
+    assert library.create(_paper_id("b"), "b", in_use=lambda paper_id: True) is None
+    assert library.create(_paper_id("b"), "b") is not None
+
+
+def test_load_fails_when_record_is_deleted_during_ingest(sessions, monkeypatch):
+    library = sessions.library
+    processor = sessions.processor
+    add_documents = processor.add_documents
+
+    def add_then_delete(vectorstore, documents):
+        add_documents(vectorstore, documents)
+        library.delete(_paper_id("a"))
+
+    monkeypatch.setattr(processor, "add_documents", add_then_delete)
+    session = sessions.create("uploader")
+    assert not session.qa_system.load_paper(_sections("a"), paper_id=_paper_id("a"))
+    assert session.qa_system.current_paper_id is None
+    assert not library.mark_ready(_paper_id("a"), 1)
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+import core.pdf_parser as pdf_parser
+from utils.config import Config
+from core.pdf_parser import PaperParser
+
+
+def _make_pdf(pages) -> bytes:
+    """生成每页若干行文本的最小PDF"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        body = "BT /F1 12 Tf 14 TL 72 720 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(_make_pdf([["Abstract", "We study graph learning."], ["Conclusion", "Graphs work well."]]))
+    return path
+
+
+def _forbid_pdf_reads(monkeypatch):
+    """之后的解析不允许打开PDF"""
+    def fail(*args, **kwargs):
+        raise AssertionError("PDF should not be parsed")
+    monkeypatch.setattr(pdf_parser.PyPDF2, "PdfReader", fail)
+
+
+def test_parse_splits_pages_and_sections(isolated_config, pdf_path):
+    parsed = PaperParser().parse(str(pdf_path))
+
+    assert parsed.metadata["pages"] == 2
+    assert [page.split()[0] for page in parsed.pages] == ["Abstract", "Conclusion"]
+    assert "graph learning" in parsed.sections["abstract"]
+    assert parsed.sections["conclusion"] == "Graphs work well."
+    full_text = parsed.sections["full_text"]
+    assert parsed.page_of(full_text.index("graph learning")) == 1
+    assert parsed.page_of(full_text.index("Graphs work")) == 2
+
+
+def test_repeated_parse_hits_memory_then_disk_cache(isolated_config, pdf_path, monkeypatch):
+    parser = PaperParser()
+    first = parser.parse(str(pdf_path))
+
+    _forbid_pdf_reads(monkeypatch)
+    assert parser.parse(str(pdf_path)) is first
+    # 新的解析器内存为空，从磁盘缓存读回
+    assert PaperParser().parse(str(pdf_path)) == first
+
+
+def test_changed_file_misses_cache(isolated_config, pdf_path):
+    parser = PaperParser()
+    first = parser.parse(str(pdf_path))
+
+    pdf_path.write_bytes(_make_pdf([["Abstract", "A revised version."]]))
+    second = parser.parse(str(pdf_path))
+    assert second.sha256 != first.sha256
+    assert second.metadata["pages"] == 1
+    assert "revised" in second.sections["abstract"]
+
+
+def test_corrupt_disk_entry_is_reparsed(isolated_config, pdf_path):
+    first = PaperParser().parse(str(pdf_path))
+    cache_file = os.path.join(Config.PARSE_CACHE_DIR, f"{first.sha256}.json")
+    with open(cache_file, "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    assert PaperParser().parse(str(pdf_path)) == first
+    # 重新解析后缓存文件被修复
+    with open(cache_file, encoding="utf-8") as f:
+        assert json.load(f)["sha256"] == first.sha256
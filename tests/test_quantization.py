@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from core.quantization import codec_from_dict, get_codec
+
+
+def _vectors(n: int = 300, dim: int = 64, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_float16_round_trip_error():
+    vectors = _vectors()
+    codec = get_codec("float16")
+    codes = codec.encode(vectors)
+    assert codes.dtype == np.float16
+    # 归一化向量的分量都在[-1, 1]内，半精度舍入误差不超过 2^-11
+    assert np.abs(codec.decode(codes) - vectors).max() <= 2 ** -11
+
+
+def test_int8_round_trip_error_within_half_step():
+    vectors = _vectors()
+    codec = get_codec("int8")
+    codec.fit(vectors)
+    codes = codec.encode(vectors)
+    assert codes.dtype == np.uint8
+    error = np.abs(codec.decode(codes) - vectors)
+    # 范围内的分量误差不超过半个量化步长
+    assert np.all(error <= codec.scale / 2 + 1e-6)
+
+
+def test_int8_clips_values_outside_fitted_range():
+    codec = get_codec("int8")
+    codec.fit(_vectors())
+    codes = codec.encode(np.full((1, 64), 10.0, dtype=np.float32))
+    assert np.all(codes == 255)
+
+
+@pytest.mark.parametrize("name", ["float32", "float16", "int8"])
+def test_scores_match_decoded_dot_product(name):
+    vectors = _vectors(n=1200)
+    query = _vectors(n=1, seed=1)[0]
+    codec = get_codec(name)
+    codec.fit(vectors)
+    codes = codec.encode(vectors)
+    # 分块打分与先解码再做内积一致，与原始向量的内积只差量化误差
+    np.testing.assert_allclose(codec.scores(codes, query), codec.decode(codes) @ query, atol=1e-4)
+    np.testing.assert_allclose(codec.scores(codes, query), vectors @ query, atol=0.02)
+
+
+def test_codec_serialization_and_unknown_name():
+    codec = get_codec("int8")
+    codec.fit(_vectors())
+    restored = codec_from_dict(codec.to_dict())
+    np.testing.assert_array_equal(restored.encode(_vectors(seed=2)), codec.encode(_vectors(seed=2)))
+    with pytest.raises(ValueError):
+        get_codec("int4")
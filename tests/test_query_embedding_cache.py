@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+import core.embeddings as embeddings_module
+from core.embeddings import ChineseEmbeddings, QueryEmbeddingLRU
+
+
+class CountingModel:
+    """记录每次encode的输入"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(embeddings_module, "query_embedding_cache", QueryEmbeddingLRU(max_size=2))
+    return CountingModel()
+
+
+@pytest.fixture
+def query_embeddings(model):
+    embeddings = ChineseEmbeddings.__new__(ChineseEmbeddings)
+    embeddings.model_name = "test/model"
+    embeddings.model = model
+    embeddings.cache = None
+    return embeddings
+
+
+def test_repeated_question_hits_lru(query_embeddings, model):
+    first = query_embeddings.embed_query("What is the  method?")
+    # 空白差异规范化后命中同一条目，不再encode
+    assert query_embeddings.embed_query("What is the method?") == first
+    assert model.calls == [["What is the  method?"]]
+    assert embeddings_module.query_embedding_cache.stats()["hits"] == 1
+
+
+def test_batch_encodes_only_missing_questions_once(query_embeddings, model):
+    query_embeddings.embed_query("a")
+    vectors = query_embeddings.embed_queries(["a", "bb", "bb"])
+
+    assert model.calls == [["a"], ["bb"]]
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [2.0, 1.0]]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryEmbeddingLRU(max_size=2)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")
+    cache.put("m", "c", [3.0])
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+    # 不同模型的向量互不命中
+    assert cache.get("other", "a") is None
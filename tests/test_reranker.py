@@ -0,0 +1,70 @@
+import pytest
+from langchain.docstore.document import Document
+
+pytest.importorskip("sentence_transformers")
+
+from core.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """分数为文档中问题词出现的次数"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, pairs, **kwargs):
+        self.batches.append(len(pairs))
+        return [float(sum(text.split().count(word) for word in question.split())) for question, text in pairs]
+
+
+class FakeReranker(CrossEncoderReranker):
+    def __init__(self, **kwargs):
+        super().__init__(model_name="test/cross-encoder", **kwargs)
+        self.fake_model = FakeCrossEncoder()
+
+    @property
+    def model(self):
+        return self.fake_model
+
+
+def _docs(*texts):
+    return [Document(page_content=text) for text in texts]
+
+
+def test_rerank_keeps_top_n_and_caches_scores():
+    reranker = FakeReranker(top_n=2, budget_ms=1000)
+    docs = _docs("graph", "graph graph graph", "table", "graph graph")
+
+    ranked = reranker.rerank_with_scores("graph", docs)
+    assert [(doc.page_content, score) for doc, score in ranked] == [("graph graph graph", 3.0), ("graph graph", 2.0)]
+
+    # 再次提问只给新的文档块打分
+    reranker.rerank("graph", docs + _docs("graph graph graph graph"))
+    assert reranker.fake_model.batches == [4, 1]
+    assert reranker.stats()["cache_hits"] == 4
+
+
+def test_over_budget_estimate_skips_and_keeps_order():
+    reranker = FakeReranker(top_n=2, budget_ms=50)
+    reranker._per_pair_ms, reranker._overhead_ms = 20.0, 0.0
+    docs = _docs("table", "graph graph", "graph")
+
+    # 预估 3 x 20ms 超出50ms预算，保持检索原顺序
+    assert reranker.rerank_with_scores("graph", docs) == [(doc, None) for doc in docs]
+    assert reranker.fake_model.batches == []
+    assert reranker.stats()["skipped"] == 1
+
+    # 两对未超出预算，照常打分
+    assert [doc.page_content for doc in reranker.rerank("graph", docs[1:])] == ["graph graph", "graph"]
+
+
+def test_probe_after_consecutive_skips():
+    reranker = FakeReranker(budget_ms=50)
+    reranker._per_pair_ms, reranker._overhead_ms = 100.0, 0.0
+    docs = _docs("graph", "table")
+    for _ in range(CrossEncoderReranker.PROBE_AFTER_SKIPS):
+        assert reranker.score("graph", docs) is None
+
+    # 连续跳过后放行一次，用实测耗时修正预估
+    assert reranker.score("graph", docs) == [1.0, 0.0]
+    assert reranker._per_pair_ms < 100.0
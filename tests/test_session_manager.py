@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from utils.config import Config
+from core.embeddings import DocumentProcessor
+from core.session_manager import SessionManager
+
+
+def _sections(name: str):
+    body = "\n".join(f"{name} paper sentence number {i} describes the proposed method." for i in range(8))
+    return {"title": f"Paper {name}", "abstract": body, "full_text": body}
+
+
+def _paper_id(name: str) -> str:
+    return name * 64
+
+
+@pytest.fixture
+def sessions(isolated_config, embeddings):
+    processor = DocumentProcessor(embeddings=embeddings, vector_backend="chroma")
+    return SessionManager(model_manager=None, processor=processor, max_sessions=2, idle_ttl=0)
+
+
+def _open(sessions, session_id: str, name: str):
+    session = sessions.create(session_id)
+    assert session.qa_system.load_paper(_sections(name), paper_id=_paper_id(name))
+    return session
+
+
+def test_lru_eviction_and_restore(sessions):
+    first = _open(sessions, "s1", "a")
+    _open(sessions, "s2", "b")
+    sessions.get("s2")
+    _open(sessions, "s3", "c")
+
+    # s1最久未访问，超出上限后被回收，内存中的索引随之释放
+    assert [session["session_id"] for session in sessions.list_sessions()] == ["s3", "s2"]
+    assert sessions.stats()["evictions"] == 1
+    assert first.qa_system.vectorstore is None
+    assert first.paper_id is None
+    assert not sessions.paper_in_use(_paper_id("a"))
+
+    # 再次访问时从论文库重新打开同一篇论文
+    restored = sessions.get("s1")
+    assert restored is not first
+    assert restored.paper_id == _paper_id("a")
+    assert restored.current_paper["title"] == "Paper a"
+    assert sessions.stats()["restores"] == 1
+
+
+def test_idle_sessions_are_evicted(sessions):
+    sessions.idle_ttl = 60
+    first = _open(sessions, "s1", "a")
+    second = _open(sessions, "s2", "b")
+    first.last_accessed -= 120
+    second.last_accessed -= 30
+
+    assert sessions.evict_idle() == 1
+    assert [session["session_id"] for session in sessions.list_sessions()] == ["s2"]
+
+
+def test_busy_sessions_are_not_evicted(sessions):
+    busy = _open(sessions, "s1", "a")
+    busy.job_started()
+    _open(sessions, "s2", "b")
+    _open(sessions, "s3", "c")
+    assert "s1" in [session["session_id"] for session in sessions.list_sessions()]
+    busy.job_finished()
+
+
+def test_snapshot_keeps_index_when_session_switches_paper(sessions):
+    session = _open(sessions, "s1", "a")
+    assert session.open_paper(_paper_id("a"))
+    snapshot = session.snapshot()
+
+    assert session.qa_system.load_paper(_sections("b"), paper_id=_paper_id("b"))
+    assert session.paper_id == _paper_id("b")
+    assert snapshot.paper_id == _paper_id("a")
+    assert snapshot.current_paper["title"] == "Paper a"
+    assert snapshot.qa_system.vectorstore is not session.qa_system.vectorstore
@@ -0,0 +1,64 @@
+import asyncio
+
+from utils.config import Config
+from core.summarizer import PaperSummarizer
+
+SECTIONS = {
+    "title": "Test Paper",
+    "abstract": "We propose a method for retrieval. " * 5,
+    "methodology": "The method encodes passages and ranks them. " * 5,
+    "results": "The method improves recall on all benchmarks. " * 5,
+}
+
+
+class FakeModelManager:
+    """按任务类型返回固定响应；failing中的任务抛出异常，slow中的任务一直等待"""
+
+    def __init__(self, failing=(), slow=()):
+        self.failing = set(failing)
+        self.slow = set(slow)
+
+    async def acall_with_retry(self, task_type: str, prompt: str) -> str:
+        if task_type in self.failing:
+            raise RuntimeError(f"{task_type} unavailable")
+        if task_type in self.slow:
+            await asyncio.sleep(10)
+        return "- finding one\n- finding two"
+
+    def parse_json_response(self, response: str):
+        return {"error": "not json"}
+
+    async def aclose(self):
+        pass
+
+
+def test_failed_stage_is_recorded_and_left_empty():
+    summary = PaperSummarizer(FakeModelManager(failing={"analysis"})).generate_comprehensive_summary(SECTIONS)
+
+    # 创新点阶段的异常记入failed_stages，不以占位文本冒充结果
+    assert summary["failed_stages"] == {"innovations": "analysis unavailable"}
+    assert summary["innovations"]["technical_innovations"] == []
+    assert summary["innovations"]["practical_value"] == ""
+    assert summary["main_findings"] == ["finding one", "finding two"]
+    assert set(summary["section_summaries"]) == {"abstract", "methodology", "results"}
+
+
+def test_every_stage_failing_leaves_all_sections_empty():
+    summary = PaperSummarizer(FakeModelManager(failing={"summary", "analysis"})).generate_comprehensive_summary(SECTIONS)
+
+    assert set(summary["failed_stages"]) == {
+        "overall_summary", "innovations", "methodology", "main_findings",
+        "section:abstract", "section:methodology", "section:results"
+    }
+    assert summary["overall_summary"] == ""
+    assert summary["methodology"] == ""
+    assert summary["main_findings"] == []
+    assert summary["section_summaries"] == {}
+
+
+def test_slow_stage_times_out(monkeypatch):
+    monkeypatch.setattr(Config, "SUMMARY_STAGE_TIMEOUT", 0.1)
+    summary = PaperSummarizer(FakeModelManager(slow={"analysis"})).generate_comprehensive_summary(SECTIONS)
+
+    assert summary["failed_stages"] == {"innovations": "timeout"}
+    assert summary["overall_summary"]
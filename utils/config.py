@@ -8,20 +8,138 @@ load_dotenv()
 class Config:
     # API配置
     DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY", "")
+    # 与dashscope SDK共用同一环境变量，可指向本地替身服务（utils/dashscope_stub.py）
+    DASHSCOPE_BASE_URL = os.getenv("DASHSCOPE_HTTP_BASE_URL", "https://dashscope.aliyuncs.com/api/v1")
+
+    # LLM异步HTTP连接池配置
+    LLM_HTTP_MAX_CONNECTIONS = 20
+    LLM_HTTP_MAX_KEEPALIVE = 10
+    LLM_HTTP_KEEPALIVE_EXPIRY = 30  # 空闲连接保活秒数
+    LLM_HTTP_TIMEOUT = 60  # 读写超时（秒）
+    LLM_HTTP_CONNECT_TIMEOUT = 10
+
+    # LLM响应缓存配置（内存LRU + SQLite磁盘层）
+    LLM_CACHE_ENABLED = True
+    LLM_CACHE_DB_PATH = "./cache/llm_responses.sqlite3"
+    LLM_CACHE_MEMORY_SIZE = 256  # 内存中保留的响应数
+    LLM_CACHE_TTL = 7 * 86400  # 磁盘条目有效期（秒），0表示永不过期
+    LLM_CACHE_MAX_DISK_ENTRIES = 20000  # 超出后删除最旧的条目
+    LLM_CACHE_MAX_TEMPERATURE = 0.3  # 温度高于该值的模型（如creative）不走缓存
 
     # 模型配置
     EMBEDDING_MODEL = "BAAI/bge-small-zh-v1.5"  # 轻量级中文embedding模型
     LLM_MODEL = "qwen-turbo"  # 通义千问模型
+    EMBEDDING_WARMUP = True  # 启动时预加载并预热embedding模型
+
+    # embedding缓存配置（按 模型名 + 规范化文本哈希 缓存文档向量）
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_DIR = "./cache/embeddings"
+    EMBEDDING_CACHE_MAX_ENTRIES = 100000  # 超出后按LRU淘汰
+    EMBEDDING_CACHE_DTYPE = "float16"  # float16 或 float32
+    QUERY_EMBEDDING_CACHE_SIZE = 2048  # 内存中保留的查询向量数（LRU）
 
     # 向量数据库配置
     CHROMA_DB_PATH = "./chroma_db"
+    VECTOR_BACKEND = "chroma"  # 检索后端: chroma 或 flat（单篇论文的内存NumPy精确索引）
+    VECTOR_STORAGE = "float32"  # flat后端的向量存储格式: float32 / float16 / int8（标量量化）
+    QUANTIZATION_MIN_TRAIN = 256  # int8量化前至少需要的样本数，不足时先按float32存放
+    QUANTIZATION_RANGE_MARGIN = 0.05  # int8量化范围在样本范围两端各放宽的比例
+    LIBRARY_MAX_PAPERS = 50  # 论文库最多保留的论文数，超出按最久未访问回收
+    LIBRARY_MAX_AGE_DAYS = 30  # 超过该天数未访问的论文会被回收，0表示不按时间回收
+    LIBRARY_INDEX_M = 16  # 论文库HNSW索引每个节点的邻居数，越大召回越高、内存越大
+    LIBRARY_INDEX_EF_CONSTRUCTION = 200  # 建索引时的候选列表大小
+    LIBRARY_INDEX_EF_SEARCH = 64  # 查询时的候选列表大小，可按请求调整
+    LIBRARY_INDEX_INITIAL_CAPACITY = 10000  # 初始容量，写满后翻倍扩容
+    LIBRARY_INDEX_BRUTE_FORCE_MAX = 4096  # 按论文过滤后文档块不超过该数时直接精确计算
+    LIBRARY_INDEX_VECTOR_CACHE_PAPERS = 32  # 精确计算时缓存向量矩阵的论文数（LRU）
+    LIBRARY_INDEX_VECTOR_STORAGE = "int8"  # 精确计算路径缓存的向量矩阵存储格式: float32 / float16 / int8
+    LIBRARY_INDEX_QUANTIZATION_SAMPLE = 4096  # int8量化范围从索引中抽样的向量数
+    LIBRARY_INDEX_SNAPSHOT_INTERVAL = 60  # 两次快照写盘的最小间隔（秒），未写盘的变更启动时从collection补齐
+
+    # PDF解析配置
+    PDF_PARALLEL_MIN_PAGES = 40  # 页数达到该值时启用多进程按页提取
+    PDF_PARSE_WORKERS = None  # 进程数，None表示使用CPU核数
+    PARSE_CACHE_ENABLED = True  # 按文件SHA-256缓存解析结果
+    PARSE_CACHE_DIR = "./cache/parsed"
+    PARSE_CACHE_MEMORY_SIZE = 16  # 内存中保留的解析结果数
 
     # 文本分割配置
     CHUNK_SIZE = 500
     CHUNK_OVERLAP = 50
 
+    # 父子分块配置：小的子块用于检索，回答时按偏移表扩展为父窗口中的上下文
+    HIERARCHICAL_CHUNKING = True
+    CHILD_CHUNK_SIZE = 300
+    CHILD_CHUNK_OVERLAP = 50
+    PARENT_CHUNK_SIZE = 1500
+    PARENT_WINDOW_CHARS = 900  # 每个命中的父窗口扩展后的最大字符数
+
+    # 流式入库配置
+    INGEST_BATCH_SIZE = 32  # 每批embedding并写入向量库的文档块数
+    INGEST_FLUSH_CHARS = 6000  # 单个章节缓冲超过该字符数即切块入库
+    BULK_EMBED_BATCH_SIZE = 256  # 批量入库时跨论文合并的embedding批次大小
+
+    # 摘要生成配置（各阶段LLM调用并发执行）
+    SUMMARY_MAX_CONCURRENCY = 6
+    SUMMARY_STAGE_TIMEOUT = 60  # 单个阶段超时（秒）
+    SUMMARY_TOTAL_TIMEOUT = 180  # 整体超时（秒）
+
     # 检索配置
     RETRIEVE_K = 4  # 检索top-k文档
+    HYBRID_RETRIEVAL = True  # 向量检索结果与BM25关键词检索结果做倒数排名融合
+    LEXICAL_TOP_K = 6  # BM25检索的文档数
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    RRF_K = 60  # 倒数排名融合的平滑常数
+
+    # 语义回答缓存（按论文缓存，问题向量余弦相似度达到阈值即复用回答）
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_THRESHOLD = 0.92  # bge向量的相似度整体偏高，阈值过低会把不同问题当成同一问题
+    ANSWER_CACHE_MAX_ENTRIES = 256  # 每篇论文最多缓存的回答数，超出按最久未命中淘汰
+    ANSWER_CACHE_TTL = 24 * 3600  # 回答缓存有效期（秒），0表示不过期
+
+    # 上下文组装：相邻文档块合并去重叠，按相关性在token预算内放入
+    CONTEXT_TOKEN_BUDGET = 3000  # 未单独配置的模型使用的上下文token预算
+    CONTEXT_TOKEN_BUDGETS = {"qwen-turbo": 3000, "qwen-plus": 6000, "qwen-max": 6000}
+    CONTEXT_MIN_SEGMENT_TOKENS = 80  # 剩余预算低于该值时不再截断放入新段
+    CONTEXT_CJK_TOKENS_PER_CHAR = 0.8  # 无本地分词器时的估算：每个中文字符的token数
+    CONTEXT_CHARS_PER_TOKEN = 3.5  # 无本地分词器时的估算：其他字符平均每token字符数
+
+    # 置信度校准: sigmoid(SLOPE * (加权相似度 - MIDPOINT))，加权相似度 = w*最高相似度 + (1-w)*平均相似度
+    CONFIDENCE_TOP_WEIGHT = 0.6
+    CONFIDENCE_MIDPOINT = 0.45  # 置信度为50%时的相似度
+    CONFIDENCE_SLOPE = 12.0
+    CONFIDENCE_MAX = 0.95
+
+    # 重排序配置（交叉编码器，CPU批量推理，默认关闭）
+    RERANK_ENABLED = False
+    RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # 小型多语言交叉编码器
+    RERANK_TOP_N = 4  # 重排序后送入LLM的文档块数
+    RERANK_MAX_LENGTH = 512
+    RERANK_BUDGET_MS = 300  # 预估耗时超过该值时跳过重排序
+    RERANK_CACHE_SIZE = 4096  # (问题, 文档块) 分数缓存条数
+    RERANK_EWMA_ALPHA = 0.2  # 耗时滑动平均的平滑系数
+
+    # 会话配置：每个会话独立的问答状态，内存中的索引按LRU和空闲时间回收，回收后可从论文库恢复
+    SESSION_MAX_ACTIVE = 8  # 同时保留在内存中的会话数
+    SESSION_IDLE_TTL = 3600  # 空闲超过该秒数的会话被回收，0表示不按空闲时间回收
+    SESSION_EVICTED_MEMORY = 1000  # 记住的已回收会话数（用于再次访问时恢复）
+    SESSION_LOCK_TIMEOUT = 30  # 问答等待会话锁（论文正在切换）的最长秒数，超时返回409
+
+    # 批量问答配置
+    BATCH_MAX_QUESTIONS = 50  # 单次请求的问题数上限
+    BATCH_MAX_CONCURRENCY = 4  # 同时进行的LLM生成数
+
+    # 阶段线程池：CPU密集阶段（PDF解析、embedding、重排序）与I/O密集阶段（LLM调用、向量库）分开
+    EXECUTOR_CPU_WORKERS = None  # CPU阶段线程数，None表示使用CPU核数
+    EXECUTOR_IO_WORKERS = 32  # I/O阶段线程数（同时处理的请求数）
+    EXECUTOR_EWMA_ALPHA = 0.2  # 排队等待时间滑动平均的平滑系数
+
+    # 后台任务配置（上传等耗时任务）
+    JOB_MAX_WORKERS = 2  # 同时执行的任务数
+    JOB_MAX_PENDING = 16  # 排队任务数上限，超出时拒绝提交
+    JOB_RETENTION = 3600  # 已结束任务保留查询的秒数
+    JOB_MAX_HISTORY = 200  # 最多保留的已结束任务数
 
     # 界面配置
     GRADIO_PORT = 7860
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+DashScope文本生成接口的本地替身服务 - 用于离线开发和测试
+
+启动: python -m utils.dashscope_stub --port 8765 --delay 0.5
+然后设置环境变量 DASHSCOPE_HTTP_BASE_URL=http://127.0.0.1:8765/api/v1，
+同步（dashscope SDK）和异步（httpx连接池）调用都会指向该服务。
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+GENERATION_PATH = "/api/v1/services/aigc/text-generation/generation"
+
+
+class DashScopeStubHandler(BaseHTTPRequestHandler):
+    """模拟 POST /api/v1/services/aigc/text-generation/generation（含SSE流式输出）"""
+
+    protocol_version = "HTTP/1.1"  # 支持keep-alive，便于验证连接复用
+    delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+
+        if self.path.rstrip("/") != GENERATION_PATH:
+            self._send_json(404, {"code": "NotFound", "message": f"unknown path {self.path}"})
+            return
+
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._send_json(401, {"code": "InvalidApiKey", "message": "No API-key provided."})
+            return
+
+        try:
+            payload = json.loads(raw or b"{}")
+            prompt = payload["input"]["prompt"]
+            model = payload["model"]
+        except (ValueError, KeyError):
+            self._send_json(400, {"code": "InvalidParameter", "message": "input.prompt is required"})
+            return
+
+        text = self.server.reply(model, prompt)
+        request_id = hashlib.md5(raw).hexdigest()
+
+        if self.headers.get("X-DashScope-SSE") == "enable" or "text/event-stream" in self.headers.get("Accept", ""):
+            incremental = payload.get("parameters", {}).get("incremental_output", False)
+            self._send_sse(text, request_id, incremental)
+            return
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        self._send_json(200, {
+            "output": {"text": text, "finish_reason": "stop"},
+            "usage": {"input_tokens": len(prompt), "output_tokens": len(text)},
+            "request_id": request_id
+        })
+
+    def _send_sse(self, text: str, request_id: str, incremental: bool):
+        """按SSE格式分段输出，总耗时约为delay"""
+        pieces = [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream;charset=UTF-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        sent = ""
+        for i, piece in enumerate(pieces, start=1):
+            if self.delay:
+                time.sleep(self.delay / len(pieces))
+            sent += piece
+            finished = i == len(pieces)
+            body = {
+                "output": {"text": piece if incremental else sent,
+                           "finish_reason": "stop" if finished else "null"},
+                "usage": {"output_tokens": len(sent)},
+                "request_id": request_id
+            }
+            event = f"id:{i}\nevent:result\n:HTTP_STATUS/200\ndata:{json.dumps(body, ensure_ascii=False)}\n\n"
+            self.wfile.write(event.encode("utf-8"))
+            self.wfile.flush()
+
+
+class DashScopeStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], delay: float = 0.0):
+        handler = type("Handler", (DashScopeStubHandler,), {"delay": delay})
+        super().__init__(address, handler)
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    def reply(self, model: str, prompt: str) -> str:
+        """确定性的回复内容：同样的输入总是得到同样的输出"""
+        with self._count_lock:
+            self.request_count += 1
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        snippet = " ".join(prompt.split())[:40]
+        return f"[{model}#{digest}] 关于“{snippet}”的模拟回答。"
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+
+def start_stub_server(port: int = 0, delay: float = 0.0, host: str = "127.0.0.1") -> DashScopeStubServer:
+    """在后台线程启动替身服务，port为0时自动选择空闲端口"""
+    server = DashScopeStubServer((host, port), delay=delay)
+    threading.Thread(target=server.serve_forever, name="dashscope-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DashScope文本生成接口本地替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="每次生成的模拟耗时（秒）")
+    args = parser.parse_args()
+
+    server = DashScopeStubServer((args.host, args.port), delay=args.delay)
+    print(f"🧪 DashScope替身服务已启动: {server.base_url}")
+    print(f"   export DASHSCOPE_HTTP_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 替身服务已停止")
+
+
+if __name__ == "__main__":
+    main()